@@ -0,0 +1,180 @@
+"""Call sites, and who calls what
+
+The call sites of every method (and constructor) are collected while its class is examined (see
+java_examiner.call_sites), and kept in the model with the rest of the class.  To answer "who calls
+X" without walking the whole tree, they're copied into a CallIndex: a table with one row per call
+site, stored column by column as arrays of ints, in which every string (file, class, method, callee
+and receiver) is replaced by its position in a table of the distinct strings.  A tree with a million
+call sites is then a few dozen megabytes of ints rather than a million objects, and the index of
+each callee's rows is built once, after the table is filled, rather than searched for each query.
+
+Call sites are matched by name, since the receiver of a call isn't resolved to a type: the callers
+of 'save' are the callers of every method named save.
+"""
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from .packages import Package, ClassFile, JavaClass
+
+# the method column of call sites outside of any method: constructors, initializers and field initializers
+INITIALIZER = '<init>'
+# the receiver column of calls without a receiver
+NO_RECEIVER = -1
+
+class Call(NamedTuple):
+    kind: str
+    file: str
+    # the fully-qualified name of the calling class, e.g. com.acme.Outer.Inner
+    class_name: str
+    # the calling method's name or, if it's overloaded, its signature, e.g. process(int)
+    method: str
+    # the method called, or the class constructed
+    callee: str
+    receiver: Optional[str]
+    offset: int
+
+    @property
+    def caller(self) -> str:
+        return f"{self.class_name}#{self.method}"
+
+    @property
+    def text(self) -> str:
+        if self.kind == 'new':
+            return f"new {self.callee}()" if self.receiver is None else f"{self.receiver}.new {self.callee}()"
+        return f"{self.callee}()" if self.receiver is None else f"{self.receiver}.{self.callee}()"
+
+class CallIndex:
+    """A columnar table of call sites, with an index of the rows that call each name"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.string_ids: Dict[str, int] = {}
+        self.kinds = array('i')
+        self.files = array('i')
+        self.classes = array('i')
+        self.methods = array('i')
+        self.callees = array('i')
+        self.receivers = array('i')
+        self.offsets = array('q')
+        # callee string id -> the rows calling it; None until built
+        self.by_callee: Optional[Dict[int, array]] = None
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def intern(self, s: str) -> int:
+        i = self.string_ids.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.strings.append(s)
+            self.string_ids[s] = i
+        return i
+
+    def add(self, kind: str, file: str, class_name: str, method: str, callee: str, receiver: Optional[str], offset: int):
+        self.kinds.append(self.intern(kind))
+        self.files.append(self.intern(file))
+        self.classes.append(self.intern(class_name))
+        self.methods.append(self.intern(method))
+        self.callees.append(self.intern(callee))
+        self.receivers.append(self.intern(receiver) if receiver is not None else NO_RECEIVER)
+        self.offsets.append(offset)
+        self.by_callee = None
+
+    def build(self):
+        """Builds the index of the rows calling each name; queries build it if it's out of date"""
+        by_callee: Dict[int, array] = {}
+        for (row, callee) in enumerate(self.callees):
+            rows = by_callee.get(callee)
+            if rows is None:
+                rows = by_callee[callee] = array('i')
+            rows.append(row)
+        self.by_callee = by_callee
+
+    def row(self, i: int) -> Call:
+        receiver = self.receivers[i]
+        return Call(
+            kind=self.strings[self.kinds[i]],
+            file=self.strings[self.files[i]],
+            class_name=self.strings[self.classes[i]],
+            method=self.strings[self.methods[i]],
+            callee=self.strings[self.callees[i]],
+            receiver=self.strings[receiver] if receiver != NO_RECEIVER else None,
+            offset=self.offsets[i],
+        )
+
+    def callers(self, name: str, kind: Optional[str] = None) -> List[Call]:
+        """The call sites of methods named name (or of constructors of classes named name)
+
+        Args:
+            name (str): the method's name, or the class's simple name
+            kind (Optional[str]): only 'call' sites or only 'new' sites, rather than both
+
+        Returns:
+            List[Call]: the call sites, in the order they were added
+        """
+        if self.by_callee is None:
+            self.build()
+        callee = self.string_ids.get(name)
+        if callee is None:
+            return []
+        kind_id = self.string_ids.get(kind) if kind is not None else None
+        if kind is not None and kind_id is None:
+            return []
+        return [
+            self.row(i) for i in self.by_callee.get(callee, ())
+            if kind_id is None or self.kinds[i] == kind_id
+        ]
+
+def index_class(index: CallIndex, cf: ClassFile, cls: JavaClass, outer: Optional[str] = None):
+    if outer is not None:
+        name = f"{outer}.{cls.name}"
+    else:
+        name = f"{cf.package.full_name}.{cls.name}" if cf.package.full_name != '' else cls.name
+    file = cf.file.as_posix()
+    for c in cls.calls:
+        index.add(c.kind, file, name, INITIALIZER, c.name, c.receiver, c.offset)
+    for m in cls.all_methods():
+        # an overloaded method is told apart from its overloads by its parameter types
+        method = m.signature if cls.is_overloaded(m.name) else m.name
+        for c in m.calls:
+            index.add(c.kind, file, name, method, c.name, c.receiver, c.offset)
+    for inner in cls.classes.values():
+        index_class(index, cf, inner, outer=name)
+
+def index_calls(root: Package) -> CallIndex:
+    """Indexes the call sites of every class in the tree, other than those of external sources"""
+    index = CallIndex()
+    for pkg in root.walk():
+        for cf in pkg.class_files.values():
+            if cf.external:
+                continue
+            for cls in cf.classes.values():
+                index_class(index, cf, cls)
+    index.build()
+    return index
+
+def newline_offsets(bs: bytes) -> List[int]:
+    """The offset of every newline in bs, found by bytes.find rather than by looking at each byte"""
+    offsets = []
+    i = bs.find(b'\n')
+    while i != -1:
+        offsets.append(i)
+        i = bs.find(b'\n', i + 1)
+    return offsets
+
+def line_numbers(calls: Iterable[Call]) -> List[Optional[int]]:
+    """The line number of each call, reading each file once; None where a file can't be read"""
+    newlines: Dict[str, Optional[List[int]]] = {}
+    found = []
+    for c in calls:
+        if c.file not in newlines:
+            try:
+                bs = Path(c.file).read_bytes()
+                newlines[c.file] = newline_offsets(bs)
+            except OSError:
+                newlines[c.file] = None
+        offsets = newlines[c.file]
+        found.append(None if offsets is None else bisect_left(offsets, c.offset) + 1)
+    return found
@@ -1,52 +1,352 @@
 
 from pathlib import Path
+import contextlib
 import json
-from typing import Optional 
+import os
+import sys
+from typing import Optional, Tuple 
 
 import click 
-from rich.console import Console 
 
-from .packages import Package
-from .examiner import examine_all_java
+from .packages import Package, ClassFile
+from .output import FORMATS, ClassFiles
+from .server import DEFAULT_SOCKET
 import logging
 
+# rich and the tree-sitter grammars are only imported inside the commands that use 
+# them, so that `scanner --help` and friends don't pay for loading them.
+
 @click.group()
 def main(): 
     ...
 
+def output_options(command): 
+    command = click.option("--max-depth", type=int, help="With --format tree, how many levels of the tree to show")(command)
+    command = click.option(
+        "-f", "--format", "output_format", type=click.Choice(FORMATS), default="tree", show_default=True, 
+        help="How to print the model: as a rich tree, as NDJSON or CSV records (one per declaration), or as a summary of counts"
+    )(command)
+    return command
+
+def print_model(root: Package, output_format: str, max_depth: Optional[int], class_files: Optional[ClassFiles] = None, spilled: bool = False): 
+    if output_format == 'tree': 
+        from rich.console import Console 
+        # a spilled tree doesn't fit in memory, so only show its packages
+        Console().print(root.package_tree() if spilled else root.as_tree(max_depth=max_depth))
+    else: 
+        from .output import WRITERS
+        WRITERS[output_format](root, sys.stdout, class_files)
+
 @main.command("load") 
 @click.argument("filename") 
-def load_scan(filename: str): 
+@click.option("-p", "--package", type=str, help="Only load and show this package (e.g. com.acme.billing) and the packages below it")
+@output_options
+def load_scan(filename: str, package: Optional[str], output_format: str, max_depth: Optional[int]): 
+    from .snapshot import open_snapshot 
     p = Path(filename) 
-    d = json.loads(p.read_text()) 
-    root = Package() 
-    console = Console() 
-    Package.fromdict(root, d) 
-    console.print(root.as_tree())
+    root = open_snapshot(p)
+    if package is not None: 
+        root = root[package]
+        if root is None: 
+            raise click.ClickException(f"No package {package} in {filename}")
+    # records are streamed without keeping each package's ClassFiles once they've been written
+    print_model(root, output_format, max_depth, class_files=lambda pkg: pkg.iter_class_files())
 
 @main.command("examine") 
 @click.argument("filename")
 @click.option("-s", "--save-file", type=str, help="Optional file to save to, and load from")
+@click.option("-x", "--external", multiple=True, help="A -sources.jar/zip (or directory of them) to read dependency sources from")
+@click.option("--max-memory", type=str, help="Spill extracted classes to disk once the process grows past this size (e.g. 2G)")
+@click.option("--max-file-size", type=str, default="2M", show_default=True, help="Only read the package and imports of files larger than this")
+@click.option("--parse-timeout", type=float, default=10.0, show_default=True, help="Only read the package and imports of files that take longer than this many seconds to parse")
+@click.option("--maven", is_flag=True, help="Scan each module of the Maven build rooted at FILENAME separately, in dependency order")
+@click.option("-j", "--jobs", type=int, help="How many threads to examine files with or, with --maven, how many modules to scan at once")
+@click.option("--headers-only", is_flag=True, help="Only read the package and imports of each file, which is much faster than a full scan")
+@output_options
 @click.option("--verbose", is_flag=True, help="Verbose logging level")
-def examine_path(filename: str, save_file: str, **kwargs):
+def examine_path(filename: str, save_file: str, external: Tuple[str, ...], max_memory: Optional[str], max_file_size: str, parse_timeout: float, maven: bool, jobs: Optional[int], headers_only: bool, output_format: str, max_depth: Optional[int], **kwargs):
     log_level = logging.DEBUG if kwargs.get('verbose', False) else logging.INFO
     logging.basicConfig(level=log_level)
+    if maven and max_memory is not None: 
+        raise click.UsageError("--maven can't be combined with --max-memory")
+    if maven and headers_only: 
+        raise click.UsageError("--maven can't be combined with --headers-only")
+    if jobs is not None and jobs > 1 and max_memory is not None: 
+        raise click.UsageError("--jobs can't be combined with --max-memory")
 
-    console = Console()
+    from .examiner import examine_all_java, ScanLimits, ScanReport
+    from .snapshot import load_snapshot, save_snapshot
+    from .store import PackageStore, parse_memory_size
+
+    # only the model goes to stdout when it's being piped somewhere as records 
+    progress = contextlib.redirect_stdout(sys.stderr) if output_format != 'tree' else contextlib.nullcontext()
 
     root = Package()
     if save_file is not None: 
         p = Path(save_file) 
         if p.exists(): 
-            Package.fromdict(root, json.loads(p.read_text()))
+            load_snapshot(p, root)
+    
+    report = ScanReport()
+    limits = ScanLimits(max_file_size=parse_memory_size(max_file_size), parse_timeout=parse_timeout)
+    with PackageStore() as store: 
+        with progress: 
+            if maven: 
+                from .maven import examine_maven
+                examine_maven(
+                    Path(filename), root, 
+                    external=[Path(x) for x in external], 
+                    workers=jobs, 
+                    limits=limits, 
+                    report=report
+                )
+            else: 
+                examine_all_java(
+                    Path(filename), root, 
+                    external=[Path(x) for x in external], 
+                    max_memory=parse_memory_size(max_memory) if max_memory is not None else None, 
+                    store=store, 
+                    limits=limits, 
+                    report=report, 
+                    workers=jobs, 
+                    headers_only=headers_only
+                )
     
-    examine_all_java(Path(filename), root)
+        if store.spilled: 
+            print_model(
+                root, output_format, max_depth, spilled=True, 
+                class_files=lambda pkg: (ClassFile.fromdict(root, d) for (_, d) in store.class_file_dicts(pkg.full_name))
+            )
+            class_files = lambda pkg: store.class_file_dicts(pkg.full_name)
+        else: 
+            print_model(root, output_format, max_depth)
+            class_files = None
+        if save_file is not None: 
+            save_snapshot(root, Path(save_file), class_files=class_files)
     
-    console.print(root.as_tree())
+    if output_format == 'tree': 
+        from rich.console import Console 
+        console = Console()
+        for (p, reason) in report.degraded: 
+            console.print(f"[yellow]HEADER ONLY[/yellow] {p.as_posix()}: {reason}")
+        for (p, reason) in report.skipped: 
+            console.print(f"[red]SKIPPED[/red] {p.as_posix()}: {reason}")
+    else: 
+        # rich is only for the tree; records are for piping, and shouldn't pay for importing it
+        for (p, reason) in report.degraded: 
+            click.echo(f"HEADER ONLY {p.as_posix()}: {reason}", err=True)
+        for (p, reason) in report.skipped: 
+            click.echo(f"SKIPPED {p.as_posix()}: {reason}", err=True)
+
+@main.command("imports") 
+@click.argument("path")
+@click.option("-r", "--rules", type=str, help="A rules file of 'deny' and 'layers' rules (see scanner.imports) to check the graph against")
+@click.option("--internal-only", is_flag=True, help="Leave out imports of packages that aren't in PATH")
+@click.option("-j", "--jobs", type=int, help="How many threads to examine files with")
+@click.option("--json", "as_json", is_flag=True, help="Print the graph and any violations as JSON")
+def import_graph_path(path: str, rules: Optional[str], internal_only: bool, jobs: Optional[int], as_json: bool): 
+    """Prints the package-to-package import graph of PATH, with the number of imports along each edge, 
+    reading only the package and import declarations of each file.  Exits with status 1 if any rule is broken."""
+    import io 
+    from .examiner import examine_all_java
+    from .imports import import_graph, read_rules, check_rules
+
+    try: 
+        checks = read_rules(Path(rules)) if rules is not None else []
+    except (OSError, ValueError) as e: 
+        raise click.ClickException(f"Can't read rules from {rules}: {e}")
+    # the examiner prints each file it reads, which isn't wanted in the graph output 
+    with contextlib.redirect_stdout(io.StringIO()): 
+        root = examine_all_java(Path(path), workers=jobs, headers_only=True, resolve=False)
+    graph = import_graph(root, internal_only=internal_only)
+    violations = check_rules(graph, checks)
+
+    if as_json: 
+        click.echo(json.dumps({
+            "edges": [{"source": s, "target": t, "count": n} for ((s, t), n) in sorted(graph.items())], 
+            "violations": [
+                {"line": v.rule.line, "rule": str(v.rule), "source": v.source, "target": v.target, "count": v.count}
+                for v in violations
+            ],
+        }, indent=2))
+    else: 
+        for ((s, t), n) in sorted(graph.items()): 
+            click.echo(f"{s} -> {t} {n}")
+        for v in violations: 
+            click.echo(f"VIOLATION {v}", err=True)
+    if len(violations) > 0: 
+        raise SystemExit(1)
+
+@main.command("clones") 
+@click.argument("filename")
+@click.option("-s", "--save-file", type=str, help="Snapshot to load from and save to, so that unchanged files aren't examined (or fingerprinted) again")
+@click.option("-t", "--threshold", type=float, default=0.8, show_default=True, help="How similar (from 0 to 1) two bodies must be to be reported")
+@click.option("-k", "--kind", type=click.Choice(['method', 'class', 'all']), default='all', show_default=True, help="Which bodies to compare")
+@click.option("-j", "--jobs", type=int, help="How many threads to examine files with")
+@click.option("--json", "as_json", is_flag=True, help="Print each pair of clones as a line of JSON")
+def find_clones(filename: str, save_file: Optional[str], threshold: float, kind: str, jobs: Optional[int], as_json: bool): 
+    """Finds methods and classes under FILENAME whose bodies have the same structure, ignoring 
+    names and literals, printing each pair with its estimated similarity"""
+    from .clones import index_tree
+    from .examiner import examine_all_java
+    from .snapshot import load_snapshot, save_snapshot
+
+    root = Package()
+    if save_file is not None and Path(save_file).exists(): 
+        load_snapshot(Path(save_file), root)
+    with contextlib.redirect_stdout(sys.stderr): 
+        examine_all_java(Path(filename), root, workers=jobs, resolve=save_file is not None)
     if save_file is not None: 
-        p = Path(save_file) 
-        with p.open('wt') as outf: 
-            outf.write(json.dumps(root.asdict(), indent=2))
+        save_snapshot(root, Path(save_file))
+
+    index = index_tree(root, kinds=('method', 'class') if kind == 'all' else (kind,))
+    for clone in index.clones(threshold=threshold): 
+        if as_json: 
+            click.echo(json.dumps({
+                "similarity": round(clone.similarity, 3), 
+                "a": {"name": clone.a.name, "kind": clone.a.kind, "file": clone.a.file}, 
+                "b": {"name": clone.b.name, "kind": clone.b.kind, "file": clone.b.file}, 
+            }))
+        else: 
+            click.echo(f"{clone.similarity:.2f} {clone.a.name} ({clone.a.file}) ~ {clone.b.name} ({clone.b.file})")
+
+@main.command("callers") 
+@click.argument("filename")
+@click.argument("name")
+@click.option("-s", "--save-file", type=str, help="Snapshot to load from and save to, so that unchanged files aren't examined again")
+@click.option("-k", "--kind", type=click.Choice(['call', 'new']), help="Only method calls, or only constructor calls")
+@click.option("-j", "--jobs", type=int, help="How many threads to examine files with")
+@click.option("--json", "as_json", is_flag=True, help="Print each call site as a line of JSON")
+def find_callers(filename: str, name: str, save_file: Optional[str], kind: Optional[str], jobs: Optional[int], as_json: bool): 
+    """Lists the places under FILENAME that call methods named NAME, or construct classes named NAME"""
+    from .calls import index_calls, line_numbers
+    from .examiner import examine_all_java
+    from .snapshot import load_snapshot, save_snapshot
+
+    root = Package()
+    if save_file is not None and Path(save_file).exists(): 
+        load_snapshot(Path(save_file), root)
+    with contextlib.redirect_stdout(sys.stderr): 
+        examine_all_java(Path(filename), root, workers=jobs, resolve=save_file is not None)
+    if save_file is not None: 
+        save_snapshot(root, Path(save_file))
+
+    calls = index_calls(root).callers(name, kind=kind)
+    for (call, line) in zip(calls, line_numbers(calls)): 
+        if as_json: 
+            click.echo(json.dumps({**call._asdict(), "caller": call.caller, "line": line}))
+        else: 
+            click.echo(f"{call.file}:{line if line is not None else call.offset} {call.caller} {call.text}")
+
+@main.command("grep") 
+@click.argument("pattern")
+@click.argument("path")
+@click.option("-l", "--lang", default="java", help="Language of the files to search (java, xml, typescript)")
+@click.option("-j", "--jobs", type=int, help="Number of worker processes, one per CPU by default")
+def grep_path(pattern: str, path: str, lang: str, jobs: Optional[int]): 
+    """Searches PATH for a tree-sitter query or a TypedNode-style path like class_declaration.identifier, 
+    printing each match as a line of JSON"""
+    import sys 
+    from .grep import grep 
+
+    for match in grep(pattern, Path(path), lang=lang, workers=jobs): 
+        sys.stdout.write(json.dumps(match) + "\n")
+        sys.stdout.flush()
+
+@main.command("serve") 
+@click.argument("filename")
+@click.option("-s", "--save-file", type=str, help="Snapshot to start from, if it exists; otherwise FILENAME is examined and saved to it")
+@click.option("--socket", "socket_path", envvar="SCANNER_SOCKET", default=DEFAULT_SOCKET, show_default=True, help="Unix socket to listen on")
+@click.option("-x", "--external", multiple=True, help="A -sources.jar/zip (or directory of them) to read dependency sources from")
+@click.option("--max-file-size", type=str, default="2M", show_default=True, help="Only read the package and imports of files larger than this")
+@click.option("--parse-timeout", type=float, default=10.0, show_default=True, help="Only read the package and imports of files that take longer than this many seconds to parse")
+@click.option("--verbose", is_flag=True, help="Verbose logging level")
+def serve_model(filename: str, save_file: Optional[str], socket_path: str, external: Tuple[str, ...], max_file_size: str, parse_timeout: float, verbose: bool): 
+    """Keeps the package tree of FILENAME in memory, answering queries about it (see `scanner query`) 
+    on a Unix socket until told to shut down"""
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.INFO)
+    from .examiner import examine_all_java, ScanLimits
+    from .server import ModelServer, socket_in_use
+    from .snapshot import load_snapshot, save_snapshot
+    from .store import parse_memory_size
+
+    # before the (possibly long) scan, rather than once it's done
+    if socket_in_use(Path(socket_path)): 
+        raise click.ClickException(f"A daemon is already listening on {socket_path}")
+    limits = ScanLimits(max_file_size=parse_memory_size(max_file_size), parse_timeout=parse_timeout)
+    if save_file is not None and Path(save_file).exists(): 
+        root = load_snapshot(Path(save_file))
+        root.resolve_type_identifiers()
+    else: 
+        root = examine_all_java(Path(filename), external=[Path(x) for x in external], limits=limits)
+        if save_file is not None: 
+            save_snapshot(root, Path(save_file))
+    # build the path index up front, rather than on the first query
+    root.path_index()
+
+    model = ModelServer(root, limits=limits)
+    model.serve(Path(socket_path))
+    if save_file is not None: 
+        save_snapshot(root, Path(save_file))
+
+@main.group("query") 
+@click.option("--socket", "socket_path", envvar="SCANNER_SOCKET", default=DEFAULT_SOCKET, show_default=True, help="Unix socket of the `scanner serve` daemon")
+@click.pass_context
+def query(ctx: click.Context, socket_path: str): 
+    """Asks a running `scanner serve` daemon a question, printing the answer as JSON"""
+    ctx.obj = Path(socket_path)
+
+def send(ctx: click.Context, req: dict): 
+    from .server import request
+    try: 
+        resp = request(ctx.obj, req)
+    except OSError as e: 
+        raise click.ClickException(f"Can't reach the daemon on {ctx.obj.as_posix()}: {e}")
+    if not resp.get('ok'): 
+        raise click.ClickException(resp.get('error'))
+    click.echo(json.dumps(resp.get('result'), indent=2))
+
+@query.command("ping") 
+@click.pass_context
+def query_ping(ctx: click.Context): 
+    send(ctx, {"op": "ping"})
+
+@query.command("lookup") 
+@click.argument("name", required=False)
+@click.option("-f", "--file", "path", type=str, help="Look up the source file at this path rather than a name")
+@click.pass_context
+def query_lookup(ctx: click.Context, name: Optional[str], path: Optional[str]): 
+    """Shows the class or package called NAME"""
+    if (name is None) == (path is None): 
+        raise click.UsageError("Give either a NAME or a --file")
+    send(ctx, {"op": "lookup", "path": os.path.abspath(path)} if path is not None else {"op": "lookup", "name": name})
+
+@query.command("annotations") 
+@click.argument("name")
+@click.pass_context
+def query_annotations(ctx: click.Context, name: str): 
+    """Lists the classes, fields and methods annotated with NAME"""
+    send(ctx, {"op": "annotations", "name": name})
+
+@query.command("dependencies") 
+@click.argument("name")
+@click.option("-r", "--reverse", is_flag=True, help="List the classes which depend on NAME instead")
+@click.pass_context
+def query_dependencies(ctx: click.Context, name: str, reverse: bool): 
+    """Lists the classes that the class NAME refers to"""
+    send(ctx, {"op": "dependencies", "name": name, "reverse": reverse})
+
+@query.command("rescan") 
+@click.argument("paths", nargs=-1, required=True)
+@click.pass_context
+def query_rescan(ctx: click.Context, paths: Tuple[str, ...]): 
+    """Has the daemon re-examine PATHS, e.g. after they've been edited or deleted"""
+    send(ctx, {"op": "rescan", "paths": [os.path.abspath(p) for p in paths]})
+
+@query.command("shutdown") 
+@click.pass_context
+def query_shutdown(ctx: click.Context): 
+    send(ctx, {"op": "shutdown"})
 
 if __name__ == '__main__': 
     main()
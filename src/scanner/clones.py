@@ -0,0 +1,205 @@
+"""Structural clone detection
+
+Method and class bodies are fingerprinted while they're examined (see java_examiner.construct_class),
+from the shapes of their syntax trees, with every identifier and literal abstracted away, so that
+copies which were renamed, or had their constants changed, still match.  A fingerprint is a MinHash
+signature of the body's overlapping runs of syntax tokens, which estimates how much two bodies' runs
+overlap (their Jaccard similarity) without comparing the bodies themselves.
+
+Fingerprints are put into a locality-sensitive hashing index, which buckets them by bands of their
+signatures, so that only fingerprints sharing a bucket are ever compared: near-duplicates are found
+without comparing every pair of bodies.  Fingerprints are stored with the rest of the model in
+snapshots, so an unchanged file is never fingerprinted twice (see examiner.examine_guarded).
+"""
+import base64
+from dataclasses import dataclass
+from functools import lru_cache
+from hashlib import blake2b
+from itertools import combinations
+from typing import Dict, Generator, List, Optional, Set, Tuple
+
+from .packages import Package, ClassFile, JavaClass
+
+# How many hashes are in a signature, and how many bits of each are kept
+NUM_HASHES = 32
+HASH_BITS = 16
+# The signature is split into BANDS bands of NUM_HASHES // BANDS hashes for the LSH index
+BANDS = 8
+# The number of consecutive tokens in each of the runs that are hashed
+SHINGLE_SIZE = 5
+# Bodies with fewer tokens than this (e.g. getters and setters) aren't fingerprinted
+MIN_TOKENS = 40
+# A bucket with more fingerprints than this is too common a shape to say anything about clones
+MAX_BUCKET_SIZE = 200
+
+MASK64 = (1 << 64) - 1
+# the multiplier of the rolling hash over a run of tokens
+ROLLING_BASE = 0x100000001b3
+
+@lru_cache(maxsize=None)
+def token_hash(token: str) -> int:
+    # hash() of a str changes from one process to the next, and fingerprints are kept in snapshots
+    return int.from_bytes(blake2b(token.encode(), digest_size=8).digest(), 'little')
+
+def mix(h: int) -> int:
+    """The splitmix64 finalizer, which spreads the bits of the rolling hash over the whole word"""
+    h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+    h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) & MASK64
+    return h ^ (h >> 31)
+
+def normalized_type(node_type: str) -> str:
+    if node_type.endswith('identifier'):
+        return 'identifier'
+    if node_type.endswith('literal'):
+        return 'literal'
+    return node_type
+
+def structural_tokens(raw: Dict[str, any]) -> List[int]:
+    """The hashed tokens of a tree-of-dicts (see java_examiner.convert_to_dict), in document order:
+    a token for each node's (normalized) type and, after its children, one closing it"""
+    tokens: List[int] = []
+    stack = [raw]
+    while stack:
+        d = stack.pop()
+        if isinstance(d, str):
+            tokens.append(token_hash(d))
+            continue
+        node_type = normalized_type(d.get('_type', ''))
+        tokens.append(token_hash(node_type))
+        children = d.get('_children')
+        if children:
+            stack.append('/' + node_type)
+            stack.extend(reversed(children))
+    return tokens
+
+def fingerprint(raw: Optional[Dict[str, any]]) -> Optional[str]:
+    """Fingerprints the body whose tree-of-dicts is raw
+
+    The signature is a one-permutation MinHash: each run's hash picks one of NUM_HASHES bins and
+    competes for the smallest value in it, and empty bins borrow from the next non-empty one.
+
+    Returns:
+        Optional[str]: the signature, base64-encoded, or None if the body is too small
+    """
+    if raw is None:
+        return None
+    tokens = structural_tokens(raw)
+    if len(tokens) < MIN_TOKENS:
+        return None
+    bins: List[Optional[int]] = [None] * NUM_HASHES
+    top = ROLLING_BASE ** (SHINGLE_SIZE - 1) & MASK64
+    h = 0
+    for (i, t) in enumerate(tokens):
+        if i >= SHINGLE_SIZE:
+            h = (h - tokens[i - SHINGLE_SIZE] * top) & MASK64
+        h = (h * ROLLING_BASE + t) & MASK64
+        if i >= SHINGLE_SIZE - 1:
+            m = mix(h)
+            b = m % NUM_HASHES
+            v = m >> (64 - HASH_BITS)
+            if bins[b] is None or v < bins[b]:
+                bins[b] = v
+    filled = [i for (i, v) in enumerate(bins) if v is not None]
+    for i in range(NUM_HASHES):
+        if bins[i] is None:
+            # rotation densification: the next filled bin (circularly), marked by how far away it was
+            j = next((j for j in filled if j > i), filled[0])
+            bins[i] = (bins[j] + (j - i) % NUM_HASHES) & ((1 << HASH_BITS) - 1)
+    return base64.b64encode(b''.join(v.to_bytes(HASH_BITS // 8, 'little') for v in bins)).decode('ascii')
+
+def signature(fp: str) -> Tuple[int, ...]:
+    bs = base64.b64decode(fp)
+    width = HASH_BITS // 8
+    return tuple(int.from_bytes(bs[i:i + width], 'little') for i in range(0, len(bs), width))
+
+def similarity(a: str, b: str) -> float:
+    """Estimates the similarity of the bodies with fingerprints a and b, from 0 to 1"""
+    (sa, sb) = (signature(a), signature(b))
+    return sum(1 for (x, y) in zip(sa, sb) if x == y) / len(sa)
+
+@dataclass(frozen=True)
+class Fragment:
+    """A fingerprinted body: a class, or a method of one"""
+    kind: str
+    file: str
+    package: str
+    # the dotted name of the class within its file, e.g. Outer.Inner
+    class_name: str
+    # the method's name or, if it's overloaded, its signature
+    method: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        qualified = f"{self.package}.{self.class_name}" if self.package != '' else self.class_name
+        return f"{qualified}#{self.method}" if self.method is not None else qualified
+
+@dataclass
+class Clone:
+    a: Fragment
+    b: Fragment
+    similarity: float
+
+class CloneIndex:
+    """An LSH index of fingerprints, bucketed by each band of their signatures"""
+
+    def __init__(self, bands: int = BANDS):
+        self.bands = bands
+        self.fingerprints: Dict[Fragment, str] = {}
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], List[Fragment]] = {}
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def add(self, fragment: Fragment, fp: str):
+        self.fingerprints[fragment] = fp
+        sig = signature(fp)
+        rows = len(sig) // self.bands
+        for band in range(self.bands):
+            self.buckets.setdefault((band, sig[band * rows:(band + 1) * rows]), []).append(fragment)
+
+    def candidates(self) -> Set[Tuple[Fragment, Fragment]]:
+        """The pairs of fragments that share at least one bucket"""
+        pairs = set()
+        for members in self.buckets.values():
+            if 1 < len(members) <= MAX_BUCKET_SIZE:
+                for (a, b) in combinations(members, 2):
+                    pairs.add((a, b) if (a.name, a.file) <= (b.name, b.file) else (b, a))
+        return pairs
+
+    def clones(self, threshold: float = 0.8) -> List[Clone]:
+        """The candidate pairs whose estimated similarity is at least threshold, most similar first"""
+        found = []
+        for (a, b) in self.candidates():
+            # a class is trivially similar to its own methods when they make up most of it
+            if a.file == b.file and a.class_name == b.class_name and (a.method is None or b.method is None):
+                continue
+            s = similarity(self.fingerprints[a], self.fingerprints[b])
+            if s >= threshold:
+                found.append(Clone(a, b, s))
+        found.sort(key=lambda c: (-c.similarity, c.a.name, c.b.name))
+        return found
+
+def fragments(cf: ClassFile, cls: JavaClass, outer: Optional[str] = None) -> Generator[Tuple[Fragment, str], None, None]:
+    name = f"{outer}.{cls.name}" if outer is not None else cls.name
+    where = dict(file=cf.file.as_posix(), package=cf.package.full_name, class_name=name)
+    if cls.fingerprint is not None:
+        yield (Fragment('class', **where), cls.fingerprint)
+    for m in cls.all_methods():
+        if m.fingerprint is not None:
+            method = m.signature if cls.is_overloaded(m.name) else m.name
+            yield (Fragment('method', **where, method=method), m.fingerprint)
+    for inner in cls.classes.values():
+        yield from fragments(cf, inner, outer=name)
+
+def index_tree(root: Package, kinds: Tuple[str, ...] = ('class', 'method')) -> CloneIndex:
+    """Indexes the fingerprints of every class and method in the tree"""
+    index = CloneIndex()
+    for pkg in root.walk():
+        for cf in pkg.class_files.values():
+            if cf.external:
+                continue
+            for cls in cf.classes.values():
+                for (fragment, fp) in fragments(cf, cls):
+                    if fragment.kind in kinds:
+                        index.add(fragment, fp)
+    return index
@@ -1,18 +1,273 @@
-
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from hashlib import blake2b
+from itertools import chain
 from pathlib import Path
-from typing import Optional 
-from rich.console import Console
+from typing import Generator, Iterable, List, Optional, Set, Tuple 
+import logging
+import zipfile
+
+from .packages import Package, ClassFile, path_key
+from .sitter.java_examiner import examine, examine_header, parse_header
+from .sitter.languages import parse, ParseTimeoutError
+from .paths import search_java_files, search_archives, search_archive_java_files, is_archive
+from .store import PackageStore, current_rss
+
+logger = logging.getLogger(__name__)
+
+# How many files are examined between checks of the memory limit 
+MEMORY_CHECK_INTERVAL = 32
+
+# How much of an oversized file is read to find its package and imports
+HEADER_BYTES = 64 * 1024
+
+# How many files, per worker thread, may be read and waiting to be examined at once
+THREAD_QUEUE_DEPTH = 4
+
+@dataclass
+class ScanLimits: 
+    """Per-file limits, past which a file is only examined for its package and imports"""
+    max_file_size: Optional[int] = 2 * 1024 * 1024
+    parse_timeout: Optional[float] = 10.0
+
+@dataclass
+class ScanReport: 
+    """The files that a scan skipped entirely, or only examined for their headers, and why"""
+    skipped: List[Tuple[Path, str]] = field(default_factory=list)
+    degraded: List[Tuple[Path, str]] = field(default_factory=list)
+
+    def skip(self, p: Path, reason: str): 
+        logger.warning("Skipped %s: %s", p.as_posix(), reason)
+        self.skipped.append((p, reason))
+    
+    def degrade(self, p: Path, reason: str): 
+        logger.warning("Only read the header of %s: %s", p.as_posix(), reason)
+        self.degraded.append((p, reason))
+    
+    def __len__(self) -> int: 
+        return len(self.skipped) + len(self.degraded)
+
+def source_digest(bs: bytes) -> str: 
+    return blake2b(bs, digest_size=16).hexdigest()
+
+def examine_guarded(
+    p: Path, 
+    root: Package, 
+    source: Optional[bytes] = None, 
+    external: bool = False, 
+    limits: Optional[ScanLimits] = None, 
+    report: Optional[ScanReport] = None, 
+    headers_only: bool = False, 
+    reuse: bool = False, 
+    size: Optional[int] = None
+) -> Optional[ClassFile]: 
+    """Examines one file like java_examiner.examine, but never lets a single bad file fail the scan
+
+    Files that are too large, take too long to parse, have syntax errors, or that examine fails on 
+    are only examined for their package and imports (see java_examiner.examine_header); files that 
+    can't even be read are skipped.  Either way, the file is recorded in the report.
+
+    With headers_only, every file is only examined for its package and imports, and only the 
+    part of it before its first type declaration is parsed (see java_examiner.parse_header).
 
-from .packages import Package
-from .sitter.java_examiner import examine
-from .paths import search_java_files
+    With reuse, a file that root already has a fully-examined ClassFile for, with the same source 
+    digest, isn't examined again (e.g. when root was loaded from a snapshot of an earlier scan), and 
+    root's ClassFile for a file that has changed is replaced.
 
-def examine_all_java(base: Path, root: Optional[Package] = None) -> Package: 
+    The size of the file is given when source is only its first HEADER_BYTES (as read out of an 
+    archive, see paths.search_archive_files), and is otherwise the length of source or of the file.
+
+    Returns:
+        Optional[ClassFile]: the file's ClassFile, or None if it was skipped
+    """
+    if limits is None: limits = ScanLimits()
+    if report is None: report = ScanReport()
+    try: 
+        previous = root.owner_of(p) if reuse else None
+        if size is None: size = len(source) if source is not None else p.stat().st_size
+        if limits.max_file_size is not None and size > limits.max_file_size: 
+            if previous is not None: previous.package.remove_class_file(previous)
+            if source is None: 
+                with p.open('rb') as inf: 
+                    source = inf.read(HEADER_BYTES)
+            report.degrade(p, f"{size} bytes is over the {limits.max_file_size} byte limit")
+            return examine_header(p, root, source=source[:HEADER_BYTES], external=external)
+        
+        bs = source if source is not None else p.read_bytes()
+        digest = source_digest(bs)
+        if previous is not None: 
+            if previous.digest == digest: 
+                return previous
+            previous.package.remove_class_file(previous)
+        if headers_only: 
+            try: 
+                tree = parse_header(bs, timeout=limits.parse_timeout)
+            except ParseTimeoutError as e: 
+                report.degrade(p, str(e))
+                tree = None
+            return examine_header(p, root, source=bs, external=external, tree=tree)
+
+        try: 
+            tree = parse('java', bs, timeout=limits.parse_timeout)
+        except ParseTimeoutError as e: 
+            report.degrade(p, str(e))
+            return examine_header(p, root, source=bs, external=external)
+        
+        if tree.root_node.has_error: 
+            report.degrade(p, "syntax errors")
+            return examine_header(p, root, source=bs, external=external, tree=tree)
+        try: 
+            cf = examine(p, root, source=bs, external=external, tree=tree)
+            cf.digest = digest
+            return cf
+        except Exception as e: 
+            report.degrade(p, f"{type(e).__name__}: {e}")
+            return examine_header(p, root, source=bs, external=external, tree=tree)
+    except Exception as e: 
+        report.skip(p, f"{type(e).__name__}: {e}")
+        return None
+
+def archive_sources(
+    archive: Path, 
+    limits: Optional[ScanLimits] = None, 
+    report: Optional[ScanReport] = None
+) -> Generator[Tuple[Path, bytes, int, bool], None, None]: 
+    """Reads the Java sources inside a jar or zip archive (e.g. a -sources.jar) straight out of the 
+    archive, as the (path, source, size, external) tuples that examine_in_pool takes, all marked as 
+    external; only the head of a source over limits.max_file_size is read.  An archive that can't 
+    be read is skipped, and recorded in the report."""
+    if limits is None: limits = ScanLimits()
+    if report is None: report = ScanReport()
+    print(archive.as_posix())
+    try: 
+        for (member, bs, size) in search_archive_java_files(archive, max_size=limits.max_file_size, head_bytes=HEADER_BYTES): 
+            yield member, bs, size, True
+    except (OSError, zipfile.BadZipFile) as e: 
+        report.skip(archive, f"{type(e).__name__}: {e}")
+
+def examine_in_pool(
+    pool: ThreadPoolExecutor, 
+    workers: int, 
+    sources: Iterable[Tuple[Path, Optional[bytes], Optional[int], bool]], 
+    root: Package, 
+    limits: Optional[ScanLimits], 
+    report: ScanReport, 
+    headers_only: bool = False, 
+    reuse: bool = False
+): 
+    """Examines (path, source, size, external) tuples on a thread pool, returning once all are done
+
+    Only a few files per worker are handed to the pool at a time, so that the sources read out of 
+    an archive aren't all held in memory at once.
+    """
+    pending = set()
+    for (p, bs, size, is_external) in sources: 
+        if len(pending) >= workers * THREAD_QUEUE_DEPTH: 
+            (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done: f.result()
+        pending.add(pool.submit(
+            examine_guarded, p, root, source=bs, external=is_external, limits=limits, report=report, 
+            headers_only=headers_only, reuse=reuse, size=size
+        ))
+    for f in wait(pending).done: 
+        f.result()
+
+def examine_all_java(
+    base: Path, 
+    root: Optional[Package] = None, 
+    external: Iterable[Path] = (), 
+    max_memory: Optional[int] = None, 
+    store: Optional[PackageStore] = None,
+    limits: Optional[ScanLimits] = None, 
+    report: Optional[ScanReport] = None,
+    resolve: bool = True,
+    workers: Optional[int] = None, 
+    headers_only: bool = False
+) -> Package: 
+    """Examines every Java source under base (or in base, if it's an archive), and resolves type identifiers
+
+    Args:
+        base (Path): a source file, a directory of sources, or a jar/zip archive
+        root (Optional[Package]): the package tree to add to; a new one is created if not given 
+        external (Iterable[Path]): archives, or directories of archives, of third-party sources
+        max_memory (Optional[int]): if given, a limit in bytes on the resident size of the process; 
+            once it is reached, finished packages are spilled to the store
+        store (Optional[PackageStore]): where to spill to; required if max_memory is given
+        limits (Optional[ScanLimits]): per-file size and parse time limits; ScanLimits() by default
+        report (Optional[ScanReport]): collects the files that were skipped or only partly examined
+        resolve (bool): whether to resolve type identifiers once every file has been examined; when 
+            root already had files, only those the scan could have changed are resolved again
+        workers (Optional[int]): if more than 1, the number of threads to examine files with; the 
+            parsing is done by tree-sitter, so on a free-threaded build of Python the threads run 
+            in parallel.  Can't be combined with max_memory
+        headers_only (bool): only read each file's package and imports, which is much faster 
+            than a full scan, for when only the import graph is needed (see imports.import_graph)
+
+    Returns:
+        Package: the root of the package tree.  If store.spilled is True afterwards, the tree holds 
+            only the package skeleton, and the ClassFiles (with their resolved identifiers) are in the store
+    """
     if root is None: root = Package()
-    for java_file in search_java_files(base): 
-        print(java_file.as_posix())
-        examine(java_file, root) 
+    if report is None: report = ScanReport()
+    if limits is None: limits = ScanLimits()
+    if max_memory is not None and store is None: 
+        raise ValueError("A PackageStore is needed to scan with a memory limit")
+    threaded = workers is not None and workers > 1
+    if threaded and max_memory is not None: 
+        raise ValueError("A memory limit can't be combined with a thread pool")
+
+    def external_sources(): 
+        for ext in external: 
+            for archive in search_archives(ext): 
+                yield from archive_sources(archive, limits, report)
+
+    # the sources found under base, by path_key
+    seen: Set[str] = set()
+
+    def base_sources(): 
+        if is_archive(base): 
+            yield from archive_sources(base, limits, report)
+        else: 
+            for java_file in search_java_files(base): 
+                print(java_file.as_posix())
+                seen.add(path_key(java_file))
+                yield java_file, None, None, False
+
+    # files that a tree loaded from a snapshot already has, unchanged, aren't examined again 
+    reuse = any(len(pkg.class_files) > 0 for pkg in root.walk())
+
+    # External sources go first, so that a class in the scanned tree wins over 
+    # a same-named file from a dependency 
+    if threaded: 
+        with ThreadPoolExecutor(max_workers=workers) as pool: 
+            for phase in (external_sources(), base_sources()): 
+                examine_in_pool(pool, workers, phase, root, limits, report, headers_only=headers_only, reuse=reuse)
+    else: 
+        for (i, (p, bs, size, is_external)) in enumerate(chain(external_sources(), base_sources())): 
+            examine_guarded(
+                p, root, source=bs, external=is_external, limits=limits, report=report, 
+                headers_only=headers_only, reuse=reuse, size=size
+            ) 
+            if max_memory is not None and (i + 1) % MEMORY_CHECK_INTERVAL == 0 and current_rss() > max_memory: 
+                store.spill(root)
     
-    root.resolve_type_identifiers()
-    return root 
+    if reuse and not is_archive(base): 
+        # whatever the tree had under base that the scan didn't come across has since been deleted
+        for cf in root.files_under(base): 
+            if not cf.external and path_key(cf.file) not in seen: 
+                cf.package.remove_class_file(cf)
 
+    if store is not None and store.spilled: 
+        store.spill(root)
+        if reuse and not is_archive(base): 
+            # and so has whatever the store has under base that the scan didn't come across 
+            store.remove_missing(base, seen)
+        if resolve: store.resolve_type_identifiers(root)
+    elif resolve and reuse: 
+        # the tree's ReferenceIndex has recorded every file the scan added, replaced or removed, so 
+        # only those, and the files referring to the classes they declare(d), are resolved again.  A 
+        # tree that hasn't been resolved yet (e.g. one just loaded from a snapshot) is resolved in full
+        root.resolve_changed()
+    elif resolve: 
+        root.resolve_type_identifiers()
+    return root 
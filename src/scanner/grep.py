@@ -0,0 +1,150 @@
+"""Structural grep: runs a tree-sitter query, or a TypedNode-style path, over every file in a tree
+
+Patterns come in two flavours:
+
+  * a tree-sitter query, e.g. '(method_invocation name: (identifier) @name)', if the pattern
+    starts with '('; every capture is a match
+  * a dotted path, e.g. 'class_declaration.identifier', which follows the same rules as TypedNode:
+    the first step matches nodes anywhere in the file (TypedNode.search), and each later step
+    matches the direct children of the previous step's nodes (TypedNode.find).  As with TypedNode,
+    a step matches any node whose type contains it.
+
+Rather than converting each file into a TypedNode tree, patterns run directly against the
+tree-sitter nodes, and each pattern is compiled once per process and reused for every file.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Generator, List, Optional, Tuple, TYPE_CHECKING
+import logging
+import os
+import re
+
+from .paths import search_files, JAVA_FILENAME, XML_FILENAME, TYPESCRIPT_FILENAME
+from .sitter.languages import get_language, get_parser
+
+if TYPE_CHECKING:
+    from tree_sitter import Node
+
+logger = logging.getLogger(__name__)
+
+FILENAMES: Dict[str, re.Pattern] = {
+    'java': JAVA_FILENAME,
+    'xml': XML_FILENAME,
+    'typescript': TYPESCRIPT_FILENAME,
+}
+
+# A match's (capture name, node) pairs, in document order
+Captures = List[Tuple[str, 'Node']]
+
+class QueryPattern:
+    def __init__(self, lang: str, pattern: str):
+        import tree_sitter
+        self.query = tree_sitter.Query(get_language(lang), pattern)
+        # py-tree-sitter 0.25 moved captures() from Query to QueryCursor
+        self.cursor_type = getattr(tree_sitter, 'QueryCursor', None)
+
+    def captures(self, root: 'Node') -> Captures:
+        if self.cursor_type is not None:
+            found = self.cursor_type(self.query).captures(root)
+        else:
+            found = self.query.captures(root)
+        pairs = [(name, n) for (name, nodes) in found.items() for n in nodes]
+        pairs.sort(key=lambda pair: (pair[1].start_byte, pair[1].end_byte))
+        return pairs
+
+class PathPattern:
+    def __init__(self, lang: str, pattern: str):
+        self.steps = [s for s in pattern.split('.') if s != '']
+        if len(self.steps) == 0:
+            raise ValueError(f"Empty path pattern {pattern!r}")
+
+    def captures(self, root: 'Node') -> Captures:
+        [head, *rest] = self.steps
+        nodes = list(PathPattern.search(root, head))
+        for step in rest:
+            nodes = [c for n in nodes for c in n.named_children if step in c.type]
+        return [(self.steps[-1], n) for n in nodes]
+
+    @staticmethod
+    def search(node: 'Node', term: str) -> Generator['Node', None, None]:
+        # iterative version of TypedNode.query, which doesn't descend into matching nodes
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if term in n.type:
+                yield n
+            else:
+                stack.extend(reversed(n.named_children))
+
+@lru_cache(maxsize=32)
+def compile_pattern(lang: str, pattern: str) -> QueryPattern | PathPattern:
+    if pattern.lstrip().startswith('('):
+        return QueryPattern(lang, pattern)
+    return PathPattern(lang, pattern)
+
+def grep_file(p: Path, pattern: str, lang: str = 'java') -> List[Dict[str, any]]:
+    """Finds the matches for a pattern in a single file
+
+    Returns:
+        List[Dict[str, any]]: one record per captured node, with the file, capture name, byte span,
+            1-based line and column, and the captured text; none if the file can't be read, so that 
+            one unreadable file doesn't end the whole search
+    """
+    compiled = compile_pattern(lang, pattern)
+    try:
+        bs = p.read_bytes()
+    except OSError as e:
+        logger.warning("Skipped %s: %s", p.as_posix(), f"{type(e).__name__}: {e}")
+        return []
+    tree = get_parser(lang).parse(bs)
+    return [
+        {
+            "file": p.as_posix(),
+            "capture": name,
+            "start": n.start_byte,
+            "end": n.end_byte,
+            "line": n.start_point[0] + 1,
+            "column": n.start_point[1] + 1,
+            "text": bs[n.start_byte:n.end_byte].decode('UTF-8', errors='replace'),
+        }
+        for (name, n) in compiled.captures(tree.root_node)
+    ]
+
+def _grep_file_args(args: Tuple[Path, str, str]) -> List[Dict[str, any]]:
+    return grep_file(*args)
+
+def grep(
+    pattern: str,
+    base: Path,
+    lang: str = 'java',
+    workers: Optional[int] = None,
+    chunksize: int = 16
+) -> Generator[Dict[str, any], None, None]:
+    """Greps every file of the given language under base, yielding matches while the search runs
+
+    Args:
+        pattern (str): a tree-sitter query or a dotted TypedNode-style path
+        base (Path): a file or a directory to search
+        lang (str): which language's files to search
+        workers (Optional[int]): the number of worker processes, one per CPU by default; 1 searches in-process
+        chunksize (int): how many files are handed to a worker at a time
+
+    Yields:
+        Dict[str, any]: a record per match (see grep_file), grouped by file in discovery order
+    """
+    if lang not in FILENAMES:
+        raise ValueError(f"Unsupported language {lang!r}, expected one of {sorted(FILENAMES)}")
+    # compile once up front, so that a bad pattern fails before any work is farmed out
+    compile_pattern(lang, pattern)
+    files = search_files(base, FILENAMES[lang])
+    if workers is None: workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        for f in files:
+            yield from grep_file(f, pattern, lang)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            args = ((f, pattern, lang) for f in files)
+            for matches in pool.map(_grep_file_args, args, chunksize=chunksize):
+                yield from matches
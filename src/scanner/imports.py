@@ -0,0 +1,143 @@
+"""The package-to-package import graph, and layering rules checked against it
+
+The graph is built from nothing but each file's package and imports, so it works just as well on
+a tree scanned with headers_only (see examiner.examine_all_java), which is far faster than a full
+scan.
+
+A rules file has one rule per line, with blank lines and '#' comments ignored:
+
+    # nothing outside the web layer may use it
+    deny com.acme.* -> com.acme.web.*
+    # each layer may only import the layers below it
+    layers com.acme.web.*, com.acme.service.*, com.acme.db.*
+
+Package patterns are globs over the dotted package name, and 'a.b.*' matches a.b itself as well
+as every package below it.
+"""
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .packages import Package
+
+# (importing package, imported package) -> the number of imports from one to the other
+ImportGraph = Dict[Tuple[str, str], int]
+
+def import_target(pkg: str, name: str) -> str:
+    """The package that an import, split as (package, name) by the examiner, brings names in from
+
+    By Java naming convention, the package is everything before the first capitalized step, which
+    covers single-type imports ('com.acme.Foo'), wildcard imports ('com.acme.*', split as
+    ('com', 'acme')) and static imports ('com.acme.Foo.bar') alike.
+    """
+    steps = [s for s in pkg.split('.') if s != ''] + [name]
+    for (i, step) in enumerate(steps):
+        if step[:1].isupper():
+            return '.'.join(steps[:i])
+    return '.'.join(steps)
+
+def import_graph(root: Package, internal_only: bool = False) -> ImportGraph:
+    """Counts the imports between each pair of distinct packages in the tree
+
+    Args:
+        root (Package): the scanned tree
+        internal_only (bool): only count imports of packages that are in the tree (and that don't
+            come entirely from external archives), leaving out e.g. java.util
+    """
+    internal = {pkg.full_name for pkg in root.walk() if len(pkg.class_files) > 0 and not pkg.is_external}
+    graph: ImportGraph = {}
+    for pkg in root.walk():
+        for cf in pkg.class_files.values():
+            if cf.external:
+                continue
+            for (imp_pkg, name) in cf.imports:
+                target = import_target(imp_pkg, name)
+                if target == pkg.full_name or (internal_only and target not in internal):
+                    continue
+                edge = (pkg.full_name, target)
+                graph[edge] = graph.get(edge, 0) + 1
+    return graph
+
+def package_matches(pattern: str, name: str) -> bool:
+    if pattern.endswith('.*') and name == pattern[:-2]:
+        return True
+    return fnmatchcase(name, pattern)
+
+@dataclass
+class DenyRule:
+    source: str
+    target: str
+    line: int
+
+    def check(self, source: str, target: str) -> bool:
+        return package_matches(self.source, source) and package_matches(self.target, target)
+
+    def __str__(self) -> str:
+        return f"deny {self.source} -> {self.target}"
+
+@dataclass
+class LayersRule:
+    # top to bottom: each layer may import the ones below it, but not the ones above
+    layers: List[str]
+    line: int
+
+    def layer_of(self, name: str) -> Optional[int]:
+        return next((i for (i, pattern) in enumerate(self.layers) if package_matches(pattern, name)), None)
+
+    def check(self, source: str, target: str) -> bool:
+        (src, dst) = (self.layer_of(source), self.layer_of(target))
+        return src is not None and dst is not None and dst < src
+
+    def __str__(self) -> str:
+        return f"layers {', '.join(self.layers)}"
+
+ImportRule = DenyRule | LayersRule
+
+@dataclass
+class Violation:
+    rule: ImportRule
+    source: str
+    target: str
+    count: int
+
+    def __str__(self) -> str:
+        return f"line {self.rule.line} ({self.rule}): {self.source} -> {self.target} ({self.count})"
+
+def parse_rules(text: str) -> List[ImportRule]:
+    """Parses the rules of a rules file (see the module documentation)
+
+    Raises:
+        ValueError: if a line isn't a rule, naming the line
+    """
+    rules: List[ImportRule] = []
+    for (i, line) in enumerate(text.splitlines(), start=1):
+        line = line.split('#', 1)[0].strip()
+        if line == '':
+            continue
+        (kind, _, rest) = line.partition(' ')
+        if kind == 'deny':
+            (source, arrow, target) = rest.partition('->')
+            if arrow == '' or source.strip() == '' or target.strip() == '':
+                raise ValueError(f"Line {i}: expected 'deny <package> -> <package>', got {line!r}")
+            rules.append(DenyRule(source.strip(), target.strip(), i))
+        elif kind == 'layers':
+            layers = [l.strip() for l in rest.split(',') if l.strip() != '']
+            if len(layers) < 2:
+                raise ValueError(f"Line {i}: expected 'layers <package>, <package>, ...', got {line!r}")
+            rules.append(LayersRule(layers, i))
+        else:
+            raise ValueError(f"Line {i}: unknown rule {kind!r}, expected 'deny' or 'layers'")
+    return rules
+
+def read_rules(p: Path) -> List[ImportRule]:
+    return parse_rules(p.read_text())
+
+def check_rules(graph: ImportGraph, rules: List[ImportRule]) -> List[Violation]:
+    """Finds every edge of the graph that breaks a rule, in rule order and then edge order"""
+    return [
+        Violation(rule, source, target, count)
+        for rule in rules
+        for ((source, target), count) in sorted(graph.items())
+        if rule.check(source, target)
+    ]
@@ -0,0 +1,204 @@
+"""Module-aware scanning of Maven builds
+
+Rather than treating a whole checkout as one flat source tree, this reads every module's pom.xml
+to find its source directories and the other modules it depends on.  Each module is scanned into
+its own package tree, in dependency order, with independent modules scanned concurrently; type
+identifiers in a module are only resolved against its own classes and those of the modules it
+(transitively) depends on.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+import logging
+
+from .packages import Package
+from .paths import search_files, search_archives, POM_FILENAME, NON_SOURCE_DIRECTORY
+from .sitter.xml_examiner import XMLTree, parse_to_node, create_xml_tree
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE_DIRECTORY = 'src/main/java'
+DEFAULT_TEST_SOURCE_DIRECTORY = 'src/test/java'
+
+@dataclass
+class MavenModule:
+    pom: Path
+    group_id: str
+    artifact_id: str
+    packaging: str = 'jar'
+    # the <module> entries, relative to this module's directory
+    modules: List[str] = field(default_factory=list)
+    # the groupId:artifactId of each declared dependency
+    dependencies: List[str] = field(default_factory=list)
+    source_roots: List[Path] = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        return f"{self.group_id}:{self.artifact_id}"
+
+    @property
+    def directory(self) -> Path:
+        return self.pom.parent
+
+def read_pom(pom: Path) -> MavenModule:
+    """Reads the coordinates, sub-modules, dependencies and existing source directories of a module"""
+    node, _ = parse_to_node(pom)
+    project: XMLTree = create_xml_tree(node.element[0])
+    parent = project.element('parent')
+    group_id = project.element_text('groupId') or (parent.element_text('groupId') if parent is not None else None) or ''
+    artifact_id = project.element_text('artifactId') or pom.parent.name
+    directory = pom.parent
+
+    def interpolate(s: str) -> str:
+        for (prop, value) in [
+            ('project.basedir', directory.as_posix()), ('basedir', directory.as_posix()),
+            ('project.groupId', group_id), ('groupId', group_id),
+        ]:
+            s = s.replace('${' + prop + '}', value)
+        return s
+
+    modules = project.element('modules')
+    dependencies = project.element('dependencies')
+    build = project.element('build')
+
+    source_dirs = [
+        (build.element_text(tag) if build is not None else None) or default
+        for (tag, default) in [
+            ('sourceDirectory', DEFAULT_SOURCE_DIRECTORY),
+            ('testSourceDirectory', DEFAULT_TEST_SOURCE_DIRECTORY),
+        ]
+    ]
+    source_roots = [directory / interpolate(d) for d in source_dirs]
+
+    return MavenModule(
+        pom=pom,
+        group_id=group_id,
+        artifact_id=artifact_id,
+        packaging=project.element_text('packaging', 'jar'),
+        modules=[m.text for m in modules.elements('module')] if modules is not None else [],
+        dependencies=[
+            f"{interpolate(d.element_text('groupId', ''))}:{d.element_text('artifactId', '')}"
+            for d in dependencies.elements('dependency')
+        ] if dependencies is not None else [],
+        source_roots=[r for r in source_roots if r.is_dir()],
+    )
+
+def find_modules(base: Path) -> Dict[str, MavenModule]:
+    """Finds the modules of the build rooted at base, keyed by groupId:artifactId
+
+    If base has a pom.xml, the modules are found by following its <modules>; otherwise every
+    pom.xml under base is used, skipping build output and other non-source directories.
+    """
+    if (base / 'pom.xml').is_file():
+        poms = []
+        pending = [base / 'pom.xml']
+        seen: Set[Path] = set()
+        while pending:
+            pom = pending.pop()
+            if pom.resolve() in seen:
+                continue
+            seen.add(pom.resolve())
+            if not pom.is_file():
+                logger.warning("Module %s has no pom.xml", pom.parent.as_posix())
+                continue
+            poms.append(pom)
+            pending.extend(pom.parent / m / 'pom.xml' for m in read_pom(pom).modules)
+    else:
+        poms = search_files(base, POM_FILENAME, exclude_dirs=NON_SOURCE_DIRECTORY)
+    modules = [read_pom(pom) for pom in poms]
+    return {m.key: m for m in modules}
+
+def module_dependencies(modules: Dict[str, MavenModule]) -> Dict[str, Set[str]]:
+    """The direct dependencies of each module on the other modules of the same build"""
+    return {
+        key: {d for d in m.dependencies if d in modules and d != key}
+        for (key, m) in modules.items()
+    }
+
+def transitive_dependencies(graph: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    closure: Dict[str, Set[str]] = {}
+
+    def visit(key: str, path: Set[str]) -> Set[str]:
+        if key in closure:
+            return closure[key]
+        if key in path:
+            raise ValueError(f"Dependency cycle through module {key}")
+        deps = set(graph[key])
+        for d in graph[key]:
+            deps |= visit(d, path | {key})
+        closure[key] = deps
+        return deps
+
+    for key in graph:
+        visit(key, set())
+    return closure
+
+def examine_maven(
+    base: Path,
+    root: Optional[Package] = None,
+    external: Iterable[Path] = (),
+    workers: Optional[int] = None,
+    limits: Optional['ScanLimits'] = None,
+    report: Optional['ScanReport'] = None
+) -> Package:
+    """Examines each module of a Maven build, and merges the results into one package tree
+
+    Args:
+        base (Path): the directory of the build's top-level pom.xml
+        root (Optional[Package]): the package tree to merge the modules into; a new one if not given
+        external (Iterable[Path]): archives, or directories of archives, of third-party sources, which
+            are visible to every module
+        workers (Optional[int]): how many modules may be scanned at once
+        limits (Optional[ScanLimits]): per-file limits, as for examine_all_java
+        report (Optional[ScanReport]): collects the files that were skipped or only partly examined
+
+    Returns:
+        Package: the root of the merged package tree
+    """
+    from .examiner import examine_all_java, examine_guarded, archive_sources, ScanReport
+
+    if root is None: root = Package()
+    if report is None: report = ScanReport()
+    modules = find_modules(base)
+    graph = module_dependencies(modules)
+    closure = transitive_dependencies(graph)
+
+    external_root = Package()
+    for ext in external:
+        for archive in search_archives(ext):
+            for (member, bs, size, is_external) in archive_sources(archive, limits, report):
+                examine_guarded(member, external_root, source=bs, external=is_external, limits=limits, report=report, size=size)
+    external_root.resolve_type_identifiers()
+
+    scanned: Dict[str, Package] = {}
+
+    def scan_module(module: MavenModule) -> Package:
+        module_root = Package()
+        module_root.dependencies = [scanned[d] for d in sorted(closure[module.key])] + [external_root]
+        for source_root in module.source_roots:
+            examine_all_java(source_root, module_root, limits=limits, report=report, resolve=False)
+        module_root.resolve_type_identifiers()
+        return module_root
+
+    # a module is scheduled once every module it depends on has been scanned
+    remaining = {key: set(deps) for (key, deps) in graph.items()}
+    order: List[str] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while remaining or running:
+            for key in sorted(k for (k, deps) in remaining.items() if len(deps) == 0):
+                del remaining[key]
+                running[pool.submit(scan_module, modules[key])] = key
+            (done, _) = wait(running, return_when=FIRST_COMPLETED)
+            for f in done:
+                key = running.pop(f)
+                scanned[key] = f.result()
+                order.append(key)
+                for deps in remaining.values():
+                    deps.discard(key)
+
+    root.merge(external_root)
+    for key in order:
+        root.merge(scanned[key])
+    return root
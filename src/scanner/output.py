@@ -0,0 +1,99 @@
+"""Machine-readable output of a package tree, for piping into other tools
+
+Unlike the rich tree output, these formats are written record by record, straight from the model,
+so nothing proportional to the size of the tree is built up before the first line is written:
+
+  * ndjson: one JSON object per declaration (file, class, field or method)
+  * csv: the same records, one row each, with list values joined by spaces
+  * summary: counts of the packages, files and declarations in the tree
+"""
+import csv
+import json
+from typing import Callable, Dict, Generator, Iterable, Optional, TextIO
+
+from .packages import Package, ClassFile, JavaClass
+
+FORMATS = ['tree', 'ndjson', 'csv', 'summary']
+
+# Where the ClassFiles of a package come from, which isn't always the tree itself (e.g. when they've
+# been spilled to a PackageStore)
+ClassFiles = Callable[[Package], Iterable[ClassFile]]
+
+COLUMNS = ['kind', 'package', 'file', 'class', 'name', 'type', 'modifiers', 'annotations', 'parameters']
+
+def in_memory_class_files(pkg: Package) -> Iterable[ClassFile]:
+    return pkg.class_files.values()
+
+def class_records(cf: ClassFile, cls: JavaClass, outer: Optional[str] = None) -> Generator[Dict[str, any], None, None]:
+    name = f"{outer}.{cls.name}" if outer is not None else cls.name
+    common = {"package": cf.package.full_name, "file": cf.file.as_posix(), "class": name}
+    yield {
+        "kind": cls.kind.value, **common, "name": cls.name, "type": None,
+        "modifiers": cls.modifiers, "annotations": [str(a) for a in cls.annotations], "parameters": [],
+    }
+    for f in cls.fields.values():
+        yield {
+            "kind": "field", **common, "name": f.name, "type": f.type,
+            "modifiers": f.modifiers, "annotations": [str(a) for a in f.annotations], "parameters": [],
+        }
+    for m in cls.all_methods():
+        # as in the call and clone indexes, an overloaded method is named by its signature
+        yield {
+            "kind": "method", **common, "name": m.signature if cls.is_overloaded(m.name) else m.name, "type": m.return_type,
+            "modifiers": m.modifiers, "annotations": [str(a) for a in m.annotations],
+            "parameters": [f"{p.type} {p.name}" for p in m.parameters],
+        }
+    for inner in cls.classes.values():
+        yield from class_records(cf, inner, outer=name)
+
+def records(root: Package, class_files: Optional[ClassFiles] = None) -> Generator[Dict[str, any], None, None]:
+    """Yields a record (with the keys in COLUMNS) for every file, class, field and method in the tree"""
+    if class_files is None: class_files = in_memory_class_files
+    for pkg in root.walk():
+        for cf in class_files(pkg):
+            yield {
+                "kind": "file", "package": pkg.full_name, "file": cf.file.as_posix(), "class": None,
+                "name": cf.name, "type": None, "modifiers": ["external"] if cf.external else [],
+                "annotations": [], "parameters": [],
+            }
+            for cls in cf.classes.values():
+                yield from class_records(cf, cls)
+
+def write_ndjson(root: Package, outf: TextIO, class_files: Optional[ClassFiles] = None):
+    for record in records(root, class_files=class_files):
+        outf.write(json.dumps(record) + "\n")
+
+def write_csv(root: Package, outf: TextIO, class_files: Optional[ClassFiles] = None):
+    writer = csv.writer(outf, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    for record in records(root, class_files=class_files):
+        writer.writerow([
+            ' '.join(v) if isinstance(v, list) else ('' if v is None else v)
+            for v in (record[c] for c in COLUMNS)
+        ])
+
+def summary(root: Package, class_files: Optional[ClassFiles] = None) -> Dict[str, int]:
+    """Counts what's in the tree: packages with files in them, files, and each kind of declaration"""
+    if class_files is None: class_files = in_memory_class_files
+    counts = {"packages": 0, "files": 0, "external_files": 0}
+    for pkg in root.walk():
+        found = False
+        for cf in class_files(pkg):
+            found = True
+            counts["files"] += 1
+            if cf.external: counts["external_files"] += 1
+            for cls in cf.classes.values():
+                for record in class_records(cf, cls):
+                    counts[record["kind"]] = counts.get(record["kind"], 0) + 1
+        if found: counts["packages"] += 1
+    return counts
+
+def write_summary(root: Package, outf: TextIO, class_files: Optional[ClassFiles] = None):
+    for (name, count) in summary(root, class_files=class_files).items():
+        outf.write(f"{name}\t{count}\n")
+
+WRITERS: Dict[str, Callable[[Package, TextIO, Optional[ClassFiles]], None]] = {
+    'ndjson': write_ndjson,
+    'csv': write_csv,
+    'summary': write_summary,
+}
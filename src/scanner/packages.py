@@ -1,20 +1,273 @@
 
-from typing import Dict, List, Optional, Tuple, Set
+from typing import Callable, Dict, FrozenSet, Generator, Iterable, List, Optional, Tuple, Set, TYPE_CHECKING
 from enum import Enum
 from pathlib import Path 
 from dataclasses import dataclass, field, asdict
-from rich.tree import Tree
 import os
+import threading
+
+if TYPE_CHECKING: 
+    from rich.tree import Tree
 
 import re 
 
+from .paths import split_archive_path, ARCHIVE_SEPARATOR
+
+def child_depth(max_depth: Optional[int]) -> Optional[int]: 
+    return max_depth - 1 if max_depth is not None else None
+
+def elided(label: str, has_children: bool) -> str: 
+    """The label of a tree node whose children were left out by max_depth"""
+    return f"{label} …" if has_children else label
+
+class ClassFileDict(dict): 
+    """The class_files of a Package, which lets the package know whenever it is changed, and 
+    which ClassFiles were added or removed, so that the package can drop or update anything it 
+    has worked out from them"""
+
+    def __init__(self, owner: 'Package', *args, **kwargs): 
+        super().__init__(*args, **kwargs)
+        self._owner = owner 
+    
+    def _changed(self, added: Iterable['ClassFile'] = (), removed: Iterable['ClassFile'] = ()): 
+        self._owner._class_files_changed(added, removed)
+    
+    def __setitem__(self, key, value): 
+        old = self.get(key)
+        super().__setitem__(key, value)
+        self._changed([value], [old] if old is not None and old is not value else [])
+    
+    def __delitem__(self, key): 
+        old = self[key]
+        super().__delitem__(key)
+        self._changed(removed=[old])
+    
+    def update(self, *args, **kwargs): 
+        items = dict(*args, **kwargs)
+        removed = [self[k] for k in items if k in self and self[k] is not items[k]]
+        super().update(items)
+        self._changed(items.values(), removed)
+    
+    def setdefault(self, key, default=None): 
+        added = [] if key in self else [default]
+        value = super().setdefault(key, default)
+        self._changed(added)
+        return value
+    
+    def pop(self, key, *args): 
+        present = key in self
+        value = super().pop(key, *args)
+        self._changed(removed=[value] if present else [])
+        return value
+    
+    def popitem(self): 
+        item = super().popitem()
+        self._changed(removed=[item[1]])
+        return item
+    
+    def clear(self): 
+        removed = list(self.values())
+        super().clear()
+        self._changed(removed=removed)
+
+def path_key(p: Path) -> str: 
+    """The normalized form of a path that the PathIndex is keyed by: absolute and case-normalized, 
+    with an archive member's path kept as '<archive>!/<member>'"""
+    split = split_archive_path(p)
+    if split is not None: 
+        (archive, member) = split
+        return f"{path_key(archive)}{ARCHIVE_SEPARATOR}{member}"
+    return os.path.normcase(os.path.abspath(p))
+
+def parent_key(key: str) -> Optional[str]: 
+    """The key of the directory holding a keyed path, where an archive is the directory of its 
+    top-level members; None at the top of the file system"""
+    idx = key.find(ARCHIVE_SEPARATOR)
+    if idx != -1: 
+        member = key[idx + len(ARCHIVE_SEPARATOR):]
+        if '/' in member: 
+            return key[:idx + len(ARCHIVE_SEPARATOR)] + member.rsplit('/', 1)[0]
+        return key[:idx]
+    parent = os.path.dirname(key)
+    return parent if parent != key else None
+
+class PathIndex: 
+    """Finds the ClassFile for a source path, and the source paths under a directory, without 
+    touching the file system, except for one stat of the queried path if it isn't found by name 
+    (so that a path reached through a symlink, or a hard link, still finds its ClassFile)
+
+    A root Package builds one of these the first time it is asked about paths, and from then on 
+    keeps it current as ClassFiles are added to, or removed from, any package in its tree, from 
+    whichever thread they are added.
+    """
+
+    def __init__(self): 
+        self.lock = threading.RLock()
+        self.by_path: Dict[str, 'ClassFile'] = {}
+        self.by_inode: Dict[Tuple[int, int], 'ClassFile'] = {}
+        self.inodes: Dict[str, Tuple[int, int]] = {}
+        # directory key -> the keys of the indexed files directly in it, and of the directories 
+        # directly below it which hold indexed files 
+        self.files: Dict[str, Set[str]] = {}
+        self.subdirs: Dict[str, Set[str]] = {}
+    
+    def __len__(self) -> int: 
+        return len(self.by_path)
+    
+    def add(self, cf: 'ClassFile'): 
+        with self.lock: 
+            self._add(cf)
+    
+    def remove(self, cf: 'ClassFile'): 
+        with self.lock: 
+            self._remove(cf)
+    
+    def _add(self, cf: 'ClassFile'): 
+        key = path_key(cf.file)
+        self.by_path[key] = cf
+        if split_archive_path(cf.file) is None: 
+            try: 
+                st = os.stat(key)
+                self.inodes[key] = (st.st_dev, st.st_ino)
+                self.by_inode[self.inodes[key]] = cf
+            except OSError: 
+                pass
+        (parent, child) = (parent_key(key), key)
+        if parent is None: 
+            return
+        self.files.setdefault(parent, set()).add(child)
+        # link the directory into its parents, stopping as soon as a parent already knows it
+        while True: 
+            (child, parent) = (parent, parent_key(parent))
+            if parent is None: 
+                break
+            dirs = self.subdirs.setdefault(parent, set())
+            if child in dirs: 
+                break
+            dirs.add(child)
+    
+    def _remove(self, cf: 'ClassFile'): 
+        key = path_key(cf.file)
+        if self.by_path.get(key) is not cf: 
+            return
+        del self.by_path[key]
+        inode = self.inodes.pop(key, None)
+        if inode is not None and self.by_inode.get(inode) is cf: 
+            del self.by_inode[inode]
+        parent = parent_key(key)
+        if parent is None: 
+            return
+        self.files[parent].discard(key)
+        # unlink directories which no longer hold any indexed files
+        child = parent
+        while len(self.files.get(child, ())) == 0 and len(self.subdirs.get(child, ())) == 0: 
+            self.files.pop(child, None)
+            self.subdirs.pop(child, None)
+            parent = parent_key(child)
+            if parent is None or parent not in self.subdirs: 
+                break
+            self.subdirs[parent].discard(child)
+            child = parent
+    
+    def owner_of(self, p: Path) -> Optional['ClassFile']: 
+        key = path_key(p)
+        with self.lock: 
+            cf = self.by_path.get(key)
+            if cf is not None or split_archive_path(p) is not None or len(self.by_inode) == 0: 
+                return cf
+        try: 
+            st = os.stat(key)
+        except OSError: 
+            return None
+        with self.lock: 
+            return self.by_inode.get((st.st_dev, st.st_ino))
+    
+    def files_under(self, directory: Path) -> List['ClassFile']: 
+        """The ClassFiles of every indexed path below directory, at any depth"""
+        found = []
+        pending = [path_key(directory)]
+        with self.lock: 
+            while pending: 
+                d = pending.pop()
+                found.extend(self.by_path[k] for k in sorted(self.files.get(d, ())))
+                pending.extend(sorted(self.subdirs.get(d, ()), reverse=True))
+        return found
+
+# A type identifier that a ClassFile looked up while resolving, as the (package name, simple name) 
+# of the class it would resolve to
+Reference = Tuple[str, str]
+
+class ReferenceIndex: 
+    """Tracks, for a root Package, which ClassFiles refer to each (package, simple name), and which 
+    names have been added or removed since the files were last resolved
+
+    A file's type identifiers can only resolve differently if the file itself changed, or if a 
+    class was added or removed under one of the names it refers to, so after a partial rescan 
+    only those files need resolving again (see Package.resolve_changed).
+    """
+
+    def __init__(self): 
+        self.lock = threading.RLock()
+        self.referrers: Dict[Reference, Set['ClassFile']] = {}
+        self.dirty_files: Set['ClassFile'] = set()
+        self.dirty_names: Set[Reference] = set()
+    
+    @staticmethod 
+    def provided(cf: 'ClassFile') -> Set[Reference]: 
+        return {(cf.package.full_name, name) for name in cf.classes}
+    
+    def resolved(self, cf: 'ClassFile', old: Set[Reference]): 
+        """Records that cf was just resolved, and that it used to refer to old"""
+        with self.lock: 
+            self.forget(cf, old - cf.references)
+            for ref in cf.references: 
+                self.referrers.setdefault(ref, set()).add(cf)
+            self.dirty_files.discard(cf)
+    
+    def forget(self, cf: 'ClassFile', refs: Iterable[Reference]): 
+        for ref in refs: 
+            referrers = self.referrers.get(ref)
+            if referrers is not None: 
+                referrers.discard(cf)
+                if len(referrers) == 0: 
+                    del self.referrers[ref]
+    
+    def changed(self, added: Iterable['ClassFile'], removed: Iterable['ClassFile']): 
+        with self.lock: 
+            for cf in removed: 
+                self.dirty_names |= ReferenceIndex.provided(cf)
+                self.dirty_files.discard(cf)
+                self.forget(cf, cf.references)
+            for cf in added: 
+                self.dirty_names |= ReferenceIndex.provided(cf)
+                self.dirty_files.add(cf)
+    
+    def take_stale(self) -> Set['ClassFile']: 
+        """The files to resolve again: those that changed, and those that refer to a name which 
+        changed; clears the record of changes"""
+        with self.lock: 
+            stale = set(self.dirty_files)
+            for ref in self.dirty_names: 
+                stale |= self.referrers.get(ref, set())
+            self.dirty_files = set()
+            self.dirty_names = set()
+            return stale
+
 class Package: 
+    """A package in the tree of scanned sources
+
+    Adding packages (get_package, add_package) and ClassFiles (add_class_file) is safe from 
+    several threads at once, so that a tree can be filled in by a pool of examiner threads.
+    """
     
     full_path: List[str]
     parent: 'Package' 
-    class_files: Dict[str, 'ClassFile']
     packages: Dict[str, 'Package']
 
+    # Only used on a root: other package trees (e.g. the roots of the Maven modules this one 
+    # depends on) whose classes are visible when resolving type identifiers in this tree
+    dependencies: List['Package']
+
     @staticmethod
     def fromdict(root: 'Package', d: Dict[str, any]) -> 'Package': 
         pth = d.get('full_path') 
@@ -30,44 +283,175 @@ class Package:
     def __init__(self, full_path: List[str] = [], parent: 'Package' = None, class_files: Dict[str, 'ClassFile'] = None, packages: Dict[str, 'Package'] = None): 
         self.full_path = full_path
         self.parent = parent 
-        self.class_files = { **class_files } if class_files is not None else {}
+        self._lock = threading.RLock()
+        self._class_index = None
+        self._source_files = None
+        self._path_index = None
+        self._references = None
+        self._pending_class_files = None
+        self._class_files = ClassFileDict(self)
+        self.class_files = class_files if class_files is not None else {}
         self.packages = { **packages } if packages is not None else {}
+        self.dependencies = []
     
     def __repr__(self) -> str: 
         return f"Package({self.full_name} : {self.packages.keys()})"
     
+    @property 
+    def class_files(self) -> Dict[str, 'ClassFile']: 
+        if self._pending_class_files is not None: 
+            self.hydrate()
+        return self._class_files 
+    
+    @class_files.setter 
+    def class_files(self, class_files: Dict[str, 'ClassFile']): 
+        self._pending_class_files = None
+        old = list(self._class_files.values())
+        self._class_files = ClassFileDict(self, class_files)
+        self._class_files_changed(self._class_files.values(), old)
+    
+    def defer_class_files(self, loader: Callable[[], Dict[str, 'ClassFile']]): 
+        """Has this package's ClassFiles loaded by loader the first time they're asked for, rather than now"""
+        self._pending_class_files = loader 
+    
+    @property 
+    def is_hydrated(self) -> bool: 
+        return self._pending_class_files is None
+    
+    def hydrate(self): 
+        """Loads any deferred ClassFiles (see defer_class_files)"""
+        loader = self._pending_class_files
+        if loader is not None: 
+            self._pending_class_files = None 
+            self._class_files.update(loader())
+    
+    def iter_class_files(self) -> Iterable['ClassFile']: 
+        """This package's ClassFiles, which, if they haven't been loaded yet (see defer_class_files), 
+        are loaded for the caller without being kept"""
+        loader = self._pending_class_files
+        if loader is not None: 
+            return loader().values()
+        return self._class_files.values()
+    
+    def _class_files_changed(self, added: Iterable['ClassFile'] = (), removed: Iterable['ClassFile'] = ()): 
+        self._class_index = None 
+        self._source_files = None
+        root = self.find_root()
+        if root._path_index is None and root._references is None: 
+            return
+        (added, removed) = (list(added), list(removed))
+        if root._path_index is not None: 
+            for cf in removed: 
+                root._path_index.remove(cf)
+            for cf in added: 
+                root._path_index.add(cf)
+        if root._references is not None: 
+            root._references.changed(added, removed)
+    
+    def class_index(self) -> Dict[str, 'JavaClass']: 
+        """Maps the name of each top-level class in this package to the class, which is the first 
+        one found (in class_files order) if several files declare the same name"""
+        if self._class_index is None: 
+            index = {} 
+            for cf in self.class_files.values(): 
+                for (name, cls) in cf.classes.items(): 
+                    index.setdefault(name, cls)
+            self._class_index = index 
+        return self._class_index
+    
     def __getitem__(self, idx): 
         qual = idx.split(".") 
         return self.find_package(qual)
         
     def resolve_type_identifiers(self): 
-        for (name, cf) in self.class_files.items(): 
+        if self.parent is None and self._references is None: 
+            self._references = ReferenceIndex()
+        for pkg in self.walk(): 
+            for cf in pkg.class_files.values(): 
+                cf.resolve_all_class_type_identifiers()
+        if self.parent is None: 
+            # everything has just been resolved, so any earlier changes are accounted for 
+            self._references.take_stale()
+    
+    def resolve_changed(self) -> Set['ClassFile']: 
+        """Resolves the type identifiers of only those files, anywhere in this package's tree, 
+        which could resolve differently since the tree was last resolved: files that were added 
+        or changed, and files that refer to a class name that was added or removed.  The first 
+        time, every file is resolved.
+
+        Changes in the trees this one depends on (see dependencies) aren't tracked.
+
+        Returns:
+            Set[ClassFile]: the files that were resolved
+        """
+        root = self.find_root()
+        if root._references is None: 
+            root.resolve_type_identifiers()
+            return {cf for pkg in root.walk() for cf in pkg.class_files.values()}
+        stale = {cf for cf in root._references.take_stale() if cf.is_in(root)}
+        for cf in stale: 
             cf.resolve_all_class_type_identifiers()
-        for (name, pkg) in self.packages.items(): 
-            pkg.resolve_type_identifiers()
+        return stale
     
-    def resolve_package_name(self, pkg_name: str) -> Optional['Package']:
+    def referrers_of(self, pkg_name: str, name: str) -> Set['ClassFile']: 
+        """The files in this package's tree which refer to the class name in the named package, 
+        as of their last resolution"""
         root = self.find_root()
-        steps = pkg_name.split('.') 
-        return root.find_package(steps)
+        if root._references is None: 
+            root.resolve_type_identifiers()
+        with root._references.lock: 
+            return set(root._references.referrers.get((pkg_name, name), ()))
+    
+    def walk(self) -> Generator['Package', None, None]: 
+        """Yields this package and then, depth-first, every package below it"""
+        yield self 
+        for pkg in self.packages.values(): 
+            yield from pkg.walk()
+    
+    def resolve_package_names(self, pkg_name: str) -> List['Package']: 
+        """Finds the packages with the given name, in this tree and in the trees it depends on"""
+        root = self.find_root()
+        steps = pkg_name.split('.') if pkg_name != '' else []
+        found = [r.find_package(steps) for r in [root, *root.dependencies]]
+        return [pkg for pkg in found if pkg is not None]
+
+    def resolve_package_name(self, pkg_name: str) -> Optional['Package']:
+        found = self.resolve_package_names(pkg_name)
+        return found[0] if len(found) > 0 else None
     
     def resolve_fully_qualified_name(self, pkg_name: str, name: str) -> Optional['JavaClass']:
-        pkg = self.resolve_package_name(pkg_name)
-        if pkg is not None: 
-            for (_, cf) in self.class_files.items():
-                if name in cf.classes: 
-                    return cf.classes[name]
+        for pkg in self.resolve_package_names(pkg_name): 
+            cls = pkg.class_index().get(name)
+            if cls is not None: 
+                return cls
         return None
-
-    def as_tree(self) -> Tree: 
-        t = Tree(self.name) 
+    
+    def merge(self, other: 'Package'): 
+        """Moves every ClassFile from another package tree into the same-named packages of this one"""
+        for pkg in list(other.walk()): 
+            if len(pkg.class_files) == 0: 
+                continue 
+            target = self.get_package(pkg.full_path)
+            for (name, cf) in pkg.class_files.items(): 
+                cf.package = target 
+                target.class_files[name] = cf 
+
+    def as_tree(self, max_depth: Optional[int] = None) -> 'Tree': 
+        """Builds a rich Tree of this package and everything in it, or only down to max_depth levels 
+        below it, in which case nothing below that depth is visited at all"""
+        from rich.tree import Tree
+        label = f"{self.name} (external)" if self.is_external else self.name
+        if max_depth == 0: 
+            return Tree(elided(label, len(self.packages) > 0 or len(self.class_files) > 0))
+        t = Tree(label) 
         for (n, cf) in self.class_files.items(): 
-            t.add(cf.as_tree()) 
+            t.add(cf.as_tree(max_depth=child_depth(max_depth))) 
         for (n, p) in self.packages.items(): 
-            t.add(p.as_tree())
+            t.add(p.as_tree(max_depth=child_depth(max_depth)))
         return t
     
-    def package_tree(self, include_files: bool = False) -> Tree: 
+    def package_tree(self, include_files: bool = False) -> 'Tree': 
+        from rich.tree import Tree
         lbl = f"[cyan]{self.name}[/cyan]"
         t = Tree(lbl)
         if include_files: 
@@ -87,6 +471,11 @@ class Package:
     @property
     def full_name(self) -> str: 
         return '.'.join(self.full_path)
+    
+    @property 
+    def is_external(self) -> bool: 
+        """True if every source file in this package came from an external archive"""
+        return len(self.class_files) > 0 and all(cf.external for cf in self.class_files.values())
 
     def asdict(self) -> Dict[str, any]: 
         return {
@@ -122,27 +511,69 @@ class Package:
             return self.add_package(head).get_package(rest) 
     
     def add_package(self, name: str) -> 'Package': 
-        if name in self.packages: 
-            return self.packages.get(name) 
-        else: 
-            p = Package(self.full_path + [name], parent=self) 
-            self.packages[name] = p 
+        p = self.packages.get(name)
+        if p is not None: 
             return p 
+        with self._lock: 
+            # another thread may have added it while we waited for the lock
+            if name not in self.packages: 
+                self.packages[name] = Package(self.full_path + [name], parent=self) 
+            return self.packages[name]
+    
+    def add_class_file(self, name: str, cf: 'ClassFile'): 
+        with self._lock: 
+            self.class_files[name] = cf 
+    
+    def remove_class_file(self, cf: 'ClassFile'): 
+        with self._lock: 
+            for (name, other) in list(self.class_files.items()): 
+                if other is cf: 
+                    del self.class_files[name]
         
-    def contains_file_at_path(self, p: Path) -> bool: 
-        for cf in self.class_files.values(): 
-            if cf.file.samefile(p): 
-                return True
-        for pkg in self.packages.values(): 
-            if pkg.contains_file_at_path(p): 
+    def path_index(self) -> PathIndex: 
+        """The index of the source paths of every ClassFile in this package's tree, which is 
+        shared by (and kept on the root of) the whole tree"""
+        root = self.find_root()
+        if root._path_index is None: 
+            with root._lock: 
+                if root._path_index is None: 
+                    index = PathIndex()
+                    with index.lock: 
+                        # published before it's filled in, so that a ClassFile added by another thread 
+                        # meanwhile is added to it too, once it's ready (adding one twice is harmless)
+                        root._path_index = index
+                        for pkg in root.walk(): 
+                            for cf in list(pkg.class_files.values()): 
+                                index._add(cf)
+        return root._path_index
+    
+    def contains(self, pkg: 'Package') -> bool: 
+        """True if pkg is this package or one below it"""
+        while pkg is not None and len(pkg.full_path) >= len(self.full_path): 
+            if pkg is self: 
                 return True
+            pkg = pkg.parent
         return False
+
+    def owner_of(self, p: Path) -> Optional['ClassFile']: 
+        """The ClassFile, in this package or below it, for the source at path p"""
+        cf = self.path_index().owner_of(p)
+        return cf if cf is not None and self.contains(cf.package) else None
+    
+    def files_under(self, directory: Path) -> List['ClassFile']: 
+        """The ClassFiles, in this package or below it, for every source under a directory (or archive)"""
+        return [cf for cf in self.path_index().files_under(directory) if self.contains(cf.package)]
+        
+    def contains_file_at_path(self, p: Path) -> bool: 
+        return self.owner_of(p) is not None
     
-    def source_locations(self) -> Set[Path]: 
-        return set(cf.file.parent for (_, cf) in self.class_files.items())
+    def source_locations(self) -> FrozenSet[Path]: 
+        return frozenset(f.parent for f in self.source_files())
     
-    def source_files(self) -> Set[Path]: 
-        return set(cf.file for (_, cf) in self.class_files.items())
+    def source_files(self) -> FrozenSet[Path]: 
+        if self._source_files is None: 
+            self._source_files = frozenset(cf.file for cf in self.class_files.values())
+        return self._source_files
 
 @dataclass
 class JavaField: 
@@ -187,6 +618,21 @@ class JavaParameter:
     def fromdict(d: Dict[str, any]) -> 'JavaParameter': 
         return JavaParameter(**d)
 
+@dataclass
+class JavaCallSite: 
+    """A method call (kind 'call') or constructor call (kind 'new') in the body of a method or class"""
+    kind: str 
+    # the name of the method called, or the simple name of the class constructed
+    name: str 
+    # the source text of what the method is called on (e.g. 'this', 'foo.bar()'), if anything
+    receiver: Optional[str]
+    # the byte offset in its file of the method's name, or of the 'new'
+    offset: int 
+
+    @staticmethod 
+    def fromdict(d: Dict[str, any]) -> 'JavaCallSite': 
+        return JavaCallSite(**d)
+
 @dataclass
 class JavaMethod: 
     name: str 
@@ -194,6 +640,14 @@ class JavaMethod:
     parameters: List[JavaParameter]
     modifiers: List[str] = field(default_factory=list)
     annotations: List[JavaAnnotation] = field(default_factory=list)
+    # the structural fingerprint of the method's body, if it has one that's big enough (see clones)
+    fingerprint: Optional[str] = None
+    # the calls made in the method's body, in the order they appear (see calls)
+    calls: List[JavaCallSite] = field(default_factory=list)
+
+    @property 
+    def signature(self) -> str: 
+        return f"{self.name}({', '.join(p.type for p in self.parameters)})"
 
     @property 
     def is_public(self) -> bool: return 'public' in self.modifiers
@@ -201,9 +655,13 @@ class JavaMethod:
     @property 
     def is_static(self) -> bool: return 'static' in self.modifiers
 
-    def as_tree(self) -> Tree: 
+    def as_tree(self, max_depth: Optional[int] = None) -> 'Tree': 
+        from rich.tree import Tree
         pubs = ','.join(self.modifiers)
-        t = Tree(f"METHOD {self.name}:{self.return_type} ({pubs})")
+        label = f"METHOD {self.name}:{self.return_type} ({pubs})"
+        if max_depth == 0: 
+            return Tree(elided(label, len(self.parameters) > 0 or len(self.annotations) > 0))
+        t = Tree(label)
         for p in self.parameters: 
             t.add(f"PARAM {p.name} {p.type}")
         for a in self.annotations: 
@@ -218,6 +676,8 @@ class JavaMethod:
             parameters = [JavaParameter.fromdict(pd) for pd in d.get('parameters')],
             modifiers=d.get('modifiers', []), 
             annotations=[JavaAnnotation.fromdict(a) for a in d.get("annotations", [])],
+            fingerprint=d.get('fingerprint'),
+            calls=[JavaCallSite.fromdict(c) for c in d.get('calls', [])],
         )
 
 class JavaClassKind(Enum): 
@@ -230,6 +690,8 @@ def custom_asdict_factory(data):
     def convert_value(obj):
         if isinstance(obj, Enum):
             return obj.value
+        if isinstance(obj, set): 
+            return sorted(obj)
         return obj
 
     return dict((k, convert_value(v)) for k, v in data)
@@ -245,25 +707,50 @@ class JavaClass:
     type_identifiers: Set[str] = field(default_factory=set)
     modifiers: List[str] = field(default_factory=list)
     annotations: List[JavaAnnotation] = field(default_factory=list)
-
-    def as_tree(self) -> Tree: 
+    # the structural fingerprint of the class body (see clones)
+    fingerprint: Optional[str] = None
+    # the calls made outside of the class's methods: in constructors, initializers and field initializers
+    calls: List[JavaCallSite] = field(default_factory=list)
+    # the overloads of a method that methods, being keyed by name, doesn't keep: all but the last
+    overloads: List[JavaMethod] = field(default_factory=list)
+
+    def all_methods(self) -> List[JavaMethod]: 
+        """Every method of the class, including the overloads that methods doesn't keep"""
+        return self.overloads + list(self.methods.values())
+
+    def is_overloaded(self, name: str) -> bool: 
+        return any(m.name == name for m in self.overloads)
+
+    def as_tree(self, max_depth: Optional[int] = None) -> 'Tree': 
+        from rich.tree import Tree
         mod_string = ",".join(self.modifiers)
-        t = Tree(f"{self.kind.value} {self.name} ({mod_string})")
+        label = f"{self.kind.value} {self.name} ({mod_string})"
+        if max_depth == 0: 
+            members = [self.annotations, self.fields, self.methods, self.classes, self.type_identifiers]
+            return Tree(elided(label, any(len(m) > 0 for m in members)))
+        t = Tree(label)
         for a in self.annotations: 
             t.add(f"ANNOTATION {a}")
         for (n, f) in self.fields.items(): 
-            ft = Tree(f"FIELD {f.name}:{f.type} ({f.modstring})")
+            field_label = f"FIELD {f.name}:{f.type} ({f.modstring})"
+            if max_depth == 1: 
+                t.add(elided(field_label, len(f.annotations) > 0))
+                continue
+            ft = Tree(field_label)
             for ann in f.annotations: 
                 ft.add(f"ANNOTATION {ann}")
             t.add(ft)
         for (n, m) in self.methods.items(): 
-            t.add(m.as_tree())
+            t.add(m.as_tree(max_depth=child_depth(max_depth)))
         for (n, c) in self.classes.items(): 
-            t.add(c.as_tree())
+            t.add(c.as_tree(max_depth=child_depth(max_depth)))
         if len(self.type_identifiers) > 0: 
-            tis = Tree("TYPE_IDENTIFIERS")
-            for ti in self.type_identifiers: tis.add(ti)
-            t.add(tis) 
+            if max_depth == 1: 
+                t.add(elided("TYPE_IDENTIFIERS", True))
+            else: 
+                tis = Tree("TYPE_IDENTIFIERS")
+                for ti in self.type_identifiers: tis.add(ti)
+                t.add(tis) 
         return t
     
     def __hash__(self) -> int: 
@@ -284,7 +771,10 @@ class JavaClass:
             classes={n: JavaClass.fromdict(f) for (n, f) in d.get('classes').items()},
             modifiers=d.get("modifiers", []), 
             annotations=[JavaAnnotation.fromdict(a) for a in d.get("annotations", [])],
-            type_identifiers=set(d.get('type_identifiers'))
+            type_identifiers=set(d.get('type_identifiers')), 
+            fingerprint=d.get('fingerprint'),
+            calls=[JavaCallSite.fromdict(c) for c in d.get('calls', [])],
+            overloads=[JavaMethod.fromdict(m) for m in d.get('overloads', [])],
         )
 
 class ClassFile: 
@@ -297,22 +787,52 @@ class ClassFile:
     classes: Dict[str, JavaClass]
     resolved_type_identifiers: Dict[str, Dict[str, JavaClass]]
 
+    # True for sources that came from a third-party archive (e.g. a -sources.jar), 
+    # rather than from the tree being scanned
+    external: bool
+
+    # The names looked up by the last resolution of this file's type identifiers 
+    references: Set[Reference]
+
+    # A digest of the source, if it was fully examined, so that an unchanged file needn't be examined again
+    digest: Optional[str]
+
     def __init__(
         self, 
         package: Package, 
         file: Path, 
         name: str, 
         classes: Dict[str, JavaClass] = None,
-        imports: List[Tuple[str, str]] = None
+        imports: List[Tuple[str, str]] = None,
+        external: bool = False, 
+        digest: Optional[str] = None
     ):
         self.package = package 
         self.file = file 
         self.name = name 
         self.classes = classes or {}
         self.imports = imports or []
+        self.external = external
+        self.digest = digest
         self.resolved_type_identifiers = {}
+        self.references = set()
+    
+    def is_in(self, root: Package) -> bool: 
+        """True if this file is (still) in the tree under root"""
+        return self.package.find_root() is root and self.package.class_files.get(self.name) is self
+    
+    def reference(self, type_identifier: str) -> Reference: 
+        """The (package, simple name) that a type identifier would resolve to, given this file's imports"""
+        for (pkg, name) in self.imports: 
+            if name == type_identifier: 
+                return (pkg, name)
+        return (self.package.full_name, type_identifier)
     
     def resolve_all_class_type_identifiers(self):
+        old = self.references
+        self.references = {
+            self.reference(type_id) for cls in self.classes.values() for type_id in cls.type_identifiers
+        }
         resolved = {}
         for (clsname, cls) in self.classes.items(): 
             pairs = [
@@ -323,6 +843,9 @@ class ClassFile:
                 (name, cls) for (name, cls) in pairs if cls is not None
             }
         self.resolved_type_identifiers = resolved
+        index = self.package.find_root()._references
+        if index is not None: 
+            index.resolved(self, old)
     
     def resolve_type_identifier(self, type_identifier: str) -> Optional[JavaClass]:
         """Turns a type identifier into a JavaClass, *or* None if we can't resolve the identifier.
@@ -333,7 +856,8 @@ class ClassFile:
 
         This only returns references to other source files if we've seen them, so for example 
         "List" will return a None _even if_ we've imported java.util.List, since we don't 
-        see the source of java.util.List
+        see the source of java.util.List (dependency sources can be brought into the tree from 
+        their -sources.jar archives, see examiner.archive_sources)
 
         Args:
             type_identifier (str): A String identifier for a Java type
@@ -341,13 +865,7 @@ class ClassFile:
         Returns:
             Optional[JavaClass]: A reference to the Java class for the type, if we've seen its source, or None otherwise.
         """
-        for (pkg, name) in self.imports: 
-            if name == type_identifier: 
-                return self.package.resolve_fully_qualified_name(pkg, name) 
-        for (_, cf) in self.package.class_files.items(): 
-            if type_identifier in cf.classes: 
-                return cf.classes[type_identifier]
-        return None
+        return self.package.resolve_fully_qualified_name(*self.reference(type_identifier))
 
     @staticmethod 
     def fromdict(root: Package, d: Dict[str, any]) -> 'ClassFile': 
@@ -360,7 +878,9 @@ class ClassFile:
             ],
             classes={
                 n: JavaClass.fromdict(cd) for (n, cd) in d.get('classes').items()
-            }
+            },
+            external=d.get('external', False), 
+            digest=d.get('digest')
         )
     
     def asdict(self) -> Dict[str, any]: 
@@ -373,22 +893,40 @@ class ClassFile:
             ],
             "classes": {
                 name: cls.asdict(dict_factory=custom_asdict_factory) for (name, cls) in self.classes.items()
-            }
+            },
+            "external": self.external,
+            "digest": self.digest,
+            "resolved_type_identifiers": self.resolved_type_identifiers_asdict()
+        }
+    
+    def resolved_type_identifiers_asdict(self) -> Dict[str, List[List[str]]]: 
+        return {
+            clsname: sorted([type_id, cls.name] for (type_id, cls) in resolved)
+            for (clsname, resolved) in self.resolved_type_identifiers.items()
         }
     
-    def as_tree(self) -> Tree: 
+    def as_tree(self, max_depth: Optional[int] = None) -> 'Tree': 
+        from rich.tree import Tree
+        if max_depth == 0: 
+            return Tree(elided(f"FILE {self.name}", True))
         t = Tree(f"FILE {self.name}")
+        if self.external: 
+            t.add(f"EXTERNAL {self.file.as_posix()}")
         t.add(f"PACKAGE {self.package.full_name}")
         for (p, imp) in self.imports:
             t.add(f"IMPORT {p} {imp}")
         for (n, c) in self.classes.items(): 
-            t.add(c.as_tree())
+            t.add(c.as_tree(max_depth=child_depth(max_depth)))
         total_res_size = sum(len(d) for d in self.resolved_type_identifiers.values())
-        if total_res_size > 0: 
+        if total_res_size > 0 and max_depth == 1: 
+            t.add(elided("RESOLVED TYPE IDENTIFIERS", True))
+        elif total_res_size > 0: 
             rr = Tree("RESOLVED TYPE IDENTIFIERS")
             t.add(rr) 
             for (clsname, resdict) in self.resolved_type_identifiers.items(): 
-                if len(resdict) > 0: 
+                if len(resdict) > 0 and max_depth == 2: 
+                    rr.add(elided(clsname, True))
+                elif len(resdict) > 0: 
                     rest = Tree(clsname)
                     rr.add(rest) 
                     for (type_id, cls) in resdict: 
@@ -400,5 +938,6 @@ class ClassFile:
             raise ValueError(f"Class with name {clazz.name} already exists")
         else: 
             self.classes[clazz.name] = clazz
+            self.package._class_files_changed([self])
     
     
\ No newline at end of file
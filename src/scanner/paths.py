@@ -1,23 +1,84 @@
-
-from typing import Generator, List, Dict
+from typing import Generator, List, Dict, Optional, Tuple
 
 from pathlib import Path 
 import re 
+import zipfile
 
 JAVA_FILENAME = re.compile("(.*)\\.java")
 XML_FILENAME = re.compile("(.*)\\.xml")
+TYPESCRIPT_FILENAME = re.compile("(.*)\\.ts")
+ARCHIVE_FILENAME = re.compile("(.*)\\.(jar|zip)$")
+POM_FILENAME = re.compile("pom\\.xml$")
+
+# Build output, VCS metadata and the like, which never hold sources we want to scan
+NON_SOURCE_DIRECTORY = re.compile("target|build|out|bin|node_modules|\\..*")
+
+# Separates an archive from the path of one of its members, as in 'lib-sources.jar!/com/acme/Foo.java'
+ARCHIVE_SEPARATOR = "!/"
 
 def search_java_files(p: Path) -> Generator[Path, None, None]: 
     return search_files(p, JAVA_FILENAME)
 
-def search_files(p: Path, filename_regex: re.Pattern) -> Generator[Path, None, None]: 
+def search_archives(p: Path) -> Generator[Path, None, None]: 
+    return search_files(p, ARCHIVE_FILENAME)
+
+def search_files(p: Path, filename_regex: re.Pattern, exclude_dirs: Optional[re.Pattern] = None) -> Generator[Path, None, None]: 
     if p.is_dir(): 
         for f in p.iterdir(): 
             if f.is_file(): 
                 m = filename_regex.match(f.name) 
                 if m: 
                     yield f 
-            else: 
-                yield from search_files(f, filename_regex=filename_regex)
+            elif exclude_dirs is None or not exclude_dirs.fullmatch(f.name): 
+                yield from search_files(f, filename_regex=filename_regex, exclude_dirs=exclude_dirs)
     else: 
-        yield p
\ No newline at end of file
+        yield p
+
+def is_archive(p: Path) -> bool: 
+    return p.is_file() and ARCHIVE_FILENAME.match(p.name) is not None
+
+def archive_member_path(archive: Path, member: str) -> Path: 
+    return Path(f"{archive.as_posix()}{ARCHIVE_SEPARATOR}{member}")
+
+def split_archive_path(p: Path) -> Optional[Tuple[Path, str]]: 
+    """Splits a path built by archive_member_path back into (archive, member), or returns 
+    None if the path points at a regular file"""
+    s = p.as_posix()
+    idx = s.find(ARCHIVE_SEPARATOR)
+    if idx == -1: 
+        return None
+    return Path(s[:idx]), s[idx+len(ARCHIVE_SEPARATOR):]
+
+def search_archive_files(
+    archive: Path, 
+    filename_regex: re.Pattern, 
+    max_size: Optional[int] = None, 
+    head_bytes: int = 64 * 1024
+) -> Generator[Tuple[Path, bytes, int], None, None]: 
+    """Streams the matching members of a jar or zip archive, without extracting them to disk
+
+    Args:
+        archive (Path): a .jar or .zip file
+        filename_regex (re.Pattern): matched against the file name of each member
+        max_size (Optional[int]): if given, only the first head_bytes of members larger than this 
+            are read, so that a huge member is never held in memory whole
+        head_bytes (int): how much of an oversized member is read
+
+    Yields:
+        Tuple[Path, bytes, int]: the member's path (see archive_member_path), its contents (or the 
+            head of them), and its uncompressed size
+    """
+    with zipfile.ZipFile(archive) as zf: 
+        for info in zf.infolist(): 
+            if info.is_dir(): 
+                continue
+            if filename_regex.match(info.filename.rsplit('/', 1)[-1]): 
+                if max_size is not None and info.file_size > max_size: 
+                    with zf.open(info) as inf: 
+                        bs = inf.read(head_bytes)
+                else: 
+                    bs = zf.read(info)
+                yield archive_member_path(archive, info.filename), bs, info.file_size
+
+def search_archive_java_files(archive: Path, max_size: Optional[int] = None, head_bytes: int = 64 * 1024) -> Generator[Tuple[Path, bytes, int], None, None]: 
+    return search_archive_files(archive, JAVA_FILENAME, max_size=max_size, head_bytes=head_bytes)
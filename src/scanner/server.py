@@ -0,0 +1,314 @@
+"""A resident model daemon, and the client that talks to it
+
+`scanner serve` builds (or loads) the package tree once, and then answers queries about it over
+a Unix socket, so that the interpreter start-up, grammar loading, snapshot loading and type
+resolution are only paid for once rather than on every call.
+
+The protocol is JSON lines: each request is one JSON object on its own line, with an "op" naming
+the query, and each gets back one JSON object on its own line, either {"ok": true, "result": ...}
+or {"ok": false, "error": "..."}.  A connection may send any number of requests.  The ops are:
+
+  * ping: {"op": "ping"}
+  * lookup: {"op": "lookup", "name": "com.acme.Foo"} for a class, {"op": "lookup", "name": "com.acme"}
+    for a package, or {"op": "lookup", "path": "src/com/acme/Foo.java"} for a source file
+  * annotations: {"op": "annotations", "name": "Deprecated"}, the classes, fields and methods
+    carrying an annotation
+  * dependencies: {"op": "dependencies", "name": "com.acme.Foo", "reverse": false}, the classes
+    that a class refers to or, with reverse, the classes that refer to it
+  * rescan: {"op": "rescan", "paths": [...]}, re-examines the given files (or the Java sources
+    in the given directories), dropping any which no longer exist, and then re-resolves only the
+    files that the change could affect; paths that aren't Java sources are ignored
+  * shutdown: {"op": "shutdown"}, stops the daemon once the response is sent
+
+Only this module's client half (request) is imported by the thin CLI clients, so they don't load
+rich or tree-sitter.
+"""
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+from .packages import Package, ClassFile, JavaClass, custom_asdict_factory
+from .paths import search_java_files, JAVA_FILENAME
+
+if TYPE_CHECKING:
+    from .examiner import ScanLimits
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = '.scanner.sock'
+
+class RequestError(Exception):
+    """A request that can't be answered, e.g. because it names an unknown op"""
+
+def class_record(cf: ClassFile, cls: JavaClass) -> Dict[str, any]:
+    return {
+        "qualified_name": qualified_name(cf, cls.name),
+        "package": cf.package.full_name,
+        "file": cf.file.as_posix(),
+        **cls.asdict(dict_factory=custom_asdict_factory),
+    }
+
+def file_record(cf: ClassFile) -> Dict[str, any]:
+    return {
+        "package": cf.package.full_name,
+        "file": cf.file.as_posix(),
+        "name": cf.name,
+        "external": cf.external,
+        "imports": [[p, imp] for (p, imp) in cf.imports],
+        "classes": sorted(cf.classes),
+    }
+
+def qualified_name(cf: ClassFile, name: str) -> str:
+    return f"{cf.package.full_name}.{name}" if cf.package.full_name != '' else name
+
+def walk_classes(cls: JavaClass, prefix: str = '') -> Iterable[tuple]:
+    """Yields (dotted name, JavaClass) for a class and every class nested in it"""
+    name = f"{prefix}{cls.name}"
+    yield (name, cls)
+    for inner in cls.classes.values():
+        yield from walk_classes(inner, prefix=name + '.')
+
+class ModelServer:
+    """Answers queries against a package tree, which it keeps current through rescans
+
+    Every request holds the model's lock while it runs, so a rescan never overlaps a query.
+    """
+
+    def __init__(self, root: Package, limits: Optional['ScanLimits'] = None):
+        self.root = root
+        self.limits = limits
+        self.lock = threading.RLock()
+        self.server: Optional[socketserver.BaseServer] = None
+        self.stopping = False
+        # id(JavaClass) -> (ClassFile, the class's dotted name within it), for naming the targets of resolved type identifiers
+        self._owners: Optional[Dict[int, tuple]] = None
+        self.ops: Dict[str, Callable[[Dict[str, any]], any]] = {
+            'ping': lambda req: 'pong',
+            'lookup': self.lookup,
+            'annotations': self.annotations,
+            'dependencies': self.dependencies,
+            'rescan': self.rescan,
+            'shutdown': self.shutdown,
+        }
+
+    def handle(self, req: Dict[str, any]) -> Dict[str, any]:
+        try:
+            if not isinstance(req, dict):
+                raise RequestError(f"Expected a JSON object, not {req!r}")
+            op = self.ops.get(req.get('op'))
+            if op is None:
+                raise RequestError(f"Unknown op {req.get('op')!r}, expected one of {sorted(self.ops)}")
+            with self.lock:
+                return {"ok": True, "result": op(req)}
+        except RequestError as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            logger.exception("Failed to answer %s", req)
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    def owners(self) -> Dict[int, tuple]:
+        if self._owners is None:
+            self._owners = {
+                id(cls): (cf, name)
+                for pkg in self.root.walk()
+                for cf in pkg.class_files.values()
+                for top in cf.classes.values()
+                for (name, cls) in walk_classes(top)
+            }
+        return self._owners
+
+    def find_class(self, name: str) -> Optional[tuple]:
+        """Finds a class by its qualified name, which may name a nested class (com.acme.Outer.Inner)"""
+        steps = name.split('.')
+        for i in range(len(steps) - 1, -1, -1):
+            pkg = self.root.find_package(steps[:i])
+            if pkg is None:
+                continue
+            cls = pkg.class_index().get(steps[i])
+            for step in steps[i + 1:]:
+                cls = cls.classes.get(step) if cls is not None else None
+            if cls is not None:
+                cf = self.owners().get(id(cls), (None,))[0]
+                if cf is not None:
+                    return (cf, cls)
+        return None
+
+    def lookup(self, req: Dict[str, any]) -> Optional[Dict[str, any]]:
+        if 'path' in req:
+            cf = self.root.owner_of(Path(req['path']))
+            return file_record(cf) if cf is not None else None
+        name = req.get('name')
+        if name is None:
+            raise RequestError("lookup needs a name or a path")
+        found = self.find_class(name)
+        if found is not None:
+            return class_record(*found)
+        pkg = self.root[name] if name != '' else self.root
+        if pkg is not None:
+            return {
+                "package": pkg.full_name,
+                "files": sorted(cf.file.as_posix() for cf in pkg.class_files.values()),
+                "packages": sorted(pkg.packages),
+            }
+        return None
+
+    def annotations(self, req: Dict[str, any]) -> List[Dict[str, any]]:
+        name = req.get('name')
+        if name is None:
+            raise RequestError("annotations needs a name")
+        # match @Foo and @com.acme.Foo alike
+        name = name.lstrip('@')
+        matches = lambda annotations: any(a.name == name or a.name.endswith('.' + name) for a in annotations)
+        found = []
+        for pkg in self.root.walk():
+            for cf in pkg.class_files.values():
+                for top in cf.classes.values():
+                    for (clsname, cls) in walk_classes(top):
+                        where = {"class": qualified_name(cf, clsname), "file": cf.file.as_posix()}
+                        if matches(cls.annotations):
+                            found.append({**where, "kind": "class", "member": None})
+                        for f in cls.fields.values():
+                            if matches(f.annotations):
+                                found.append({**where, "kind": "field", "member": f.name})
+                        for m in cls.methods.values():
+                            if matches(m.annotations):
+                                found.append({**where, "kind": "method", "member": m.name})
+        return found
+
+    def dependencies(self, req: Dict[str, any]) -> List[str]:
+        name = req.get('name')
+        if name is None:
+            raise RequestError("dependencies needs a name")
+        found = self.find_class(name)
+        if found is None:
+            raise RequestError(f"No class {name}")
+        (cf, cls) = found
+        owners = self.owners()
+        named = lambda target: qualified_name(*owners[id(target)]) if id(target) in owners else target.name
+        if not req.get('reverse', False):
+            return sorted({named(target) for (_, target) in cf.resolved_type_identifiers.get(cls.name, ())})
+        return sorted({
+            qualified_name(other, clsname)
+            for other in self.root.referrers_of(cf.package.full_name, cls.name)
+            for (clsname, resolved) in other.resolved_type_identifiers.items()
+            if any(target is cls for (_, target) in resolved)
+        })
+
+    def rescan(self, req: Dict[str, any]) -> Dict[str, List[str]]:
+        from .examiner import examine_guarded, ScanReport
+
+        paths = req.get('paths')
+        if not isinstance(paths, list):
+            raise RequestError("rescan needs a list of paths")
+        report = ScanReport()
+        (targets, ignored) = self.rescan_targets(Path(x) for x in paths)
+        (rescanned, removed) = ([], [])
+        for p in targets:
+            old = self.root.owner_of(p)
+            if old is not None:
+                old.package.remove_class_file(old)
+            if p.is_file():
+                if examine_guarded(p, self.root, limits=self.limits, report=report) is not None:
+                    rescanned.append(p.as_posix())
+            elif old is not None:
+                removed.append(p.as_posix())
+        self._owners = None
+        resolved = self.root.resolve_changed()
+        return {
+            "rescanned": rescanned,
+            "removed": removed,
+            "resolved": len(resolved),
+            "skipped": [p.as_posix() for (p, _) in report.skipped],
+            "header_only": [p.as_posix() for (p, _) in report.degraded],
+            "ignored": [p.as_posix() for p in ignored],
+        }
+
+    def rescan_targets(self, paths: Iterable[Path]) -> Tuple[List[Path], List[Path]]:
+        """The Java sources to rescan for the given paths, and the paths that aren't Java sources
+
+        A directory stands for the files the model has under it (which may since have been deleted) 
+        and the Java sources now in it.
+        """
+        (targets, ignored) = ({}, [])
+        for p in paths:
+            if p.is_dir():
+                for cf in self.root.files_under(p):
+                    if not cf.external:
+                        targets[cf.file] = True
+                for f in search_java_files(p):
+                    targets.setdefault(f, True)
+            elif JAVA_FILENAME.fullmatch(p.name) or self.root.owner_of(p) is not None:
+                targets[p] = True
+            else:
+                ignored.append(p)
+        return (list(targets), ignored)
+
+    def shutdown(self, req: Dict[str, any]) -> bool:
+        # the server is stopped once the response has been sent (see serve)
+        self.stopping = True
+        return True
+
+    def serve(self, socket_path: Path):
+        """Listens on a Unix socket until a shutdown request arrives"""
+        model = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if line.strip() == b'':
+                        continue
+                    try:
+                        req = json.loads(line)
+                    except ValueError as e:
+                        resp = {"ok": False, "error": f"Bad request: {e}"}
+                    else:
+                        resp = model.handle(req)
+                    self.wfile.write(json.dumps(resp).encode() + b"\n")
+                    self.wfile.flush()
+                    if model.stopping:
+                        # shutdown() waits for serve_forever to return, so it can't be called from here
+                        threading.Thread(target=self.server.shutdown, daemon=True).start()
+                        return
+
+        if socket_in_use(socket_path):
+            raise FileExistsError(f"A daemon is already listening on {socket_path.as_posix()}")
+        if socket_path.exists():
+            # left behind by a daemon that didn't shut down cleanly
+            socket_path.unlink()
+        with socketserver.ThreadingUnixStreamServer(os.fspath(socket_path), Handler) as server:
+            server.daemon_threads = True
+            self.server = server
+            logger.info("Serving on %s", socket_path.as_posix())
+            try:
+                server.serve_forever()
+            finally:
+                self.server = None
+                if socket_path.exists():
+                    socket_path.unlink()
+
+def socket_in_use(socket_path: Path) -> bool:
+    """Whether something is listening on the socket, as opposed to it being missing or stale"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(os.fspath(socket_path))
+        except OSError:
+            return False
+    return True
+
+def request(socket_path: Path, req: Dict[str, any], timeout: Optional[float] = None) -> Dict[str, any]:
+    """Sends one request to a running daemon and returns its response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(os.fspath(socket_path))
+        with s.makefile('rwb') as f:
+            f.write(json.dumps(req).encode() + b"\n")
+            f.flush()
+            line = f.readline()
+    if line == b'':
+        raise ConnectionError(f"{socket_path.as_posix()} closed the connection without answering")
+    return json.loads(line)
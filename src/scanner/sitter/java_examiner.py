@@ -1,22 +1,28 @@
 
 import sys 
+import re
 from typing import Dict, List, Iterable, TypeVar, Callable, Generic, Generator
 from pathlib import Path 
-from rich.tree import Tree
-from rich.console import Console 
 from itertools import groupby
 from functools import reduce
 
-from tree_sitter import Language, Parser, Node
-from tree_sitter_language_pack import get_language, get_parser
+from tree_sitter import Language, Parser, Node, Tree
 
 from ..packages import * 
 from .node import TypedNode
+from ..clones import fingerprint
+from .languages import get_language, get_parser, parse
 
-JAVA_LANG = get_language('java')
-JAVA_PARSER = get_parser('java')
+def __getattr__(name: str): 
+    # JAVA_LANG and JAVA_PARSER used to be built at import time; keep them reachable 
+    # for existing callers without paying for the grammar until someone asks.
+    if name == 'JAVA_LANG': 
+        return get_language('java')
+    elif name == 'JAVA_PARSER': 
+        return get_parser('java')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def convert_to_dict(node: Node, lang: Language = JAVA_LANG) -> Dict[str, any]: 
+def convert_to_dict(node: Node, lang: Optional[Language] = None, internal_values: bool = True) -> Dict[str, any]: 
     """Converts a TreeSitter Node into a tree-of-dicts that we use as a lightweight AST 
 
     This drops certain kinds of Nodes (mostly token-like nodes) and standardizes out the 
@@ -24,12 +30,19 @@ def convert_to_dict(node: Node, lang: Language = JAVA_LANG) -> Dict[str, any]:
     TypedNode objects, it'd probably be easy to just adapt the TypedNode stuff to work 
     directly from the TreeSitter Nodes themselves.
 
+    Copying out the text of every non-terminal node costs time proportional to the size of 
+    the file times the depth of the tree, so internal_values=False leaves it out; a TypedNode 
+    given the source bytes reads those values out of the source when they're asked for.
+
     Args:
         node (Node): a Node generated by TreeSitter
+        lang (Language): the grammar that produced the node, Java by default
+        internal_values (bool): whether to store the text of non-terminal nodes, as well as of terminal ones
 
     Returns:
         Dict[str, any]: a reduced AST as a series of nested Dictionaries
     """
+    if lang is None: lang = get_language('java')
     field_id = lang.id_for_node_kind(node.type, True)
     if node.type == ".": 
         return {
@@ -56,9 +69,9 @@ def convert_to_dict(node: Node, lang: Language = JAVA_LANG) -> Dict[str, any]:
         }
     
     pairs = [
-        x for x in list(convert_to_dict(c, lang) for c in node.children) if x is not None
+        x for x in list(convert_to_dict(c, lang, internal_values) for c in node.children) if x is not None
     ]
-    val = node.text.decode("UTF-8") if node.text is not None else None
+    val = node.text.decode("UTF-8") if internal_values and node.text is not None else None
     if len(pairs) > 0: 
         d = {
             "_type": node.type, 
@@ -78,11 +91,71 @@ def convert_to_dict(node: Node, lang: Language = JAVA_LANG) -> Dict[str, any]:
     return d
 
 def parse_to_node(p: Path): 
-    bs = p.read_bytes() 
-    parse_tree = JAVA_PARSER.parse(bs) 
+    return parse_bytes_to_node(p.read_bytes())
+
+def parse_bytes_to_node(bs: bytes, timeout: Optional[float] = None): 
+    return tree_to_node(parse('java', bs, timeout=timeout), bs), bs
+
+def tree_to_node(parse_tree: Tree, bs: bytes) -> TypedNode: 
     root_node = parse_tree.root_node
-    d = convert_to_dict(root_node, JAVA_LANG)
-    return TypedNode(d), bs
+    d = convert_to_dict(root_node, get_language('java'), internal_values=False)
+    return TypedNode(d, source=bs)
+
+# The type declarations that construct_class turns into JavaClasses, by the kind they're given
+NESTED_DECLARATIONS = {
+    'class_declaration': 'class', 'interface_declaration': 'interface', 'enum_declaration': 'enum', 
+}
+# The nodes of a class body whose calls aren't collected as the class's own: they're a JavaMethod's 
+# or a nested JavaClass's, or (for an enum's enum_body_declarations) they're looked through separately
+MODELLED_MEMBERS = frozenset(['method_declaration', 'enum_body_declarations', *NESTED_DECLARATIONS])
+CONSTRUCTED_TYPES = frozenset(['type_identifier', 'scoped_type_identifier', 'generic_type'])
+
+def call_site(d: Dict[str, any], bs: bytes) -> Optional[JavaCallSite]: 
+    """The call site of a method_invocation or object_creation_expression in the tree-of-dicts"""
+    children = d.get('_children', [])
+    dot = next((c for c in children if c['_type'] == 'dot_access'), None)
+    receiver = bs[children[0]['_start']:dot['_start']].decode('UTF-8').strip() if dot is not None else None
+    if d['_type'] == 'method_invocation': 
+        # the method's name is the last identifier before the argument list, e.g. foo.<T>bar(x)
+        names = [c for c in children if c['_type'] == 'identifier']
+        if len(names) == 0: 
+            return None
+        return JavaCallSite('call', names[-1]['_value'], receiver, names[-1]['_start'])
+    created = next((c for c in children if c['_type'] in CONSTRUCTED_TYPES), None)
+    if created is None: 
+        return None
+    # new java.util.ArrayList<String>() constructs an ArrayList
+    type_name = bs[created['_start']:created['_end']].decode('UTF-8').split('<')[0]
+    return JavaCallSite('new', type_name.rsplit('.', 1)[-1].strip(), receiver, d['_start'])
+
+def call_sites(raw: Optional[Dict[str, any]], bs: bytes) -> List[JavaCallSite]: 
+    """Collects the call sites in a tree-of-dicts, in the order they appear in the source
+
+    Everything in the tree counts, including the bodies of anonymous and local classes, whose 
+    calls are made by whatever declares them.
+
+    Args:
+        raw (Optional[Dict[str, any]]): a method body, or a member of a class body, as a tree-of-dicts
+        bs (bytes): the source the tree was parsed from, for the text of receivers
+
+    Returns:
+        List[JavaCallSite]: the method invocations and object creations found
+    """
+    if raw is None: 
+        return []
+    sites: List[JavaCallSite] = [] 
+    stack = [raw]
+    while stack: 
+        d = stack.pop()
+        node_type = d.get('_type')
+        if node_type == 'method_invocation' or node_type == 'object_creation_expression': 
+            site = call_site(d, bs)
+            if site is not None: 
+                sites.append(site)
+        stack.extend(reversed(d.get('_children', [])))
+    # the calls in a receiver (e.g. the foo() of foo().bar()) are found after the call itself
+    sites.sort(key=lambda c: c.offset)
+    return sites
 
 def construct_class(n: TypedNode, bs: bytes, prefix: str = "class") -> JavaClass: 
     def decode_modifiers(n: Optional[TypedNode]) -> Tuple[List[str], List[JavaAnnotation]]: 
@@ -122,7 +195,12 @@ def construct_class(n: TypedNode, bs: bytes, prefix: str = "class") -> JavaClass
         ]
         modifiers, annotations = decode_modifiers(n.modifiers.first())
         params = [JavaParameter(name, type) for (name, type) in param_tuples]
-        m = JavaMethod(name, type, params, modifiers=modifiers, annotations=annotations)
+        body = n.get('block').first()
+        m = JavaMethod(
+            name, type, params, modifiers=modifiers, annotations=annotations, 
+            fingerprint=fingerprint(body._raw if body is not None else None), 
+            calls=call_sites(body._raw if body is not None else None, bs)
+        )
         return m
         
     def construct_field(n: TypedNode) -> JavaField: 
@@ -140,9 +218,16 @@ def construct_class(n: TypedNode, bs: bytes, prefix: str = "class") -> JavaClass
     #Console().print(n.modifiers.first().astree())
     modifiers, annotations = decode_modifiers(n.modifiers.first())
 
-    fields: List[JavaField] = [construct_field(f) for f in class_body.field_declaration]
-    methods: List[JavaMethod] = [construct_method(m) for m in class_body.method_declaration]
-    classes: List[JavaClass] = [construct_class(c, bs) for c in class_body.class_declaration] 
+    # an enum's fields, methods and nested types follow its constants, in enum_body_declarations
+    members = class_body + class_body.enum_body_declarations
+
+    fields: List[JavaField] = [construct_field(f) for f in members.field_declaration]
+    methods: List[JavaMethod] = [construct_method(m) for m in members.method_declaration]
+    classes: List[JavaClass] = [
+        construct_class(c, bs, nested_kind) 
+        for (declaration, nested_kind) in NESTED_DECLARATIONS.items() 
+        for c in getattr(members, declaration)
+    ] 
 
     type_identifiers: Set[str] = set([ti.value for ti in n.search('type_identifier')])
     type_identifiers.update([a.name for a in annotations])
@@ -155,7 +240,13 @@ def construct_class(n: TypedNode, bs: bytes, prefix: str = "class") -> JavaClass
     ])
     
     field_dict = { f.name: f for f in fields }  
-    method_dict = { m.name: m for m in methods }
+    method_dict: Dict[str, JavaMethod] = {}
+    # methods is keyed by name, so it only keeps the last of a method's overloads
+    overloads: List[JavaMethod] = []
+    for m in methods: 
+        if m.name in method_dict: 
+            overloads.append(method_dict[m.name])
+        method_dict[m.name] = m
     class_dict = { c.name: c for c in classes } 
 
     return JavaClass(
@@ -163,16 +254,42 @@ def construct_class(n: TypedNode, bs: bytes, prefix: str = "class") -> JavaClass
         kind=kind, 
         fields=field_dict, 
         methods=method_dict, 
+        overloads=overloads, 
         classes=class_dict,
         modifiers=modifiers,
         annotations=annotations,
-        type_identifiers=type_identifiers
+        type_identifiers=type_identifiers, 
+        fingerprint=fingerprint(class_body.first()._raw if len(class_body) > 0 else None), 
+        calls=[
+            site for member in members for d in member._raw.get('_children', []) 
+            if d.get('_type') not in MODELLED_MEMBERS for site in call_sites(d, bs)
+        ]
     ) 
     
 
-def examine(p: Path, root: Package) -> ClassFile: 
-    node, bs = parse_to_node(p) 
-    pkg_name: List[str] = node.package.identifier.value.split('.')
+def examine(
+    p: Path, 
+    root: Package, 
+    source: Optional[bytes] = None, 
+    external: bool = False, 
+    tree: Optional[Tree] = None
+) -> ClassFile: 
+    """Parses a single Java source file and adds its ClassFile to the package tree
+
+    Args:
+        p (Path): the path of the source file, which may be a member of an archive 
+        root (Package): the root of the package tree to add to 
+        source (Optional[bytes]): the contents of the file, if they've already been read (e.g. from an archive)
+        external (bool): whether the file is third-party source, rather than part of the scanned tree
+        tree (Optional[Tree]): the file's parse tree, if it has already been parsed
+
+    Returns:
+        ClassFile: the newly-added ClassFile
+    """
+    bs = source if source is not None else p.read_bytes()
+    node = tree_to_node(tree if tree is not None else parse('java', bs), bs)
+    package_declaration = node.package_declaration.first()
+    pkg_name: List[str] = package_declaration.identifier.value.split('.') if package_declaration is not None else []
     pkg = root.get_package(pkg_name)
 
     name: str = p.name
@@ -190,12 +307,97 @@ def examine(p: Path, root: Package) -> ClassFile:
         imports=imports, 
         classes={
             jc.name: jc for jc in ( classes + interfaces + enums ) 
-        }
+        },
+        external=external
     )
-    pkg.class_files[name] = cf 
+    pkg.add_class_file(name, cf)
+    return cf
+
+PACKAGE_DECLARATION = re.compile(rb"^\s*package\s+([\w.]+)\s*;", re.MULTILINE)
+IMPORT_DECLARATION = re.compile(rb"^\s*import\s+(?:static\s+)?([\w.]+)(?:\s*\.\s*\*)?\s*;", re.MULTILINE)
+
+def read_header(tree: Tree) -> Tuple[List[str], List[Tuple[str, str]]]: 
+    """Reads the package name and imports of a parsed Java file, without converting the rest of it
+
+    Returns:
+        Tuple[List[str], List[Tuple[str, str]]]: the package name, and the (package, name) pairs of 
+            the imports, split the same way as examine does
+    """
+    pkg_name: List[str] = [] 
+    imports: List[Tuple[str, str]] = [] 
+    for child in tree.root_node.named_children: 
+        if child.type not in ('package_declaration', 'import_declaration'): 
+            continue 
+        ident = next((c for c in child.named_children if c.type.endswith('identifier')), None)
+        if ident is None: 
+            continue 
+        parts = ident.text.decode('UTF-8').split('.')
+        if child.type == 'package_declaration': 
+            pkg_name = parts 
+        else: 
+            imports.append(('.'.join(parts[:-1]), parts[-1]))
+    return pkg_name, imports 
+
+def read_header_text(bs: bytes) -> Tuple[List[str], List[Tuple[str, str]]]: 
+    """A last-resort version of read_header, for sources that couldn't be parsed at all, which 
+    picks the package and import declarations out with regular expressions"""
+    m = PACKAGE_DECLARATION.search(bs)
+    pkg_name = m.group(1).decode('UTF-8').split('.') if m is not None else []
+    imports = [] 
+    for im in IMPORT_DECLARATION.finditer(bs): 
+        parts = im.group(1).decode('UTF-8').split('.')
+        imports.append(('.'.join(parts[:-1]), parts[-1]))
+    return pkg_name, imports 
+
+# The start of the first top-level type declaration: modifiers and annotations at the start of a line, 
+# followed by one of the type keywords
+TYPE_DECLARATION = re.compile(
+    rb"^[ \t]*(?:(?:public|protected|private|abstract|final|static|sealed|non-sealed|strictfp)\s+|@(?!interface\b)[\w.]+(?:\s*\([^)]*\))?\s*)*"
+    rb"(?:class|interface|enum|record|@\s*interface)\b", 
+    re.MULTILINE
+)
+
+def header_source(bs: bytes) -> bytes: 
+    """The part of a Java source before its first type declaration, which holds its package and 
+    import declarations; the whole source if no type declaration is found"""
+    m = TYPE_DECLARATION.search(bs)
+    return bs[:m.start()] if m is not None else bs
+
+def parse_header(bs: bytes, timeout: Optional[float] = None) -> Tree: 
+    """Parses only as much of a Java source as read_header needs
+
+    If cutting the source off at what looks like its first type declaration leaves something that 
+    doesn't parse cleanly (e.g. because the cut fell inside a comment), the whole source is parsed.
+    """
+    prefix = header_source(bs)
+    tree = parse('java', prefix, timeout=timeout)
+    if tree.root_node.has_error and len(prefix) < len(bs): 
+        tree = parse('java', bs, timeout=timeout)
+    return tree
+
+def examine_header(
+    p: Path, 
+    root: Package, 
+    source: Optional[bytes] = None, 
+    external: bool = False, 
+    tree: Optional[Tree] = None
+) -> ClassFile: 
+    """A cheap version of examine, which records a file's package and imports but none of its classes
+
+    Uses the parse tree if one is given, or else falls back to read_header_text; the arguments are 
+    the same as for examine.
+    """
+    if tree is not None: 
+        pkg_name, imports = read_header(tree)
+    else: 
+        pkg_name, imports = read_header_text(source if source is not None else p.read_bytes())
+    pkg = root.get_package(pkg_name)
+    cf = ClassFile(pkg, p, p.name, imports=imports, external=external)
+    pkg.add_class_file(cf.name, cf)
     return cf
 
 if __name__ == '__main__': 
+    from rich.console import Console 
     node, bs = parse_to_node(Path(sys.argv[-1]))
     tree = node.astree()
     console = Console() 
@@ -0,0 +1,78 @@
+"""Lazy registry of tree-sitter grammars and parsers.
+
+Loading a grammar is the most expensive part of importing any of the examiners, so
+nothing is loaded until the first time a language is actually asked for.  Grammars are
+shared process-wide; ``Parser`` objects hold mutable state and are therefore cached
+per-thread.
+"""
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from tree_sitter import Language, Parser, Tree
+
+_local = threading.local()
+
+@lru_cache(maxsize=None)
+def get_language(name: str) -> 'Language':
+    from tree_sitter_language_pack import get_language as _get_language
+    return _get_language(name)
+
+def get_parser(name: str) -> 'Parser':
+    """Returns a Parser for the named language, owned by the calling thread
+
+    Args:
+        name (str): a tree-sitter-language-pack language name, e.g. 'java'
+
+    Returns:
+        Parser: a parser which is created on first use and reused on later calls from the same thread
+    """
+    parsers: Dict[str, 'Parser'] = getattr(_local, 'parsers', None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+    parser = parsers.get(name)
+    if parser is None:
+        from tree_sitter import Parser
+        parser = parsers[name] = Parser(get_language(name))
+    return parser
+
+class ParseTimeoutError(Exception): 
+    """Raised when tree-sitter gives up on a source because it ran past its time limit"""
+
+def parse(name: str, bs: bytes, timeout: Optional[float] = None) -> 'Tree': 
+    """Parses source bytes with the calling thread's parser for the named language
+
+    Args:
+        name (str): a tree-sitter-language-pack language name
+        bs (bytes): the source to parse
+        timeout (Optional[float]): a limit, in seconds, on how long tree-sitter may spend parsing
+
+    Raises:
+        ParseTimeoutError: if the timeout expired before the parse finished
+
+    Returns:
+        Tree: the parse tree
+    """
+    parser = get_parser(name)
+    if timeout is None: 
+        return parser.parse(bs)
+    if hasattr(parser, 'timeout_micros'): 
+        # py-tree-sitter < 0.25 has a per-parser timeout, and fails the parse when it expires
+        parser.timeout_micros = max(int(timeout * 1_000_000), 1)
+        try: 
+            tree = parser.parse(bs)
+        except ValueError: 
+            tree = None
+        finally: 
+            parser.timeout_micros = 0
+    else: 
+        # newer versions cancel the parse when the progress callback returns True 
+        deadline = time.monotonic() + timeout
+        tree = parser.parse(bs, progress_callback=lambda state: time.monotonic() > deadline)
+    if tree is None: 
+        # a cancelled parse would otherwise be resumed by the next call 
+        parser.reset()
+        raise ParseTimeoutError(f"Parsing took longer than {timeout}s")
+    return tree
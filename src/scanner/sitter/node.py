@@ -1,9 +1,11 @@
 from itertools import groupby
-from typing import Generic, Iterable, List, Dict, TypeVar, Optional, Generator
-from functools import reduce 
-from rich.tree import Tree
+from typing import Generic, Iterable, List, Dict, TypeVar, Optional, Generator, TYPE_CHECKING
 
-def create_tree(d: Dict[str, any]) -> Tree: 
+if TYPE_CHECKING: 
+    from rich.tree import Tree
+
+def create_tree(d: Dict[str, any]) -> 'Tree': 
+    from rich.tree import Tree
 
     t = d.get("_type") 
     c = d.get("_children") 
@@ -68,9 +70,16 @@ class QuerySet(Generic[N], Iterable[N]):
         if len(self.__elements) == 1: 
             return getattr(self.__elements[0], attr) 
         else: 
-            return reduce(lambda a, b: a + b, [
-                getattr(e, attr) for e in self.__elements
-            ], QuerySet())
+            # the same as reduce(lambda a, b: a + b, ...), but without copying the 
+            # accumulated list for every element
+            found: List[N] = [] 
+            for e in self.__elements: 
+                v = getattr(e, attr) 
+                if isinstance(v, QuerySet): 
+                    found.extend(v.__elements)
+                else: 
+                    found.append(v)
+            return QuerySet(found)
         
 
 class TypedNode: 
@@ -79,10 +88,19 @@ class TypedNode:
     
     _raw: Dict[str, any] 
     _parent: 'TypedNode' = None
-    
-    def __init__(self, raw: Dict[str, any], parent: 'TypedNode' = None): 
+    _source: Optional[bytes] = None
+    
+    def __init__(self, raw: Dict[str, any], parent: 'TypedNode' = None, source: Optional[bytes] = None): 
+        """
+        Args:
+            raw (Dict[str, any]): the tree-of-dicts for this node
+            parent (TypedNode): the node's parent, if any 
+            source (Optional[bytes]): the parsed source, which is where the values of non-terminal nodes 
+                come from when the tree-of-dicts doesn't hold them; inherited from the parent by default
+        """
         self._raw = raw
         self._parent = parent 
+        self._source = source if source is not None or parent is None else parent._source
     
     @property 
     def is_terminal(self) -> bool: 
@@ -90,7 +108,10 @@ class TypedNode:
     
     @property
     def value(self) -> str: 
-        return self._raw.get('_value')
+        v = self._raw.get('_value')
+        if v is None and self._source is not None and '_start' in self._raw: 
+            v = self.get_text(self._source)
+        return v
     
     @property
     def type(self) -> str: 
@@ -106,7 +127,7 @@ class TypedNode:
     def children(self) -> List['TypedNode']:
         return [TypedNode(n, self) for n in self._raw.get('_children', [])]
     
-    def astree(self) -> Tree: 
+    def astree(self) -> 'Tree': 
         return create_tree(self._raw)
     
     def get_text(self, bs: bytes) -> str: 
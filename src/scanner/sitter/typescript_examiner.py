@@ -2,19 +2,23 @@ from pathlib import Path
 from typing import Dict 
 
 from tree_sitter import Language, Parser, Node
-from tree_sitter_language_pack import get_language, get_parser
 
 from .node import TypedNode
+from .languages import get_language, get_parser
 
-TS_LANG = get_language('typescript')
-TS_PARSER = get_parser('typescript')
+def __getattr__(name: str): 
+    if name == 'TS_LANG': 
+        return get_language('typescript')
+    elif name == 'TS_PARSER': 
+        return get_parser('typescript')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def convert_to_dict(node, lang) -> Dict: 
     ...
 
 def parse_to_node(p: Path): 
     bs = p.read_bytes() 
-    parse_tree = TS_PARSER.parse(bs) 
+    parse_tree = get_parser('typescript').parse(bs) 
     root_node = parse_tree.root_node
-    d = convert_to_dict(root_node, TS_LANG)
+    d = convert_to_dict(root_node, get_language('typescript'))
     return TypedNode(d), bs
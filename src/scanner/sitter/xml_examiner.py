@@ -1,15 +1,20 @@
 
 from tree_sitter import Node, Language
-from tree_sitter_language_pack import get_language, get_parser
-from rich.console import Console 
-from rich.tree import Tree 
 from pathlib import Path 
-from typing import Dict, List
+from typing import Dict, List, Optional, TYPE_CHECKING
 
 from .node import TypedNode, QuerySet, create_tree
+from .languages import get_language, get_parser
 
-XML_LANGUAGE = get_language('xml')
-XML_PARSER = get_parser('xml')
+if TYPE_CHECKING: 
+    from rich.tree import Tree 
+
+def __getattr__(name: str): 
+    if name == 'XML_LANGUAGE': 
+        return get_language('xml')
+    elif name == 'XML_PARSER': 
+        return get_parser('xml')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class XMLContent: 
     def astree(self): 
@@ -39,7 +44,7 @@ class XMLComment(XMLContent):
         return f"COMMENT: {self.comment}"
     
     def __repr__(self) -> str: 
-        return f"COMMENT({self.char_data[0:20]})"
+        return f"COMMENT({self.comment[0:20]})"
 
 
 class XMLTree(XMLContent): 
@@ -59,6 +64,7 @@ class XMLTree(XMLContent):
                 create_xml_tree(c) for c in node.content.children
             ]
         except IndexError: 
+            from rich.console import Console 
             console = Console()
             console.print(node.astree())
             console.print(node.Tag) 
@@ -67,7 +73,28 @@ class XMLTree(XMLContent):
     def __repr__(self) -> str: 
         return f"Element({self.name})"
     
-    def astree(self) -> Tree: 
+    def elements(self, name: Optional[str] = None) -> List['XMLTree']: 
+        """The child elements, optionally only those with the given name"""
+        return [
+            c for c in self.children 
+            if isinstance(c, XMLTree) and (name is None or c.name == name)
+        ]
+    
+    def element(self, name: str) -> Optional['XMLTree']: 
+        found = self.elements(name)
+        return found[0] if len(found) > 0 else None
+    
+    @property 
+    def text(self) -> str: 
+        """The character data directly inside this element, with surrounding whitespace stripped"""
+        return ''.join(c.char_data for c in self.children if isinstance(c, XMLCharData)).strip()
+    
+    def element_text(self, name: str, default: Optional[str] = None) -> Optional[str]: 
+        e = self.element(name)
+        return e.text if e is not None else default
+    
+    def astree(self) -> 'Tree': 
+        from rich.tree import Tree 
         t = Tree(f"ELEMENT: {self.name}")
         if len(self.attrs) > 0: 
             at = Tree("ATTRIBUTES")
@@ -90,7 +117,7 @@ def create_xml_tree(n: TypedNode) -> XMLContent:
     else: 
         return XMLTree(n)    
 
-def convert_to_dict(node: Node, lang: Language = XML_LANGUAGE) -> Dict[str, any]: 
+def convert_to_dict(node: Node, lang: Optional[Language] = None, internal_values: bool = True) -> Dict[str, any]: 
     """Converts a TreeSitter Node into a tree-of-dicts that we use as a lightweight AST 
 
     This drops certain kinds of Nodes (mostly token-like nodes) and standardizes out the 
@@ -98,20 +125,27 @@ def convert_to_dict(node: Node, lang: Language = XML_LANGUAGE) -> Dict[str, any]
     TypedNode objects, it'd probably be easy to just adapt the TypedNode stuff to work 
     directly from the TreeSitter Nodes themselves.
 
+    Copying out the text of every non-terminal node costs time proportional to the size of 
+    the file times the depth of the tree, so internal_values=False leaves it out; a TypedNode 
+    given the source bytes reads those values out of the source when they're asked for.
+
     Args:
         node (Node): a Node generated by TreeSitter
+        lang (Language): the grammar that produced the node, XML by default
+        internal_values (bool): whether to store the text of non-terminal nodes, as well as of terminal ones
 
     Returns:
         Dict[str, any]: a reduced AST as a series of nested Dictionaries
     """
+    if lang is None: lang = get_language('xml')
     field_id = lang.id_for_node_kind(node.type, True)
     if field_id is None: 
         return None
     
     pairs = [
-        x for x in list(convert_to_dict(c, lang) for c in node.children) if x is not None
+        x for x in list(convert_to_dict(c, lang, internal_values) for c in node.children) if x is not None
     ]
-    val = node.text.decode("UTF-8") if node.text is not None else None
+    val = node.text.decode("UTF-8") if internal_values and node.text is not None else None
     if len(pairs) > 0: 
         d = {
             "_type": node.type, 
@@ -132,8 +166,8 @@ def convert_to_dict(node: Node, lang: Language = XML_LANGUAGE) -> Dict[str, any]
 
 def parse_to_node(p: Path): 
     bs = p.read_bytes() 
-    parse_tree = XML_PARSER.parse(bs) 
+    parse_tree = get_parser('xml').parse(bs) 
     root_node = parse_tree.root_node
-    d = convert_to_dict(root_node, XML_LANGUAGE)
-    n = TypedNode(d) 
+    d = convert_to_dict(root_node, get_language('xml'), internal_values=False)
+    n = TypedNode(d, source=bs) 
     return n, bs
\ No newline at end of file
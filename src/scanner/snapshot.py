@@ -0,0 +1,151 @@
+"""Reading and writing snapshots of the package tree
+
+A snapshot is the JSON of Package.asdict.  Alongside it, save_snapshot writes a sidecar index
+(the snapshot's name plus '.idx') which gives, for each package, the byte offsets of its object
+and of its class_files within the snapshot.  With the index, open_snapshot can build the package
+tree without reading any ClassFiles; each package's ClassFiles are read and deserialized the first
+time they're asked for, and load_package reads only the subtree of a single package.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, TextIO, Tuple
+
+from .packages import Package, ClassFile
+
+ClassFileSource = Callable[[Package], Iterable[Tuple[str, Dict[str, any]]]]
+
+# package full name -> [start, end] of the package's object, [start, end] of its class_files, 
+# and the number of class files
+SnapshotIndex = Dict[str, List[int]]
+
+INDEX_VERSION = 1
+
+def in_memory_class_files(pkg: Package) -> Iterable[Tuple[str, Dict[str, any]]]:
+    return ((name, cf.asdict()) for (name, cf) in pkg.class_files.items())
+
+def index_path(p: Path) -> Path:
+    return p.with_name(p.name + '.idx')
+
+def write_snapshot(
+    root: Package,
+    outf: TextIO,
+    class_files: Optional[ClassFileSource] = None,
+    index: Optional[SnapshotIndex] = None
+):
+    """Writes the package tree as a snapshot, in the same shape as Package.asdict
+
+    Unlike json.dumps(root.asdict()), this never holds more than one package's worth of
+    serialized class files at once, and the class files themselves can come from somewhere
+    other than the tree (e.g. a PackageStore that they've been spilled to).
+
+    Args:
+        root (Package): the package tree to write
+        outf (TextIO): where to write the snapshot
+        class_files (ClassFileSource): gives the (name, ClassFile.asdict()) pairs for a package;
+            by default these come from the in-memory tree
+        index (Optional[SnapshotIndex]): if given, filled in with the byte offsets of each package
+    """
+    if class_files is None: class_files = in_memory_class_files
+    # json.dumps escapes everything outside ASCII, so counting characters counts bytes
+    offset = 0
+
+    def write(s: str):
+        nonlocal offset
+        outf.write(s)
+        offset += len(s)
+
+    def write_package(pkg: Package, indent: str):
+        start = offset
+        write(f'{{\n{indent}  "full_path": {json.dumps(pkg.full_path)},\n{indent}  "class_files": ')
+        cf_start = offset
+        write('{')
+        count = 0
+        for (name, d) in class_files(pkg):
+            write(f'{"," if count > 0 else ""}\n{indent}    {json.dumps(name)}: {json.dumps(d)}')
+            count += 1
+        write(f'\n{indent}  }}')
+        cf_end = offset
+        write(f',\n{indent}  "packages": {{')
+        sep = ''
+        for (name, child) in pkg.packages.items():
+            write(f'{sep}\n{indent}    {json.dumps(name)}: ')
+            write_package(child, indent + '    ')
+            sep = ','
+        write(f'\n{indent}  }}\n{indent}}}')
+        if index is not None:
+            index[pkg.full_name] = [start, offset, cf_start, cf_end, count]
+
+    write_package(root, '')
+    write('\n')
+
+def save_snapshot(root: Package, p: Path, class_files: Optional[ClassFileSource] = None):
+    """Writes a snapshot to p, and its index next to it"""
+    index: SnapshotIndex = {}
+    with p.open('wt', encoding='ascii', newline='\n') as outf:
+        write_snapshot(root, outf, class_files=class_files, index=index)
+    st = os.stat(p)
+    with index_path(p).open('wt') as outf:
+        json.dump({
+            'version': INDEX_VERSION,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'packages': index,
+        }, outf)
+
+def load_snapshot(p: Path, root: Optional[Package] = None) -> Package:
+    if root is None: root = Package()
+    Package.fromdict(root, json.loads(p.read_text()))
+    return root
+
+def read_index(p: Path) -> Optional[SnapshotIndex]:
+    """Reads the index of the snapshot at p, or returns None if there isn't one or it's out of date"""
+    ip = index_path(p)
+    if not ip.is_file():
+        return None
+    d = json.loads(ip.read_text())
+    st = os.stat(p)
+    if d.get('version') != INDEX_VERSION or d.get('size') != st.st_size or d.get('mtime_ns') != st.st_mtime_ns:
+        return None
+    return d.get('packages')
+
+def read_span(p: Path, start: int, end: int) -> any:
+    with p.open('rb') as inf:
+        inf.seek(start)
+        return json.loads(inf.read(end - start))
+
+def open_snapshot(p: Path) -> Package:
+    """Opens a snapshot without reading any of its ClassFiles, which are instead read, one package at
+    a time, the first time they're asked for.  Falls back to load_snapshot if there's no usable index."""
+    index = read_index(p)
+    if index is None:
+        return load_snapshot(p)
+
+    root = Package()
+    for (name, [_, _, cf_start, cf_end, count]) in index.items():
+        pkg = root.get_package(name.split('.') if name != '' else [])
+        if count > 0:
+            pkg.defer_class_files(
+                lambda cf_start=cf_start, cf_end=cf_end: {
+                    n: ClassFile.fromdict(root, d) for (n, d) in read_span(p, cf_start, cf_end).items()
+                }
+            )
+    return root
+
+def load_package(p: Path, package_name: str, root: Optional[Package] = None) -> Optional[Package]:
+    """Reads one package, and the packages below it, from a snapshot
+
+    Only that package's subtree of the snapshot is read if there's an index; otherwise the whole
+    snapshot is loaded.
+
+    Returns:
+        Optional[Package]: the package, or None if the snapshot doesn't have it
+    """
+    if root is None: root = Package()
+    index = read_index(p)
+    if index is None:
+        return load_snapshot(p, root).find_package(package_name.split('.') if package_name != '' else [])
+    if package_name not in index:
+        return None
+    [start, end, _, _, _] = index[package_name]
+    return Package.fromdict(root, read_span(p, start, end))
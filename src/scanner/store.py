@@ -0,0 +1,175 @@
+"""On-disk store for ClassFiles, used to keep scans of very large trees within a memory budget.
+
+When a scan runs with a memory limit, finished packages are serialized into a PackageStore
+and dropped from the in-memory tree, leaving only the (small) skeleton of Package objects.
+Type resolution then runs as a second pass, which hydrates a bounded number of packages
+at a time from the store.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .packages import Package, ClassFile, path_key
+
+# How many packages the resolution pass keeps hydrated at once
+DEFAULT_HYDRATED_PACKAGES = 64
+
+def current_rss() -> int:
+    """Returns the resident set size of this process in bytes (or, where that isn't available, the peak)"""
+    try:
+        with open('/proc/self/statm') as inf:
+            return int(inf.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+def parse_memory_size(s: str) -> int:
+    """Parses sizes like '512M', '2G' or '1048576' into a number of bytes"""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    s = s.strip().upper().removesuffix('B')
+    if s and s[-1] in units:
+        return int(float(s[:-1]) * units[s[-1]])
+    return int(s)
+
+class PackageStore:
+
+    path: Path
+    spilled: bool
+
+    def __init__(self, path: Optional[Path] = None):
+        self._tmpdir = None
+        if path is None:
+            self._tmpdir = tempfile.mkdtemp(prefix='scanner-store-')
+            path = Path(self._tmpdir) / 'store.db'
+        self.path = path
+        self.spilled = False
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS class_files ("
+            "package TEXT NOT NULL, name TEXT NOT NULL, data TEXT NOT NULL, resolved TEXT, "
+            "PRIMARY KEY (package, name))"
+        )
+
+    def __enter__(self) -> 'PackageStore':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._db.close()
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def spill(self, root: Package) -> int:
+        """Moves every ClassFile in the tree into the store, leaving the Package skeleton behind
+
+        Returns:
+            int: the number of ClassFiles spilled
+        """
+        count = 0
+        for pkg in root.walk():
+            if len(pkg.class_files) == 0:
+                continue
+            self._db.executemany(
+                "INSERT OR REPLACE INTO class_files (package, name, data) VALUES (?, ?, ?)",
+                [(pkg.full_name, name, json.dumps(cf.asdict())) for (name, cf) in pkg.class_files.items()]
+            )
+            count += len(pkg.class_files)
+            pkg.class_files.clear()
+        self._db.commit()
+        self.spilled = True
+        return count
+
+    def remove_missing(self, base: Path, seen: Set[str]) -> int: 
+        """Deletes the stored ClassFiles of sources under base, other than external ones, whose 
+        path_key isn't in seen: the counterpart, for a spilled scan, of dropping the files that 
+        were deleted since the snapshot it started from
+
+        Returns:
+            int: the number of ClassFiles deleted
+        """
+        base_key = path_key(base)
+        prefix = base_key.rstrip(os.sep) + os.sep
+        missing = []
+        for (package_name, name, data) in self._db.execute("SELECT package, name, data FROM class_files"): 
+            d = json.loads(data)
+            key = path_key(Path(d['file']))
+            if d.get('external') or key in seen: 
+                continue
+            if key == base_key or key.startswith(prefix): 
+                missing.append((package_name, name))
+        self._db.executemany("DELETE FROM class_files WHERE package = ? AND name = ?", missing)
+        self._db.commit()
+        return len(missing)
+
+    def package_names(self) -> List[str]:
+        return [r[0] for r in self._db.execute("SELECT DISTINCT package FROM class_files ORDER BY package")]
+
+    def class_file_dicts(self, package_name: str) -> Iterable[Tuple[str, Dict[str, any]]]:
+        for (name, data, resolved) in self._db.execute(
+            "SELECT name, data, resolved FROM class_files WHERE package = ? ORDER BY rowid", (package_name,)
+        ):
+            d = json.loads(data)
+            if resolved is not None:
+                d['resolved_type_identifiers'] = json.loads(resolved)
+            yield name, d
+
+    def hydrate(self, root: Package, package_name: str) -> Package:
+        """Loads the stored ClassFiles of one package back into the tree"""
+        pkg = root.get_package(package_name.split('.') if package_name else [])
+        for (name, d) in self.class_file_dicts(package_name):
+            pkg.class_files[name] = ClassFile.fromdict(root, d)
+        return pkg
+
+    def resolve_type_identifiers(self, root: Package, max_hydrated: int = DEFAULT_HYDRATED_PACKAGES):
+        """The streaming counterpart of Package.resolve_type_identifiers
+
+        Each stored package is hydrated along with the packages its files import, resolved, and
+        its results written back to the store.  At most max_hydrated packages are kept in memory
+        between packages; a package that imports more than that keeps all of them hydrated until
+        it's resolved, since evicting one would leave its types unresolved.
+        """
+        hydrated: OrderedDict[str, Package] = OrderedDict()
+
+        def ensure(package_name: str, pinned: Set[str]) -> Package:
+            if package_name in hydrated:
+                hydrated.move_to_end(package_name)
+                return hydrated[package_name]
+            pkg = self.hydrate(root, package_name)
+            hydrated[package_name] = pkg
+            evict(pinned)
+            return pkg
+
+        def evict(pinned: Set[str]):
+            for evicted_name in [n for n in hydrated if n not in pinned]:
+                if len(hydrated) <= max(max_hydrated, 1):
+                    break
+                hydrated.pop(evicted_name).class_files.clear()
+
+        stored = set(self.package_names())
+        for package_name in sorted(stored):
+            pinned = {package_name}
+            pkg = ensure(package_name, pinned)
+            imported = {p for cf in list(pkg.class_files.values()) for (p, _) in cf.imports}
+            pinned.update(p for p in imported if p in stored)
+            for imported_name in sorted(pinned):
+                ensure(imported_name, pinned)
+            rows = []
+            for (name, cf) in pkg.class_files.items():
+                cf.resolve_all_class_type_identifiers()
+                rows.append((json.dumps(cf.resolved_type_identifiers_asdict()), package_name, name))
+            self._db.executemany("UPDATE class_files SET resolved = ? WHERE package = ? AND name = ?", rows)
+            # back down to the cap, now that nothing needs to stay
+            evict(set())
+        self._db.commit()
+
+        for pkg in hydrated.values():
+            pkg.class_files.clear()
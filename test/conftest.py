@@ -0,0 +1,29 @@
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import pytest
+
+@pytest.fixture
+def java_tree(tmp_path: Path):
+    """Writes a tree of sources, given as {relative path: source}, under tmp_path/src (or base)
+
+    Returns the directory the sources were written to.
+    """
+    def write(sources: Dict[str, str], base: Optional[Path] = None) -> Path:
+        if base is None: base = tmp_path / 'src'
+        for (name, source) in sources.items():
+            f = base / name
+            f.parent.mkdir(parents=True, exist_ok=True)
+            f.write_text(source)
+        return base
+    return write
+
+@pytest.fixture
+def class_tree(java_tree):
+    """Writes one source file per (package, class name) pair, each declaring a class with the given body"""
+    def write(classes: Iterable[Tuple[str, str]], body: str = '', base: Optional[Path] = None) -> Path:
+        return java_tree({
+            f"{pkg.replace('.', '/')}/{cls}.java": f"package {pkg};\n\npublic class {cls} {{ {body}}}\n"
+            for (pkg, cls) in classes
+        }, base=base)
+    return write
@@ -0,0 +1,57 @@
+import zipfile
+from pathlib import Path
+
+from scanner.examiner import examine_all_java, ScanReport
+from scanner.packages import Package
+from scanner.paths import split_archive_path
+
+TEST_CLASS = Path(__file__).parent / 'java_test' / 'test' / 'TestClass.java'
+
+DEPENDENCY = b"""
+package com.acme.lib; 
+
+public class Widget { 
+    private int size; 
+}
+"""
+
+def make_sources_jar(p: Path) -> Path: 
+    with zipfile.ZipFile(p, 'w') as zf: 
+        zf.writestr('META-INF/MANIFEST.MF', 'Manifest-Version: 1.0\n')
+        zf.writestr('com/acme/lib/', '')
+        zf.writestr('com/acme/lib/Widget.java', DEPENDENCY)
+    return p
+
+def test_examine_sources_jar(tmp_path): 
+    jar = make_sources_jar(tmp_path / 'lib-1.0-sources.jar')
+    root = examine_all_java(jar)
+
+    pkg = root['com.acme.lib']
+    cf = pkg.class_files.get('Widget.java')
+    assert cf is not None
+    assert cf.external
+    assert pkg.is_external
+    assert split_archive_path(cf.file) == (jar, 'com/acme/lib/Widget.java')
+    assert 'Widget' in cf.classes
+
+def test_external_archives_alongside_sources(tmp_path): 
+    make_sources_jar(tmp_path / 'lib-1.0-sources.jar')
+    root = examine_all_java(TEST_CLASS.parent, external=[tmp_path])
+
+    assert not root['test'].is_external
+    assert root['com.acme.lib'].is_external
+
+    copy = Package()
+    Package.fromdict(copy, root.asdict())
+    assert copy['com.acme.lib'].class_files['Widget.java'].external
+    assert not copy['test'].class_files['TestClass.java'].external
+
+def test_checksums_next_to_archives_are_not_archives(tmp_path): 
+    jar = make_sources_jar(tmp_path / 'lib-1.0-sources.jar')
+    for suffix in ('.sha1', '.md5', '.asc'): 
+        (tmp_path / (jar.name + suffix)).write_text('0123456789abcdef\n')
+    report = ScanReport()
+    root = examine_all_java(TEST_CLASS.parent, external=[tmp_path], report=report)
+
+    assert root['com.acme.lib'].is_external
+    assert report.skipped == []
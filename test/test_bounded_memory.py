@@ -0,0 +1,113 @@
+import io
+import json
+import tracemalloc
+from pathlib import Path
+from typing import Dict
+
+import scanner.examiner
+from scanner.examiner import examine_all_java
+from scanner.snapshot import write_snapshot
+from scanner.store import PackageStore, parse_memory_size
+
+def sources(packages: int = 6, files: int = 8) -> Dict[str, str]: 
+    # every class refers to a class in its own package and one in the previous package
+    return {
+        f"com/acme/p{p}/C{f}.java": f"""
+package com.acme.p{p}; 
+
+import com.acme.p{max(p - 1, 0)}.C0; 
+
+public class C{f} {{ 
+    private C{(f + 1) % files} next; 
+    public C0 first() {{ return null; }}
+}}
+"""
+        for p in range(packages) for f in range(files)
+    }
+
+def snapshot_of(root, class_files=None) -> dict: 
+    buf = io.StringIO()
+    write_snapshot(root, buf, class_files=class_files)
+    return json.loads(buf.getvalue())
+
+def test_parse_memory_size(): 
+    assert parse_memory_size('512') == 512
+    assert parse_memory_size('2K') == 2048
+    assert parse_memory_size('1.5g') == 3 * (1 << 29)
+    assert parse_memory_size('64MB') == 64 << 20
+
+def test_spilled_scan_matches_in_memory_scan(java_tree, monkeypatch): 
+    src = java_tree(sources())
+    expected = snapshot_of(examine_all_java(src))
+
+    monkeypatch.setattr(scanner.examiner, 'MEMORY_CHECK_INTERVAL', 5)
+    with PackageStore() as store: 
+        root = examine_all_java(src, max_memory=0, store=store)
+        assert store.spilled
+        assert all(len(pkg.class_files) == 0 for pkg in root.walk())
+        spilled = snapshot_of(root, class_files=lambda pkg: store.class_file_dicts(pkg.full_name))
+
+    assert spilled == expected
+    resolved = expected['packages']['com']['packages']['acme']['packages']['p2']['class_files']['C3.java']['resolved_type_identifiers']
+    assert ['C4', 'C4'] in resolved['C3']
+
+def traced_scan(src: Path, **kwargs): 
+    tracemalloc.start()
+    try: 
+        root = examine_all_java(src, resolve=False, **kwargs)
+        return (root, tracemalloc.get_traced_memory()[1])
+    finally: 
+        tracemalloc.stop()
+
+def test_spilling_keeps_the_scan_under_its_limit(java_tree, monkeypatch): 
+    src = java_tree(sources(packages=10, files=20))
+    # warm up the parser and grammar, so that they aren't counted against either scan
+    examine_all_java(src, resolve=False)
+    (_, unbounded_peak) = traced_scan(src)
+
+    # the limit is checked against the traced heap rather than the RSS, which is too coarse to 
+    # see a tree this small
+    monkeypatch.setattr(scanner.examiner, 'current_rss', lambda: tracemalloc.get_traced_memory()[0])
+    monkeypatch.setattr(scanner.examiner, 'MEMORY_CHECK_INTERVAL', 5)
+    limit = unbounded_peak // 4
+    with PackageStore() as store: 
+        (_, bounded_peak) = traced_scan(src, max_memory=limit, store=store)
+        assert store.spilled
+        assert len(store.package_names()) == 10
+
+    # the limit is only checked every few files, so the scan can overshoot it by a few files' worth
+    assert bounded_peak < 2 * limit, f"peak {bounded_peak} with a limit of {limit}, {unbounded_peak} without"
+
+def test_resolution_with_few_hydrated_packages(tmp_path, java_tree): 
+    src = java_tree(sources())
+    expected = snapshot_of(examine_all_java(src))
+
+    with PackageStore(tmp_path / 'store.db') as store: 
+        root = examine_all_java(src)
+        store.spill(root)
+        store.resolve_type_identifiers(root, max_hydrated=2)
+        assert snapshot_of(root, class_files=lambda pkg: store.class_file_dicts(pkg.full_name)) == expected
+
+def test_resolution_of_a_package_importing_more_than_the_cap(tmp_path, java_tree): 
+    sources = {f"{p}/T{p.upper()}.java": f"package {p};\n\npublic class T{p.upper()} {{ }}\n" for p in 'abc'}
+    sources['m/M.java'] = """package m;
+
+import a.TA;
+import b.TB;
+import c.TC;
+
+public class M {
+    private TA a;
+    private TB b;
+    private TC c;
+}
+"""
+    src = java_tree(sources)
+    expected = snapshot_of(examine_all_java(src))
+    assert len(expected['packages']['m']['class_files']['M.java']['resolved_type_identifiers']['M']) == 3
+
+    with PackageStore(tmp_path / 'store.db') as store: 
+        root = examine_all_java(src)
+        store.spill(root)
+        store.resolve_type_identifiers(root, max_hydrated=2)
+        assert snapshot_of(root, class_files=lambda pkg: store.class_file_dicts(pkg.full_name)) == expected
@@ -0,0 +1,157 @@
+import json
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from scanner.calls import CallIndex, index_calls, line_numbers, newline_offsets
+from scanner.cli import main
+from scanner.examiner import examine_all_java
+from scanner.packages import JavaCallSite
+from scanner.snapshot import save_snapshot, load_snapshot
+
+LEDGER = """package com.acme.billing;
+
+import java.util.ArrayList;
+
+public class Ledger {
+    private Store store = new Store("ledger");
+
+    static { Registry.register(Ledger.class); }
+
+    public Ledger() { reset(); }
+
+    public void post(Entry e) {
+        store.save(e.validate());
+        this.<Entry>audit(e);
+        Runnable r = new Runnable() { public void run() { store.flush(); } };
+        new ArrayList<String>();
+    }
+
+    class Page {
+        void turn() { store.save(null); }
+    }
+}
+"""
+
+REPORT = """package com.acme.reports;
+
+public class Report {
+    public void print(Store store) {
+        store.save(this);
+    }
+}
+"""
+
+SOURCES = {'com/acme/billing/Ledger.java': LEDGER, 'com/acme/reports/Report.java': REPORT}
+
+def test_call_sites(java_tree):
+    root = examine_all_java(java_tree(SOURCES))
+    ledger = root['com.acme.billing'].class_files['Ledger.java'].classes['Ledger']
+    assert [(c.kind, c.name, c.receiver) for c in ledger.methods['post'].calls] == [
+        ('call', 'save', 'store'),
+        ('call', 'validate', 'e'),
+        ('call', 'audit', 'this'),
+        ('new', 'Runnable', None),
+        # calls in an anonymous class are made by the method that declares it
+        ('call', 'flush', 'store'),
+        ('new', 'ArrayList', None),
+    ]
+    # the field initializer, the static initializer and the constructor
+    assert [(c.kind, c.name, c.receiver) for c in ledger.calls] == [
+        ('new', 'Store', None), ('call', 'register', 'Registry'), ('call', 'reset', None),
+    ]
+    # a nested class's calls are its own
+    assert [c.name for c in ledger.classes['Page'].methods['turn'].calls] == ['save']
+    save = ledger.methods['post'].calls[0]
+    assert LEDGER.encode()[save.offset:].startswith(b'save(')
+
+def test_callers(java_tree):
+    root = examine_all_java(java_tree(SOURCES))
+    index = index_calls(root)
+    assert sorted(c.caller for c in index.callers('save')) == [
+        'com.acme.billing.Ledger#post', 'com.acme.billing.Ledger.Page#turn', 'com.acme.reports.Report#print',
+    ]
+    assert [c.caller for c in index.callers('Store')] == ['com.acme.billing.Ledger#<init>']
+    assert index.callers('Store', kind='call') == []
+    assert index.callers('nothing') == []
+    assert line_numbers(index.callers('reset')) == [10]
+    assert newline_offsets(b'a\n\nbc\n') == [1, 2, 5]
+    assert newline_offsets(b'') == []
+
+NESTED = """package com.acme.jobs;
+
+public class Worker {
+    private Runnable r = new Runnable() { public void run() { fieldAnon(); } };
+
+    public Worker() { new Thread(new Runnable() { public void run() { ctorAnon(); } }); }
+
+    void process(int n) { alpha(); }
+    void process(String s) { beta(); }
+
+    void local() { class Local { void go() { inLocal(); } } }
+
+    enum State { IDLE(initial()), BUSY; void enter() { inEnum(); } }
+    interface Listener { default void fire() { inInterface(); } }
+    record Job(int id) { void start() { inRecord(); } }
+}
+"""
+
+def test_every_call_site_is_kept(java_tree):
+    root = examine_all_java(java_tree({'com/acme/jobs/Worker.java': NESTED}))
+    index = index_calls(root)
+    callers = lambda name: [c.caller for c in index.callers(name)]
+    # both overloads keep their calls, and are told apart by their signatures
+    assert callers('alpha') == ['com.acme.jobs.Worker#process(int)']
+    assert callers('beta') == ['com.acme.jobs.Worker#process(String)']
+    # anonymous and local classes' calls are made by whatever declares them
+    assert callers('fieldAnon') == ['com.acme.jobs.Worker#<init>']
+    assert callers('ctorAnon') == ['com.acme.jobs.Worker#<init>']
+    assert callers('inLocal') == ['com.acme.jobs.Worker#local']
+    # nested enums and interfaces are classes of their own
+    assert callers('inEnum') == ['com.acme.jobs.Worker.State#enter']
+    assert callers('initial') == ['com.acme.jobs.Worker.State#<init>']
+    assert callers('inInterface') == ['com.acme.jobs.Worker.Listener#fire']
+    # records aren't modelled, so their calls are the enclosing class's
+    assert callers('inRecord') == ['com.acme.jobs.Worker#<init>']
+
+    worker = root['com.acme.jobs'].class_files['Worker.java'].classes['Worker']
+    assert [m.signature for m in worker.all_methods() if m.name == 'process'] == ['process(int)', 'process(String)']
+
+def test_index_is_columnar():
+    index = CallIndex()
+    for i in range(1000):
+        index.add('call', 'A.java', 'a.A', f"m{i % 10}", 'save' if i % 2 == 0 else 'load', 'store', i)
+    # each string is stored once, however many rows use it: call, A.java, a.A, m0 to m9, save, load and store
+    assert len(index.strings) == 16
+    assert len(index) == 1000
+    assert [c.offset for c in index.callers('load')][:3] == [1, 3, 5]
+    index.add('call', 'B.java', 'b.B', 'm', 'load', None, 5000)
+    assert index.callers('load')[-1].receiver is None
+
+def test_snapshot_keeps_calls(tmp_path: Path, java_tree):
+    root = examine_all_java(java_tree(SOURCES))
+    save_snapshot(root, tmp_path / 'snapshot.json')
+    loaded = load_snapshot(tmp_path / 'snapshot.json')
+    report = loaded['com.acme.reports'].class_files['Report.java'].classes['Report']
+    assert report.methods['print'].calls == [JavaCallSite('call', 'save', 'store', REPORT.index('save('))]
+    assert index_calls(loaded).callers('save') == index_calls(root).callers('save')
+
+def test_snapshot_keeps_overloads(tmp_path: Path, java_tree):
+    root = examine_all_java(java_tree({'com/acme/jobs/Worker.java': NESTED}))
+    save_snapshot(root, tmp_path / 'snapshot.json')
+    loaded = load_snapshot(tmp_path / 'snapshot.json')
+    assert [c.caller for c in index_calls(loaded).callers('alpha')] == ['com.acme.jobs.Worker#process(int)']
+
+def test_cli(java_tree):
+    src = java_tree(SOURCES)
+    runner = CliRunner()
+    result = runner.invoke(main, ['callers', str(src), 'save', '--json'])
+    assert result.exit_code == 0, result.output
+    found = sorted((c['caller'], c['line']) for c in map(json.loads, result.stdout.splitlines()))
+    assert found == [
+        ('com.acme.billing.Ledger#post', 13), ('com.acme.billing.Ledger.Page#turn', 20), ('com.acme.reports.Report#print', 5),
+    ]
+
+    result = runner.invoke(main, ['callers', str(src), 'Store', '--kind', 'new'])
+    assert result.exit_code == 0, result.output
+    assert result.stdout.splitlines() == [f"{(src / 'com/acme/billing/Ledger.java').as_posix()}:6 com.acme.billing.Ledger#<init> new Store()"]
@@ -0,0 +1,153 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from click.testing import CliRunner
+
+import scanner.examiner
+from scanner.cli import main
+from scanner.clones import similarity, index_tree
+from scanner.examiner import examine_all_java
+from scanner.snapshot import save_snapshot, load_snapshot
+
+ORIGINAL = """
+package com.acme.billing;
+
+public class Invoice {
+    private int total;
+
+    public int getTotal() { return total; }
+
+    public int sumLines(int[] lines, int discount) {
+        int sum = 0;
+        for (int i = 0; i < lines.length; i++) {
+            if (lines[i] > 100) {
+                sum += lines[i] - discount;
+            } else {
+                sum += lines[i];
+            }
+        }
+        return sum > 0 ? sum : 0;
+    }
+
+    public String describe(String prefix) {
+        StringBuilder sb = new StringBuilder(prefix);
+        while (sb.length() < 40) { sb.append('-'); }
+        try { return sb.toString().trim(); } catch (RuntimeException e) { throw new IllegalStateException(e); }
+    }
+}
+"""
+
+# the same loop as sumLines, with everything renamed and different constants
+COPY = """
+package com.acme.orders;
+
+public class Order {
+    public long addUp(long[] amounts, long rebate) {
+        long acc = 7;
+        for (int k = 1; k < amounts.length; k++) {
+            if (amounts[k] > 250) {
+                acc += amounts[k] - rebate;
+            } else {
+                acc += amounts[k];
+            }
+        }
+        return acc > 3 ? acc : 1;
+    }
+}
+"""
+
+SOURCES = {'com/acme/billing/Invoice.java': ORIGINAL, 'com/acme/orders/Order.java': COPY}
+
+def test_renamed_copy_is_a_clone(java_tree):
+    root = examine_all_java(java_tree(SOURCES))
+    invoice = root['com.acme.billing'].class_files['Invoice.java'].classes['Invoice']
+    order = root['com.acme.orders'].class_files['Order.java'].classes['Order']
+    assert similarity(invoice.methods['sumLines'].fingerprint, order.methods['addUp'].fingerprint) == 1.0
+    assert similarity(invoice.methods['describe'].fingerprint, order.methods['addUp'].fingerprint) < 0.5
+    # too small to say anything about
+    assert invoice.methods['getTotal'].fingerprint is None
+
+    clones = index_tree(root, kinds=('method',)).clones(threshold=0.8)
+    assert [(c.a.name, c.b.name) for c in clones] == [('com.acme.billing.Invoice#sumLines', 'com.acme.orders.Order#addUp')]
+
+def test_overloads_keep_their_fingerprints(java_tree):
+    # two overloads of addUp, which are copies of each other
+    method = COPY[COPY.index('    public long addUp'):COPY.rindex('}')]
+    root = examine_all_java(java_tree({
+        'com/acme/orders/Order.java': "package com.acme.orders;\n\npublic class Order {\n" + method.replace('long[]', 'int[]') + method + "}\n",
+    }))
+    clones = index_tree(root, kinds=('method',)).clones()
+    assert [(c.a.name, c.b.name) for c in clones] == [('com.acme.orders.Order#addUp(int[], long)', 'com.acme.orders.Order#addUp(long[], long)')]
+
+def test_fingerprints_are_stable_across_processes(java_tree):
+    src = java_tree(SOURCES)
+    root = examine_all_java(src)
+    expected = root['com.acme.orders'].class_files['Order.java'].classes['Order'].methods['addUp'].fingerprint
+    script = (
+        "import sys\nfrom pathlib import Path\nfrom scanner.examiner import examine_all_java\n"
+        "root = examine_all_java(Path(sys.argv[1]))\n"
+        "sys.stderr.write(root['com.acme.orders'].class_files['Order.java'].classes['Order'].methods['addUp'].fingerprint)\n"
+    )
+    env = {**os.environ, 'PYTHONHASHSEED': '12345', 'PYTHONPATH': os.pathsep.join(sys.path)}
+    result = subprocess.run([sys.executable, '-c', script, str(src)], capture_output=True, text=True, env=env, check=True)
+    assert result.stderr == expected
+
+def test_snapshot_keeps_fingerprints_and_skips_unchanged_files(tmp_path: Path, java_tree, monkeypatch):
+    src = java_tree(SOURCES)
+    root = examine_all_java(src)
+    snapshot = tmp_path / 'snapshot.json'
+    save_snapshot(root, snapshot)
+
+    loaded = load_snapshot(snapshot)
+    assert index_tree(loaded).fingerprints == index_tree(root).fingerprints
+
+    examined = []
+    real_examine = scanner.examiner.examine
+    monkeypatch.setattr(scanner.examiner, 'examine', lambda p, *args, **kwargs: examined.append(p.name) or real_examine(p, *args, **kwargs))
+    # Order moves to another package; Invoice is untouched
+    (src / 'com/acme/orders/Order.java').write_text(COPY.replace('com.acme.orders', 'com.acme.sales'))
+    examine_all_java(src, loaded)
+    assert examined == ['Order.java']
+    assert loaded['com.acme.orders'].class_files == {}
+    assert 'Order.java' in loaded['com.acme.sales'].class_files
+    assert len(index_tree(loaded, kinds=('method',)).clones()) == 1
+
+def test_deleted_files_are_dropped_from_a_snapshot(tmp_path: Path, java_tree, monkeypatch):
+    src = java_tree(SOURCES)
+    snapshot = tmp_path / 'snapshot.json'
+    runner = CliRunner()
+    result = runner.invoke(main, ['clones', str(src), '--kind', 'method', '-s', str(snapshot)])
+    assert result.exit_code == 0, result.output
+    assert len(result.stdout.splitlines()) == 1
+
+    (src / 'com/acme/orders/Order.java').unlink()
+    result = runner.invoke(main, ['clones', str(src), '--kind', 'method', '-s', str(snapshot)])
+    assert result.exit_code == 0, result.output
+    assert result.stdout == ''
+    assert load_snapshot(snapshot)['com.acme.orders'].class_files == {}
+
+    # a scan that spills moves the files it reuses from the snapshot into its store, so it's the 
+    # store rather than the tree that still has a deleted one
+    monkeypatch.setattr(scanner.examiner, 'MEMORY_CHECK_INTERVAL', 1)
+    java_tree({'com/acme/orders/Order.java': COPY})
+    result = runner.invoke(main, ['examine', str(src), '-s', str(snapshot), '--format', 'summary', '--max-memory', '0'])
+    assert result.exit_code == 0, result.output
+    assert 'files\t2' in result.stdout.splitlines()
+
+    (src / 'com/acme/orders/Order.java').unlink()
+    result = runner.invoke(main, ['examine', str(src), '-s', str(snapshot), '--format', 'summary', '--max-memory', '0'])
+    assert result.exit_code == 0, result.output
+    assert 'files\t1' in result.stdout.splitlines()
+    assert load_snapshot(snapshot)['com.acme.orders'].class_files == {}
+
+def test_cli(tmp_path: Path, java_tree):
+    src = java_tree(SOURCES)
+    result = CliRunner().invoke(main, ['clones', str(src), '--kind', 'method', '--json', '-s', str(tmp_path / 'snapshot.json')])
+    assert result.exit_code == 0, result.output
+    [line] = result.stdout.splitlines()
+    clone = json.loads(line)
+    assert (clone['a']['name'], clone['b']['name'], clone['similarity']) == ('com.acme.billing.Invoice#sumLines', 'com.acme.orders.Order#addUp', 1.0)
+    assert (tmp_path / 'snapshot.json').exists()
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import pytest
+
+from scanner.grep import grep, grep_file, QueryPattern
+from scanner.sitter.java_examiner import parse_to_node
+from scanner.sitter.languages import parse
+
+JAVA_TEST = Path(__file__).parent / 'java_test'
+TEST_CLASS = JAVA_TEST / 'test' / 'TestClass.java'
+
+def test_path_pattern_matches_typed_node(): 
+    node, bs = parse_to_node(TEST_CLASS)
+    expected = [
+        (i.offset_start, i.offset_end, i.value) 
+        for m in node.search('method_declaration') for i in m.identifier
+    ]
+    found = [(m['start'], m['end'], m['text']) for m in grep_file(TEST_CLASS, 'method_declaration.identifier')]
+    assert found == expected
+    assert [f[2] for f in found] == ['main', 'getValue']
+
+def test_query_pattern(): 
+    matches = grep_file(TEST_CLASS, '(method_invocation name: (identifier) @call)')
+    assert [(m['text'], m['line']) for m in matches] == [('println', 8), ('getValue', 8)]
+    assert all(m['capture'] == 'call' for m in matches)
+
+def test_query_pattern_uses_query_cursor_when_available(monkeypatch): 
+    import tree_sitter
+    if hasattr(tree_sitter, 'QueryCursor'): 
+        pytest.skip("test_query_pattern already runs against the real QueryCursor")
+    cursors = []
+
+    class QueryCursor: 
+        # stands in for the py-tree-sitter >= 0.25 API on older versions
+        def __init__(self, query): 
+            cursors.append(query)
+            self.query = query
+        def captures(self, node): 
+            return self.query.__class__.captures(self.query, node)
+
+    monkeypatch.setattr(tree_sitter, 'QueryCursor', QueryCursor, raising=False)
+    pattern = QueryPattern('java', '(method_invocation name: (identifier) @call)')
+    root = parse('java', TEST_CLASS.read_bytes()).root_node
+    assert [n.text for (_, n) in pattern.captures(root)] == [b'println', b'getValue']
+    assert cursors == [pattern.query]
+
+def test_parallel_grep_matches_serial(tmp_path): 
+    for i in range(20): 
+        (tmp_path / f'C{i}.java').write_text(f"class C{i} {{ void m{i}() {{ new C{i}(); }} }}")
+    pattern = 'object_creation_expression.type_identifier'
+    serial = list(grep(pattern, tmp_path, workers=1))
+    parallel = list(grep(pattern, tmp_path, workers=2, chunksize=3))
+    assert len(serial) == 20
+    assert parallel == serial
+
+def test_bad_query_fails_early(): 
+    with pytest.raises(ValueError): 
+        list(grep('(no_such_node) @x', JAVA_TEST, workers=2))
+
+def test_unreadable_file_is_skipped(tmp_path): 
+    for i in range(3): 
+        (tmp_path / f'C{i}.java').write_text(f"class C{i} {{ }}")
+    # a file that's listed but is gone by the time it's read
+    (tmp_path / 'Gone.java').symlink_to(tmp_path / 'missing.java')
+    pattern = 'class_declaration.identifier'
+    for workers in (1, 2): 
+        assert sorted(m['text'] for m in grep(pattern, tmp_path, workers=workers)) == ['C0', 'C1', 'C2']
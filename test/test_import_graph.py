@@ -0,0 +1,115 @@
+import time
+from pathlib import Path
+from typing import Dict
+
+import pytest
+from click.testing import CliRunner
+
+from scanner.cli import main
+from scanner.examiner import examine_all_java
+from scanner.imports import import_target, import_graph, parse_rules, check_rules
+from scanner.sitter.java_examiner import header_source, parse_header, read_header
+
+FILES = {
+    'com/acme/web/Controller.java': ['com.acme.service.Billing', 'com.acme.db.Table', 'java.util.List'],
+    'com/acme/web/View.java': ['com.acme.service.Billing'],
+    'com/acme/service/Billing.java': ['com.acme.db.*', 'static com.acme.db.Table.create'],
+    'com/acme/db/Table.java': ['com.acme.web.View'],
+}
+
+def sources(members: int = 1) -> Dict[str, str]:
+    found = {}
+    for (name, imports) in FILES.items():
+        (pkg, stem) = (name.rsplit('/', 1)[0].replace('/', '.'), Path(name).stem)
+        body = ''.join(f"    public int m{i}(int x) {{ if (x > {i}) {{ return x * {i}; }} return m{i}(x + 1); }}\n" for i in range(members))
+        found[name] = (
+            f"package {pkg};\n\n" + ''.join(f"import {i};\n" for i in imports) +
+            f"\n/**\n class {stem} is documented here\n */\n@SuppressWarnings(\"x\")\npublic class {stem} {{\n{body}}}\n"
+        )
+    return found
+
+def test_header_source_stops_at_first_type():
+    source = b"package a;\nimport b.C;\n@Deprecated\npublic final class X { void f() { } }\n"
+    assert header_source(source) == b"package a;\nimport b.C;\n"
+    assert header_source(b"package a;\n") == b"package a;\n"
+
+def test_parse_header_falls_back_when_cut_inside_a_comment():
+    source = b"package a;\n/*\n class X is cut here\n*/\nimport b.C;\npublic class X { }\n"
+    assert read_header(parse_header(source)) == (['a'], [('b', 'C')])
+
+def test_headers_only_scan_matches_full_scan(java_tree):
+    src = java_tree(sources(members=3))
+    full = examine_all_java(src)
+    headers = examine_all_java(src, headers_only=True)
+    for pkg in full.walk():
+        for (name, cf) in pkg.class_files.items():
+            header = headers.find_package(pkg.full_path).class_files[name]
+            assert [tuple(i) for i in header.imports] == [tuple(i) for i in cf.imports]
+            assert header.classes == {}
+    assert import_graph(headers) == import_graph(full)
+
+def test_import_target():
+    assert import_target('com.acme', 'Foo') == 'com.acme'
+    # import com.acme.*;
+    assert import_target('com', 'acme') == 'com.acme'
+    # import static com.acme.Foo.bar;
+    assert import_target('com.acme.Foo', 'bar') == 'com.acme'
+    # import com.acme.Outer.Inner;
+    assert import_target('com.acme.Outer', 'Inner') == 'com.acme'
+
+def test_import_graph(java_tree):
+    root = examine_all_java(java_tree(sources()), headers_only=True)
+    assert import_graph(root) == {
+        ('com.acme.web', 'com.acme.service'): 2,
+        ('com.acme.web', 'com.acme.db'): 1,
+        ('com.acme.web', 'java.util'): 1,
+        ('com.acme.service', 'com.acme.db'): 2,
+        ('com.acme.db', 'com.acme.web'): 1,
+    }
+    assert ('com.acme.web', 'java.util') not in import_graph(root, internal_only=True)
+
+def test_rules():
+    graph = {('com.acme.web', 'com.acme.service'): 2, ('com.acme.db', 'com.acme.web'): 1, ('com.acme.web', 'com.acme.db'): 1}
+    rules = parse_rules("""
+# layering
+layers com.acme.web.*, com.acme.service.*, com.acme.db.*
+
+deny com.acme.web -> com.acme.db.*  # go through the services
+""")
+    violations = check_rules(graph, rules)
+    assert [(v.rule.line, v.source, v.target, v.count) for v in violations] == [
+        (3, 'com.acme.db', 'com.acme.web', 1),
+        (5, 'com.acme.web', 'com.acme.db', 1),
+    ]
+
+@pytest.mark.parametrize('text', ["allow a -> b", "deny a b", "layers a"])
+def test_bad_rules(text):
+    with pytest.raises(ValueError, match="Line 1"):
+        parse_rules(text)
+
+def test_cli(tmp_path: Path, java_tree):
+    src = java_tree(sources())
+    rules = tmp_path / 'rules.txt'
+    rules.write_text("layers com.acme.web.*, com.acme.service.*, com.acme.db.*\n")
+    runner = CliRunner()
+
+    result = runner.invoke(main, ['imports', str(src), '--internal-only'])
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines()[0] == 'com.acme.db -> com.acme.web 1'
+
+    result = runner.invoke(main, ['imports', str(src), '--rules', str(rules)])
+    assert result.exit_code == 1
+    assert 'VIOLATION line 1' in result.output
+
+def test_headers_only_is_faster(java_tree):
+    src = java_tree(sources(members=150))
+
+    def timed(**kwargs) -> float:
+        start = time.perf_counter()
+        examine_all_java(src, resolve=False, **kwargs)
+        return time.perf_counter() - start
+
+    full = min(timed() for _ in range(3))
+    headers = min(timed(headers_only=True) for _ in range(3))
+    # about 20x here; 10x is the target
+    assert headers * 10 < full, f"full {full:.3f}s, headers only {headers:.3f}s"
@@ -0,0 +1,130 @@
+from pathlib import Path
+from typing import List
+
+from hypothesis import given, settings, strategies as st
+
+from scanner.examiner import examine_all_java
+from scanner.packages import Package, ClassFile
+from scanner.sitter.java_examiner import examine
+
+def add_file(root: Package, pkg: str, cls: str, refs: List[str] = (), imports: List[str] = (), filename: str = None) -> ClassFile:
+    fields = ''.join(f"    private {r} f{i};\n" for (i, r) in enumerate(refs))
+    header = f"package {pkg};\n\n" + ''.join(f"import {i};\n" for i in imports)
+    source = f"{header}\npublic class {cls} {{\n{fields}}}\n".encode()
+    return examine(Path(f"/src/{pkg.replace('.', '/')}/{filename or cls}.java"), root, source=source)
+
+def remove_file(cf: ClassFile):
+    del cf.package.class_files[cf.name]
+
+def resolved_names(cf: ClassFile) -> set:
+    return {(type_id, id(cls)) for resolved in cf.resolved_type_identifiers.values() for (type_id, cls) in resolved}
+
+def reference_resolution(cf: ClassFile) -> set:
+    found = set()
+    for cls in cf.classes.values():
+        for type_id in cls.type_identifiers:
+            target = cf.resolve_type_identifier(type_id)
+            if target is not None:
+                found.add((type_id, id(target)))
+    return found
+
+def build() -> Package:
+    root = Package()
+    add_file(root, 'com.acme', 'Invoice', refs=['Line', 'User'], imports=['com.acme.users.User'])
+    add_file(root, 'com.acme', 'Line')
+    add_file(root, 'com.acme.users', 'User')
+    for i in range(50):
+        add_file(root, 'com.acme.other', f"Other{i}", refs=[f"Other{(i + 1) % 50}"])
+    root.resolve_type_identifiers()
+    return root
+
+def test_removing_a_class_resolves_only_its_referrers():
+    root = build()
+    invoice = root['com.acme'].class_files['Invoice.java']
+    assert {t for (t, _) in resolved_names(invoice)} == {'Line', 'User'}
+
+    remove_file(root['com.acme.users'].class_files['User.java'])
+    assert root.resolve_changed() == {invoice}
+    assert {t for (t, _) in resolved_names(invoice)} == {'Line'}
+
+def test_adding_a_class_resolves_files_that_were_waiting_for_it():
+    root = build()
+    remove_file(root['com.acme.users'].class_files['User.java'])
+    root.resolve_changed()
+
+    user = add_file(root, 'com.acme.users', 'User')
+    invoice = root['com.acme'].class_files['Invoice.java']
+    assert root.resolve_changed() == {user, invoice}
+    assert {t for (t, _) in resolved_names(invoice)} == {'Line', 'User'}
+
+def test_changed_file_is_resolved():
+    root = build()
+    # replace Invoice with a version that refers to something else
+    invoice = add_file(root, 'com.acme', 'Invoice', refs=['Other0'], imports=['com.acme.other.Other0'])
+    assert root.resolve_changed() == {invoice}
+    assert {t for (t, _) in resolved_names(invoice)} == {'Other0'}
+    assert root.referrers_of('com.acme', 'Line') == set()
+    assert invoice in root.referrers_of('com.acme.other', 'Other0')
+
+def test_nothing_changed_resolves_nothing():
+    root = build()
+    assert root.resolve_changed() == set()
+
+def test_first_call_resolves_everything():
+    root = Package()
+    add_file(root, 'com.acme', 'Line')
+    invoice = add_file(root, 'com.acme', 'Invoice', refs=['Line'])
+    assert len(root.resolve_changed()) == 2
+    assert {t for (t, _) in resolved_names(invoice)} == {'Line'}
+
+def test_rescan_resolves_only_the_affected_files(java_tree, monkeypatch):
+    sources = {
+        'com/acme/Invoice.java': "package com.acme;\n\npublic class Invoice { private Line line; }\n",
+        'com/acme/Line.java': "package com.acme;\n\npublic class Line { }\n",
+        'com/acme/Gone.java': "package com.acme;\n\npublic class Gone { }\n",
+        **{f"com/acme/other/Other{i}.java": f"package com.acme.other;\n\npublic class Other{i} {{ }}\n" for i in range(20)},
+    }
+    src = java_tree(sources)
+    root = examine_all_java(src)
+
+    resolved = []
+    real_resolve = ClassFile.resolve_all_class_type_identifiers
+    monkeypatch.setattr(ClassFile, 'resolve_all_class_type_identifiers', lambda cf: resolved.append(cf.name) or real_resolve(cf))
+    # Line changes, and Gone is deleted 
+    java_tree({'com/acme/Line.java': "package com.acme;\n\npublic class Line { private int n; }\n"})
+    (src / 'com/acme/Gone.java').unlink()
+    examine_all_java(src, root)
+    assert sorted(resolved) == ['Invoice.java', 'Line.java']
+    assert 'Gone.java' not in root['com.acme'].class_files
+    assert {t for (t, _) in resolved_names(root['com.acme'].class_files['Invoice.java'])} == {'Line'}
+
+NAMES = ['A', 'B', 'C']
+PACKAGES = ['p', 'q']
+
+edits = st.lists(
+    st.tuples(
+        st.sampled_from(PACKAGES),
+        st.sampled_from(['F0', 'F1', 'F2']),
+        st.one_of(st.none(), st.sampled_from(NAMES)),
+        st.lists(st.sampled_from(NAMES), max_size=3),
+        st.lists(st.sampled_from([f"{p}.{n}" for p in PACKAGES for n in NAMES]), max_size=2),
+    ),
+    max_size=12,
+)
+
+@settings(max_examples=50, deadline=None)
+@given(edits)
+def test_incremental_matches_full_resolution(edits):
+    root = Package()
+    root.resolve_type_identifiers()
+    for (pkg, filename, cls, refs, imports) in edits:
+        existing = root.get_package([pkg]).class_files.get(f"{filename}.java")
+        if cls is None:
+            if existing is not None:
+                remove_file(existing)
+        else:
+            add_file(root, pkg, cls, refs=refs, imports=imports, filename=filename)
+        root.resolve_changed()
+        for p in root.walk():
+            for cf in p.class_files.values():
+                assert resolved_names(cf) == reference_resolution(cf)
@@ -0,0 +1,87 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from scanner.examiner import ScanReport
+from scanner.maven import examine_maven, find_modules, module_dependencies, transitive_dependencies
+
+def pom(artifact: str, modules=(), dependencies=(), build: str = '') -> str: 
+    mods = ''.join(f"<module>{m}</module>" for m in modules)
+    deps = ''.join(
+        f"<dependency><groupId>${{project.groupId}}</groupId><artifactId>{d}</artifactId></dependency>" 
+        for d in dependencies
+    )
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<project>
+  <parent><groupId>com.acme</groupId><artifactId>parent</artifactId></parent>
+  <artifactId>{artifact}</artifactId>
+  <!-- modules and dependencies -->
+  <modules>{mods}</modules>
+  <dependencies>{deps}</dependencies>
+  {build}
+</project>
+"""
+
+def write(p: Path, text: str): 
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(text)
+
+@pytest.fixture
+def build(tmp_path) -> Path: 
+    write(tmp_path / 'pom.xml', pom('parent', modules=['core', 'api', 'app']).replace(
+        '<parent><groupId>com.acme</groupId><artifactId>parent</artifactId></parent>', '<groupId>com.acme</groupId>'
+    ))
+    write(tmp_path / 'core' / 'pom.xml', pom('core'))
+    write(tmp_path / 'core' / 'src' / 'main' / 'java' / 'com' / 'acme' / 'core' / 'Engine.java', 
+          "package com.acme.core; public class Engine { }")
+    write(tmp_path / 'core' / 'target' / 'Stray.java', "package com.acme.stray; public class Stray { }")
+    write(tmp_path / 'api' / 'pom.xml', pom('api', build='<build><sourceDirectory>${project.basedir}/java</sourceDirectory></build>'))
+    write(tmp_path / 'api' / 'java' / 'com' / 'acme' / 'api' / 'Gadget.java', 
+          "package com.acme.api; public class Gadget { }")
+    write(tmp_path / 'app' / 'pom.xml', pom('app', dependencies=['core', 'junit']))
+    write(tmp_path / 'app' / 'src' / 'test' / 'java' / 'com' / 'acme' / 'app' / 'App.java', """
+package com.acme.app; 
+
+import com.acme.core.Engine; 
+import com.acme.api.Gadget; 
+
+public class App { 
+    private Engine engine; 
+    private Gadget gadget; 
+}
+""")
+    return tmp_path
+
+def test_module_graph(build): 
+    modules = find_modules(build)
+    assert set(modules) == {'com.acme:parent', 'com.acme:core', 'com.acme:api', 'com.acme:app'}
+    assert modules['com.acme:api'].source_roots == [build / 'api' / 'java']
+    assert modules['com.acme:app'].source_roots == [build / 'app' / 'src' / 'test' / 'java']
+    graph = module_dependencies(modules)
+    assert graph['com.acme:app'] == {'com.acme:core'}
+    assert transitive_dependencies(graph)['com.acme:core'] == set()
+
+def test_resolution_is_limited_to_dependencies(build): 
+    root = examine_maven(build, workers=2)
+    assert root['com.acme.stray'] is None
+    app = root['com.acme.app'].class_files['App.java']
+    resolved = dict(app.resolved_type_identifiers['App'])
+    # app depends on core, but not on api
+    assert resolved['Engine'] is root['com.acme.core'].class_files['Engine.java'].classes['Engine']
+    assert 'Gadget' not in resolved
+    assert root['com.acme.api'].class_files['Gadget.java'] is not None
+
+def test_unreadable_external_archives_are_skipped(build, tmp_path_factory): 
+    libs = tmp_path_factory.mktemp('libs')
+    with zipfile.ZipFile(libs / 'lib-sources.jar', 'w') as zf: 
+        zf.writestr('com/acme/lib/Widget.java', "package com.acme.lib; public class Widget { }")
+    (libs / 'broken-sources.jar').write_bytes(b'not a zip file')
+    report = ScanReport()
+    root = examine_maven(build, external=[libs], report=report)
+    assert root['com.acme.lib'].is_external
+    assert [(p.name, reason.split(':')[0]) for (p, reason) in report.skipped] == [('broken-sources.jar', 'BadZipFile')]
+
+def test_dependency_cycles_are_rejected(): 
+    with pytest.raises(ValueError): 
+        transitive_dependencies({'a': {'b'}, 'b': {'a'}})
@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+from pathlib import Path
+
+from click.testing import CliRunner
+from rich.tree import Tree
+
+from scanner.cli import main
+from scanner.examiner import examine_all_java
+from scanner.output import records, write_csv, write_ndjson, summary, COLUMNS
+from scanner.snapshot import save_snapshot, open_snapshot
+
+SOURCE = """
+package com.acme;
+
+@Deprecated
+public class Invoice {
+    private int total;
+    public String describe(int width, String prefix) { return prefix; }
+
+    public static class Line {
+        private long amount;
+    }
+}
+"""
+
+SOURCES = {'com/acme/Invoice.java': SOURCE}
+
+def depth(t: Tree) -> int:
+    return 1 + max((depth(c) for c in t.children), default=0)
+
+def test_records(java_tree):
+    root = examine_all_java(java_tree(SOURCES))
+    found = [(r['kind'], r['class'], r['name']) for r in records(root)]
+    assert found == [
+        ('file', None, 'Invoice.java'),
+        ('class', 'Invoice', 'Invoice'),
+        ('field', 'Invoice', 'total'),
+        ('method', 'Invoice', 'describe'),
+        ('class', 'Invoice.Line', 'Line'),
+        ('field', 'Invoice.Line', 'amount'),
+    ]
+    method = next(r for r in records(root) if r['kind'] == 'method')
+    assert method['parameters'] == ['int width', 'String prefix']
+    assert method['type'] == 'String'
+
+def test_overloads_are_all_recorded(java_tree):
+    root = examine_all_java(java_tree({'com/acme/Printer.java': """package com.acme;
+
+public class Printer {
+    void print(int n) { }
+    void print(String s) { }
+    void flush() { }
+}
+"""}))
+    assert [r['name'] for r in records(root) if r['kind'] == 'method'] == ['print(int)', 'print(String)', 'flush']
+    assert summary(root)['method'] == 3
+
+def test_ndjson_and_csv_agree(java_tree):
+    root = examine_all_java(java_tree(SOURCES))
+    (ndjson, table) = (io.StringIO(), io.StringIO())
+    write_ndjson(root, ndjson)
+    write_csv(root, table)
+    lines = [json.loads(l) for l in ndjson.getvalue().splitlines()]
+    rows = list(csv.DictReader(io.StringIO(table.getvalue())))
+    assert list(rows[0]) == COLUMNS
+    assert [(l['kind'], l['name']) for l in lines] == [(r['kind'], r['name']) for r in rows]
+    assert rows[1]['annotations'] == '@Deprecated()'
+
+def test_summary(java_tree):
+    assert summary(examine_all_java(java_tree(SOURCES))) == {
+        'packages': 1, 'files': 1, 'external_files': 0, 'class': 2, 'field': 2, 'method': 1,
+    }
+
+def test_max_depth(java_tree):
+    root = examine_all_java(java_tree(SOURCES))
+    full = root.as_tree()
+    for d in range(1, 6):
+        t = root.as_tree(max_depth=d)
+        assert depth(t) == min(d + 1, depth(full))
+    assert depth(root.as_tree(max_depth=20)) == depth(full)
+    assert root.as_tree(max_depth=0).label == ' …'
+
+def test_load_streams_without_hydrating(tmp_path: Path, java_tree):
+    root = examine_all_java(java_tree(SOURCES))
+    snapshot = tmp_path / 'snapshot.json'
+    save_snapshot(root, snapshot)
+    opened = open_snapshot(snapshot)
+    assert len(list(records(opened, class_files=lambda pkg: pkg.iter_class_files()))) == 6
+    assert not opened['com.acme'].is_hydrated
+
+    result = CliRunner().invoke(main, ['load', str(snapshot), '--format', 'csv'])
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines()[0] == ','.join(COLUMNS)
+    assert len(result.output.splitlines()) == 7
+
+def test_examine_keeps_progress_off_stdout(java_tree):
+    result = CliRunner().invoke(main, ['examine', str(java_tree(SOURCES)), '--format', 'ndjson'])
+    assert result.exit_code == 0, result.output
+    assert [json.loads(l)['kind'] for l in result.stdout.splitlines()][0] == 'file'
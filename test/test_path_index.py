@@ -0,0 +1,86 @@
+import os
+import zipfile
+from pathlib import Path
+
+from scanner.examiner import examine_all_java
+from scanner.packages import Package, ClassFile
+
+CLASSES = [('com.acme.billing', 'Invoice'), ('com.acme.billing', 'Payment'), ('com.acme.billing.tax', 'Rate'), ('com.acme.users', 'User')]
+
+def names(cfs) -> list:
+    return [cf.name for cf in cfs]
+
+def test_owner_of(class_tree):
+    src = class_tree(CLASSES)
+    root = examine_all_java(src)
+    invoice = src / 'com' / 'acme' / 'billing' / 'Invoice.java'
+
+    cf = root.owner_of(invoice)
+    assert cf is root['com.acme.billing'].class_files['Invoice.java']
+    # relative and un-normalized spellings of the same path
+    assert root.owner_of(Path(os.path.relpath(invoice))) is cf
+    assert root.owner_of(src / 'com' / 'acme' / '..' / 'acme' / 'billing' / 'Invoice.java') is cf
+    assert root.owner_of(src / 'Nope.java') is None
+
+    assert root.contains_file_at_path(invoice)
+    assert root['com.acme.billing'].contains_file_at_path(invoice)
+    assert not root['com.acme.users'].contains_file_at_path(invoice)
+
+def test_owner_of_through_a_symlink(tmp_path: Path, class_tree):
+    src = class_tree(CLASSES)
+    root = examine_all_java(src)
+    (tmp_path / 'link').symlink_to(src)
+    cf = root.owner_of(tmp_path / 'link' / 'com' / 'acme' / 'users' / 'User.java')
+    assert cf is not None and cf.name == 'User.java'
+
+def test_files_under(tmp_path: Path, class_tree):
+    src = class_tree(CLASSES)
+    root = examine_all_java(src)
+    billing = src / 'com' / 'acme' / 'billing'
+    assert names(root.files_under(billing)) == ['Invoice.java', 'Payment.java', 'Rate.java']
+    assert names(root.files_under(billing / 'tax')) == ['Rate.java']
+    assert len(root.files_under(src)) == 4
+    assert root.files_under(tmp_path / 'elsewhere') == []
+    assert names(root['com.acme.billing.tax'].files_under(billing)) == ['Rate.java']
+
+def test_index_is_kept_current(class_tree):
+    src = class_tree(CLASSES)
+    root = examine_all_java(src)
+    billing = root['com.acme.billing']
+    tax = src / 'com' / 'acme' / 'billing' / 'tax'
+    assert len(root.path_index()) == 4
+
+    del root['com.acme.billing.tax'].class_files['Rate.java']
+    assert root.owner_of(tax / 'Rate.java') is None
+    assert root.files_under(tax) == []
+    assert root.path_index().subdirs.get(str(src / 'com' / 'acme' / 'billing')) == set()
+
+    added = ClassFile(billing, src / 'com' / 'acme' / 'billing' / 'Refund.java', 'Refund.java')
+    billing.class_files['Refund.java'] = added
+    assert root.owner_of(added.file) is added
+    assert added.file in billing.source_files()
+
+    billing.class_files = {}
+    assert root.files_under(src / 'com' / 'acme' / 'billing') == []
+    assert len(root.path_index()) == 1
+
+def test_queries_do_not_stat_known_files(class_tree, monkeypatch):
+    src = class_tree(CLASSES)
+    root = examine_all_java(src)
+    root.path_index()
+    calls = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, 'stat', lambda *args, **kwargs: calls.append(args) or real_stat(*args, **kwargs))
+    for _ in range(10):
+        assert root.contains_file_at_path(src / 'com' / 'acme' / 'users' / 'User.java')
+    assert calls == []
+
+def test_archive_members(tmp_path: Path):
+    jar = tmp_path / 'lib-sources.jar'
+    with zipfile.ZipFile(jar, 'w') as zf:
+        zf.writestr('com/acme/lib/Widget.java', b"package com.acme.lib;\n\npublic class Widget { }\n")
+    root = examine_all_java(jar)
+    cf = root['com.acme.lib'].class_files['Widget.java']
+    assert root.owner_of(cf.file) is cf
+    assert root.files_under(jar) == [cf]
+    assert root.files_under(tmp_path) == [cf]
@@ -0,0 +1,189 @@
+"""Scaling and equivalence properties of the parsing, querying and resolution code
+
+Each scaling test runs the same generated input at two sizes, and checks that growing the input
+by SCALE grows the time (and, where it matters, the peak memory) by not much more than SCALE,
+so that a quadratic blowup (which would grow it by SCALE ** 2) fails the test.
+"""
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List
+
+from hypothesis import given, settings, strategies as st
+
+from scanner.packages import Package
+from scanner.sitter.java_examiner import (
+    examine, examine_header, convert_to_dict, parse_bytes_to_node
+)
+from scanner.sitter.languages import get_language, parse
+from scanner.sitter.node import QuerySet, TypedNode
+from scanner.sitter import xml_examiner
+
+SCALE = 4
+# How far past linear growth a measurement may go before it counts as a blowup
+SLACK = 2.5
+
+scaling = settings(max_examples=4, deadline=None)
+equivalence = settings(max_examples=25, deadline=None)
+
+def best_time(fn: Callable[[], any], repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def peak_memory(fn: Callable[[], any]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def assert_near_linear(fn: Callable[[int], any], n: int, memory: bool = False):
+    small = best_time(lambda: fn(n))
+    large = best_time(lambda: fn(n * SCALE))
+    # a floor on the small measurement, so that timer noise on tiny inputs doesn't fail the test
+    assert large <= SCALE * SLACK * max(small, 2e-3), f"time grew {large / small:.1f}x for {SCALE}x the input"
+    if memory:
+        small = peak_memory(lambda: fn(n))
+        large = peak_memory(lambda: fn(n * SCALE))
+        assert large <= SCALE * SLACK * small, f"memory grew {large / small:.1f}x for {SCALE}x the input"
+
+MEMBERS = {
+    'field': "    private int f{i};\n",
+    'generic_field': "    private java.util.Map<String, List<Integer>> g{i};\n",
+    'method': "    public String m{i}(int a, String b) {{ return b + a; }}\n",
+    'annotated_method': "    @Deprecated\n    @SuppressWarnings(value = \"x\")\n    protected static void a{i}() {{ }}\n",
+    'inner_class': "    public static class Inner{i} {{ private long v{i}; }}\n",
+}
+STATEMENTS = {
+    'if': ("if (x > {i}) {{\n", "}}\n"),
+    'while': ("while (x < {i}) {{\n", "}}\n"),
+    'block': ("{{ int y{i} = x + {i};\n", "}}\n"),
+    'try': ("try {{\n", "}} catch (Exception e{i}) {{ }}\n"),
+}
+
+motifs = st.lists(st.sampled_from(sorted(MEMBERS)), min_size=1, max_size=4)
+nestings = st.lists(st.sampled_from(sorted(STATEMENTS)), min_size=1, max_size=3)
+
+def java_with_members(motif: List[str], n: int) -> bytes:
+    body = ''.join(MEMBERS[kind].format(i=f"{i}_{j}") for i in range(n) for (j, kind) in enumerate(motif))
+    return f"package com.acme;\n\nimport java.util.List;\n\npublic class Big {{\n{body}}}\n".encode()
+
+def java_with_nesting(nesting: List[str], depth: int) -> bytes:
+    opens = ''.join(STATEMENTS[nesting[i % len(nesting)]][0].format(i=i) for i in range(depth))
+    closes = ''.join(STATEMENTS[nesting[i % len(nesting)]][1].format(i=i) for i in reversed(range(depth)))
+    return f"package com.acme;\n\npublic class Deep {{\n void f(int x) {{\n{opens}{closes} }}\n}}\n".encode()
+
+def xml_with_siblings(n: int) -> bytes:
+    items = ''.join(f'  <bean id="b{i}" class="com.acme.B{i}"><!-- {i} --><property name="p" value="{i}"/></bean>\n' for i in range(n))
+    return f'<?xml version="1.0"?>\n<beans>\n{items}</beans>\n'.encode()
+
+def xml_with_nesting(depth: int) -> bytes:
+    return ''.join(f'<e{i} a="{i}">t{i}' for i in range(depth)).encode() + ''.join(f'</e{i}>' for i in reversed(range(depth))).encode()
+
+def examine_bytes(bs: bytes) -> Package:
+    root = Package()
+    examine(Path('Big.java'), root, source=bs)
+    return root
+
+def create_xml(bs: bytes) -> xml_examiner.XMLContent:
+    tree = parse('xml', bs)
+    d = xml_examiner.convert_to_dict(tree.root_node, get_language('xml'), internal_values=False)
+    return xml_examiner.create_xml_tree(TypedNode(d, source=bs).element[0])
+
+def package_with_files(n: int) -> Package:
+    root = Package()
+    for i in range(n):
+        src = f"""
+package com.acme;
+
+import com.acme.other.Thing{i};
+
+public class C{i} {{
+    private C{(i + 1) % n} next;
+    private Thing{i} thing;
+    private Missing{i} missing;
+}}
+""".encode()
+        examine(Path(f"C{i}.java"), root, source=src)
+    return root
+
+@scaling
+@given(motifs)
+def test_parse_to_node_scales_with_siblings(motif):
+    assert_near_linear(lambda n: parse_bytes_to_node(java_with_members(motif, n)), 25, memory=True)
+
+@scaling
+@given(nestings)
+def test_parse_to_node_scales_with_depth(nesting):
+    assert_near_linear(lambda d: parse_bytes_to_node(java_with_nesting(nesting, d)), 25, memory=True)
+
+@scaling
+@given(motifs)
+def test_construct_class_scales_with_siblings(motif):
+    assert_near_linear(lambda n: examine_bytes(java_with_members(motif, n)), 25)
+
+@scaling
+@given(nestings)
+def test_construct_class_scales_with_depth(nesting):
+    assert_near_linear(lambda d: examine_bytes(java_with_nesting(nesting, d)), 25)
+
+def test_query_set_chaining_scales():
+    node, _ = parse_bytes_to_node(java_with_members(['field', 'method'], 400))
+    members = list(node.class_declaration.class_body.children)
+    assert_near_linear(lambda n: QuerySet(members[:n]).identifier.value, 100)
+
+def test_create_xml_tree_scales_with_siblings():
+    assert_near_linear(lambda n: create_xml(xml_with_siblings(n)), 50, memory=True)
+
+def test_create_xml_tree_scales_with_depth():
+    assert_near_linear(lambda d: create_xml(xml_with_nesting(d)), 30, memory=True)
+
+def test_resolve_type_identifiers_scales_with_package_size():
+    roots = {n: package_with_files(n) for n in (200, 200 * SCALE)}
+    assert_near_linear(lambda n: roots[n].resolve_type_identifiers(), 200)
+
+@equivalence
+@given(motifs, st.integers(min_value=1, max_value=4), nestings, st.integers(min_value=1, max_value=6))
+def test_lazy_values_match_reference(motif, n, nesting, depth):
+    for bs in (java_with_members(motif, n), java_with_nesting(nesting, depth)):
+        tree = parse('java', bs)
+        reference = TypedNode(convert_to_dict(tree.root_node, get_language('java'), internal_values=True))
+        lazy, _ = parse_bytes_to_node(bs)
+
+        pending = [(reference, lazy)]
+        while pending:
+            (r, l) = pending.pop()
+            assert (r.type, r.value, r.offset_start, r.offset_end) == (l.type, l.value, l.offset_start, l.offset_end)
+            assert len(r.children) == len(l.children)
+            pending.extend(zip(r.children, l.children))
+
+@equivalence
+@given(st.lists(st.integers(min_value=0, max_value=3), max_size=20))
+def test_query_set_getattr_matches_reference(counts):
+    from functools import reduce
+
+    class Item:
+        def __init__(self, count):
+            self.attr = QuerySet(list(range(count))) if count != 1 else 'single'
+
+    qs = QuerySet([Item(c) for c in counts])
+    reference = reduce(lambda a, b: a + b, [getattr(e, 'attr') for e in qs], QuerySet())
+    if len(counts) == 1:
+        reference = qs[0].attr
+    assert list(qs.attr) == list(reference)
+
+@equivalence
+@given(st.lists(st.sampled_from(['java.util.List', 'com.acme.*', 'static org.junit.Assert.assertEquals', 'a.B']), max_size=6))
+def test_header_paths_match_full_examine(imports):
+    source = ("package com.acme.gen;\n" + ''.join(f"import {i};\n" for i in imports) + "public class Gen { }\n").encode()
+    full = examine(Path('Gen.java'), Package(), source=source)
+    from_tree = examine_header(Path('Gen.java'), Package(), source=source, tree=parse('java', source))
+    from_text = examine_header(Path('Gen.java'), Package(), source=source)
+    for header in (from_tree, from_text):
+        assert header.package.full_path == full.package.full_path
+        assert [tuple(i) for i in header.imports] == [tuple(i) for i in full.imports]
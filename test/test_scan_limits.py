@@ -0,0 +1,69 @@
+import zipfile
+from pathlib import Path
+
+from scanner.examiner import examine_all_java, examine_guarded, ScanLimits, ScanReport
+from scanner.packages import Package
+from scanner.paths import search_archive_java_files
+from scanner.sitter.java_examiner import read_header, read_header_text
+from scanner.sitter.languages import parse
+
+HEADER = b"""
+package com.acme.gen; 
+
+import java.util.List; 
+import static com.acme.util.Strings.join; 
+import com.acme.model.*; 
+"""
+
+def test_header_readers_agree(): 
+    source = HEADER + b"public class Gen { }\n"
+    expected = (['com', 'acme', 'gen'], [('java.util', 'List'), ('com.acme.util.Strings', 'join'), ('com.acme', 'model')])
+    assert read_header(parse('java', source)) == expected
+    assert read_header_text(source) == expected
+
+def test_bad_files_do_not_stop_the_scan(tmp_path): 
+    (tmp_path / 'Good.java').write_text("package com.acme; public class Good { }")
+    (tmp_path / 'NoPackage.java').write_text("public class NoPackage { }")
+    (tmp_path / 'Broken.java').write_bytes(HEADER + b"public class Broken { void f( { }")
+    (tmp_path / 'Huge.java').write_bytes(HEADER + b"public class Huge { }" + b" " * 4096)
+
+    report = ScanReport()
+    root = examine_all_java(tmp_path, limits=ScanLimits(max_file_size=1024), report=report)
+
+    assert 'Good' in root['com.acme'].class_files['Good.java'].classes
+    assert 'NoPackage' in root.class_files['NoPackage.java'].classes
+    degraded = dict((p.name, reason) for (p, reason) in report.degraded)
+    assert set(degraded) == {'Broken.java', 'Huge.java'}
+    assert degraded['Broken.java'] == 'syntax errors'
+    for name in ('Broken.java', 'Huge.java'): 
+        cf = root['com.acme.gen'].class_files[name]
+        assert cf.classes == {}
+        assert ('java.util', 'List') in cf.imports
+
+def test_huge_archive_members_are_not_read_whole(tmp_path): 
+    jar = tmp_path / 'gen-sources.jar'
+    with zipfile.ZipFile(jar, 'w', compression=zipfile.ZIP_DEFLATED) as zf: 
+        zf.writestr('com/acme/gen/Huge.java', HEADER + b"public class Huge { }" + b" " * (1 << 20))
+        zf.writestr('com/acme/gen/Small.java', HEADER + b"public class Small { }")
+    members = {p.name: (len(bs), size) for (p, bs, size) in search_archive_java_files(jar, max_size=1024, head_bytes=256)}
+    assert members == {'Huge.java': (256, len(HEADER) + 21 + (1 << 20)), 'Small.java': (len(HEADER) + 22,) * 2}
+
+    report = ScanReport()
+    root = examine_all_java(jar, limits=ScanLimits(max_file_size=1024), report=report)
+    assert [p.name for (p, _) in report.degraded] == ['Huge.java']
+    assert ('java.util', 'List') in root['com.acme.gen'].class_files['Huge.java'].imports
+    assert 'Small' in root['com.acme.gen'].class_files['Small.java'].classes
+
+def test_parse_timeout_falls_back_to_header(tmp_path): 
+    p = tmp_path / 'Slow.java'
+    p.write_bytes(HEADER + b"class Slow { " + b"int f() { return 1 + 2 + 3; } " * 50000 + b"}")
+    report = ScanReport()
+    root = Package()
+    cf = examine_guarded(p, root, limits=ScanLimits(max_file_size=None, parse_timeout=1e-6), report=report)
+    assert cf is root['com.acme.gen'].class_files['Slow.java']
+    assert [r for (_, r) in report.degraded][0].startswith('Parsing took longer')
+
+def test_unreadable_files_are_skipped(tmp_path): 
+    report = ScanReport()
+    assert examine_guarded(tmp_path / 'Missing.java', Package(), report=report) is None
+    assert len(report.skipped) == 1
@@ -0,0 +1,156 @@
+import socket
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from scanner.cli import main
+from scanner.examiner import examine_all_java
+from scanner.packages import Package
+from scanner.server import ModelServer, request, socket_in_use
+
+SOURCES = {
+    'com/acme/billing/Invoice.java': """
+package com.acme.billing;
+
+import com.acme.users.User;
+
+@Deprecated
+public class Invoice {
+    private User owner;
+    private Line line;
+
+    @Override
+    public String toString() { return ""; }
+
+    public static class Line { }
+}
+""",
+    'com/acme/users/User.java': """
+package com.acme.users;
+
+public class User {
+    @Deprecated
+    private String name;
+}
+""",
+}
+
+def start_server(tmp_path: Path, java_tree):
+    src = java_tree(SOURCES)
+    model = ModelServer(examine_all_java(src))
+    sock = tmp_path / 'scanner.sock'
+    thread = threading.Thread(target=model.serve, args=(sock,), daemon=True)
+    thread.start()
+    for _ in range(200):
+        if socket_in_use(sock):
+            break
+        time.sleep(0.01)
+    return (src, sock, thread)
+
+def test_queries(tmp_path: Path, java_tree):
+    (src, sock, thread) = start_server(tmp_path, java_tree)
+    try:
+        assert request(sock, {"op": "ping"}) == {"ok": True, "result": "pong"}
+
+        invoice = request(sock, {"op": "lookup", "name": "com.acme.billing.Invoice"})['result']
+        assert invoice['qualified_name'] == 'com.acme.billing.Invoice'
+        assert 'owner' in invoice['fields']
+        assert request(sock, {"op": "lookup", "name": "com.acme.billing.Invoice.Line"})['result']['name'] == 'Line'
+        assert request(sock, {"op": "lookup", "name": "com.acme"})['result']['packages'] == ['billing', 'users']
+        assert request(sock, {"op": "lookup", "path": str(src / 'com/acme/users/User.java')})['result']['classes'] == ['User']
+        assert request(sock, {"op": "lookup", "name": "com.acme.Nope"})['result'] is None
+
+        deprecated = request(sock, {"op": "annotations", "name": "@Deprecated"})['result']
+        assert sorted((d['class'], d['kind'], d['member']) for d in deprecated) == [
+            ('com.acme.billing.Invoice', 'class', None),
+            ('com.acme.users.User', 'field', 'name'),
+        ]
+
+        assert request(sock, {"op": "dependencies", "name": "com.acme.billing.Invoice"})['result'] == ['com.acme.users.User']
+        assert request(sock, {"op": "dependencies", "name": "com.acme.users.User", "reverse": True})['result'] == ['com.acme.billing.Invoice']
+
+        bad = request(sock, {"op": "frobnicate"})
+        assert not bad['ok'] and 'frobnicate' in bad['error']
+    finally:
+        request(sock, {"op": "shutdown"})
+        thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert not sock.exists()
+
+def test_rescan(tmp_path: Path, java_tree):
+    (src, sock, thread) = start_server(tmp_path, java_tree)
+    try:
+        user = src / 'com/acme/users/User.java'
+        user.write_text("package com.acme.users;\n\npublic class Person { }\n")
+        result = request(sock, {"op": "rescan", "paths": [str(user)]})['result']
+        assert result['rescanned'] == [user.as_posix()]
+        assert request(sock, {"op": "lookup", "name": "com.acme.users.User"})['result'] is None
+        assert request(sock, {"op": "lookup", "name": "com.acme.users.Person"})['ok']
+        assert request(sock, {"op": "dependencies", "name": "com.acme.billing.Invoice"})['result'] == []
+
+        user.unlink()
+        result = request(sock, {"op": "rescan", "paths": [str(user)]})['result']
+        assert result['removed'] == [user.as_posix()]
+        assert request(sock, {"op": "lookup", "path": str(user)})['result'] is None
+    finally:
+        request(sock, {"op": "shutdown"})
+        thread.join(timeout=5)
+
+def test_rescan_of_directories_and_other_files(tmp_path: Path, java_tree):
+    (src, sock, thread) = start_server(tmp_path, java_tree)
+    try:
+        readme = src / 'README.md'
+        readme.write_text("# not java\n")
+        result = request(sock, {"op": "rescan", "paths": [str(readme)]})['result']
+        assert (result['rescanned'], result['ignored']) == ([], [readme.as_posix()])
+        assert request(sock, {"op": "lookup", "name": ""})['result']['files'] == []
+
+        users = src / 'com/acme/users'
+        (users / 'User.java').unlink()
+        (users / 'Group.java').write_text("package com.acme.users;\n\npublic class Group { }\n")
+        result = request(sock, {"op": "rescan", "paths": [str(users)]})['result']
+        assert result['rescanned'] == [(users / 'Group.java').as_posix()]
+        assert result['removed'] == [(users / 'User.java').as_posix()]
+        assert request(sock, {"op": "lookup", "name": "com.acme.users.Group"})['ok']
+    finally:
+        request(sock, {"op": "shutdown"})
+        thread.join(timeout=5)
+
+def test_serve_refuses_a_socket_in_use(tmp_path: Path, java_tree):
+    (src, sock, thread) = start_server(tmp_path, java_tree)
+    try:
+        with pytest.raises(FileExistsError):
+            ModelServer(Package()).serve(sock)
+        result = CliRunner().invoke(main, ['serve', str(src), '--socket', str(sock)])
+        assert result.exit_code != 0 and 'already listening' in result.output
+        assert request(sock, {"op": "ping"})['ok']
+    finally:
+        request(sock, {"op": "shutdown"})
+        thread.join(timeout=5)
+
+    # a socket file left behind by a daemon that's gone is taken over
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(sock))
+    stale.close()
+    (_, sock, thread) = start_server(tmp_path, java_tree)
+    try:
+        assert request(sock, {"op": "ping"})['ok']
+    finally:
+        request(sock, {"op": "shutdown"})
+        thread.join(timeout=5)
+
+def test_cli_client(tmp_path: Path, java_tree):
+    (src, sock, thread) = start_server(tmp_path, java_tree)
+    runner = CliRunner()
+    try:
+        result = runner.invoke(main, ['query', '--socket', str(sock), 'dependencies', '-r', 'com.acme.users.User'])
+        assert result.exit_code == 0, result.output
+        assert 'com.acme.billing.Invoice' in result.output
+    finally:
+        assert runner.invoke(main, ['query', '--socket', str(sock), 'shutdown']).exit_code == 0
+        thread.join(timeout=5)
+    result = runner.invoke(main, ['query', '--socket', str(sock), 'ping'])
+    assert result.exit_code != 0 and "Can't reach the daemon" in result.output
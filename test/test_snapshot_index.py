@@ -0,0 +1,56 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from scanner.examiner import examine_all_java
+from scanner.packages import Package
+from scanner.snapshot import save_snapshot, load_snapshot, open_snapshot, load_package, index_path
+
+CLASSES = [('com.acme.billing', 'Invoice'), ('com.acme.billing.tax', 'Rate'), ('com.acme.users', 'User')]
+
+@pytest.fixture
+def saved_snapshot(tmp_path: Path, class_tree) -> Path:
+    root = examine_all_java(class_tree(CLASSES, body='private String name; '))
+    p = tmp_path / 'snapshot.json'
+    save_snapshot(root, p)
+    return p
+
+def test_save_snapshot_writes_index(saved_snapshot: Path):
+    p = saved_snapshot
+    index = json.loads(index_path(p).read_text())
+    assert index['size'] == p.stat().st_size
+    assert set(index['packages']) >= {'', 'com.acme.billing', 'com.acme.billing.tax', 'com.acme.users'}
+    # the snapshot itself is unchanged in shape
+    assert json.loads(p.read_text())['packages']['com']['packages']['acme']['full_path'] == ['com', 'acme']
+
+def test_open_snapshot_hydrates_on_demand(saved_snapshot: Path):
+    p = saved_snapshot
+    root = open_snapshot(p)
+    billing = root['com.acme.billing']
+    users = root['com.acme.users']
+    assert not billing.is_hydrated and not users.is_hydrated
+    assert list(billing.class_files) == ['Invoice.java']
+    assert billing.is_hydrated and not users.is_hydrated
+    assert billing.class_files['Invoice.java'].package is billing
+
+def test_open_snapshot_matches_full_load(saved_snapshot: Path):
+    p = saved_snapshot
+    assert open_snapshot(p).asdict() == load_snapshot(p).asdict()
+
+def test_load_package_reads_only_the_subtree(saved_snapshot: Path):
+    p = saved_snapshot
+    billing = load_package(p, 'com.acme.billing')
+    assert billing.full_name == 'com.acme.billing'
+    assert set(billing.packages) == {'tax'}
+    assert billing.asdict() == load_snapshot(p)['com.acme.billing'].asdict()
+    assert load_package(p, 'com.acme.missing') is None
+
+def test_stale_index_falls_back_to_full_load(saved_snapshot: Path):
+    p = saved_snapshot
+    with p.open('at') as outf:
+        outf.write(' ')
+    root = open_snapshot(p)
+    assert root['com.acme.users'].is_hydrated
+    assert load_package(p, 'com.acme.users').full_name == 'com.acme.users'
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import scanner
+
+# Wall-clock budget for `scanner --help`, including interpreter startup.  The CLI is 
+# run from hooks many times a day, so this should only ever go down.
+STARTUP_BUDGET_SECONDS = 0.5
+
+HEAVY_MODULES = ['rich', 'tree_sitter_language_pack', 'scanner.sitter.java_examiner']
+
+def run_python(code: str) -> subprocess.CompletedProcess: 
+    env = { **os.environ, 'PYTHONPATH': str(Path(scanner.__file__).parent.parent) }
+    return subprocess.run(
+        [sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True
+    )
+
+def test_cli_import_is_lazy(): 
+    out = run_python(
+        "import sys, scanner.cli; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    assert out.stdout.strip() == ''
+
+def test_record_output_does_not_import_rich(tmp_path): 
+    src = tmp_path / 'src'
+    src.mkdir()
+    (src / 'A.java').write_text("public class A { }\n")
+    (src / 'Big.java').write_text("public class Big { }\n" + "// padding\n" * 200)
+    out = run_python(
+        "import sys; from scanner.cli import main; "
+        f"main(['examine', {str(src)!r}, '--format', 'ndjson', '--max-file-size', '1K'], standalone_mode=False); "
+        "sys.stderr.write('rich' if 'rich' in sys.modules else 'no rich')"
+    )
+    assert out.stdout.count('"kind": "file"') == 2
+    assert 'HEADER ONLY' in out.stderr
+    assert out.stderr.endswith('no rich')
+
+def test_grammars_load_on_first_use(): 
+    out = run_python(
+        "import sys, scanner.sitter.java_examiner as je; "
+        "print('tree_sitter_language_pack' in sys.modules); "
+        "je.JAVA_LANG; "
+        "print('tree_sitter_language_pack' in sys.modules)"
+    )
+    assert out.stdout.split() == ['False', 'True']
+
+def test_parsers_are_cached_per_thread(): 
+    from concurrent.futures import ThreadPoolExecutor
+    from scanner.sitter.languages import get_parser
+
+    assert get_parser('java') is get_parser('java')
+    with ThreadPoolExecutor(max_workers=1) as pool: 
+        other = pool.submit(get_parser, 'java').result()
+    assert other is not get_parser('java')
+
+def test_help_startup_budget(): 
+    timings = [] 
+    for _ in range(5): 
+        start = time.perf_counter()
+        run_python("from scanner.cli import main; main(['--help'], standalone_mode=False)")
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    median = timings[len(timings) // 2]
+    assert median < STARTUP_BUDGET_SECONDS, f"scanner --help took {median:.3f}s"
@@ -0,0 +1,100 @@
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict
+
+from scanner.examiner import examine_all_java
+from scanner.packages import Package, ClassFile
+
+WORKERS = 8
+
+def sources(packages: int = 20, files: int = 10) -> Dict[str, str]:
+    found = {}
+    for i in range(packages):
+        for j in range(files):
+            members = ''.join(f"    private C{(j + k) % files} f{k};\n    public int m{k}(int x) {{ return x + {k}; }}\n" for k in range(20))
+            found[f"com/acme/p{i}/C{j}.java"] = (
+                f"package com.acme.p{i};\n\nimport com.acme.p{(i + 1) % packages}.C0;\n\npublic class C{j} {{\n{members}}}\n"
+            )
+    return found
+
+def test_threaded_scan_matches_serial(java_tree):
+    src = java_tree(sources())
+    serial = examine_all_java(src)
+    threaded = examine_all_java(src, workers=WORKERS)
+    assert threaded.asdict() == serial.asdict()
+    assert len(threaded.files_under(src)) == 200
+
+def test_threaded_scan_keeps_external_sources_first(tmp_path: Path, java_tree):
+    src = java_tree(sources(packages=2, files=2))
+    with zipfile.ZipFile(tmp_path / 'lib-sources.jar', 'w') as zf:
+        zf.writestr('com/acme/p0/C0.java', b"package com.acme.p0;\n\npublic class FromJar { }\n")
+        zf.writestr('com/acme/lib/Widget.java', b"package com.acme.lib;\n\npublic class Widget { }\n")
+    root = examine_all_java(src, external=[tmp_path / 'lib-sources.jar'], workers=WORKERS)
+    assert not root['com.acme.p0'].class_files['C0.java'].external
+    assert root['com.acme.lib'].class_files['Widget.java'].external
+
+def test_concurrent_get_package(tmp_path: Path):
+    root = Package()
+    found = []
+    barrier = threading.Barrier(WORKERS)
+
+    def add():
+        barrier.wait()
+        found.append([root.get_package(['com', 'acme', f"p{i % 5}"]) for i in range(200)])
+
+    threads = [threading.Thread(target=add) for _ in range(WORKERS)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(root['com.acme'].packages) == 5
+    for pkgs in found:
+        for pkg in pkgs:
+            assert pkg is root['com.acme'].packages[pkg.name]
+
+def test_concurrent_path_index(java_tree):
+    src = java_tree(sources(packages=4, files=5))
+    root = examine_all_java(src)
+    pkg = root['com.acme.p0']
+    indexes = []
+    barrier = threading.Barrier(WORKERS)
+
+    def work(i: int):
+        barrier.wait()
+        if i % 2 == 0:
+            indexes.append(root.path_index())
+        else:
+            pkg.add_class_file(f"Added{i}.java", ClassFile(pkg, src / 'com' / 'acme' / 'p0' / f"Added{i}.java", f"Added{i}.java"))
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(WORKERS)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert all(index is root.path_index() for index in indexes)
+    assert len(root.path_index()) == 20 + WORKERS // 2
+    assert len(root.files_under(src / 'com' / 'acme' / 'p0')) == 5 + WORKERS // 2
+
+def test_threaded_rescan_reuses_unchanged_files(java_tree):
+    src = java_tree(sources(packages=4, files=5))
+    root = examine_all_java(src)
+    before = {cf.file: cf for cf in root.files_under(src)}
+    (src / 'com' / 'acme' / 'p1' / 'C2.java').write_text("package com.acme.p1;\n\npublic class C2 { }\n")
+    examine_all_java(src, root, workers=WORKERS)
+    after = {cf.file: cf for cf in root.files_under(src)}
+    assert set(after) == set(before)
+    assert [f.name for f in after if after[f] is not before[f]] == ['C2.java']
+
+def test_threaded_scan_benchmark(java_tree):
+    src = java_tree(sources())
+
+    def timed(**kwargs) -> float:
+        start = time.perf_counter()
+        examine_all_java(src, **kwargs)
+        return time.perf_counter() - start
+
+    serial = min(timed() for _ in range(2))
+    threaded = min(timed(workers=WORKERS) for _ in range(2))
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"\nserial {serial:.3f}s, {WORKERS} threads {threaded:.3f}s ({'GIL' if gil else 'free-threaded'})")
+    # with the GIL there's no speed-up to be had, but the pool mustn't cost much either
+    assert threaded <= serial * (2.0 if gil else 1.0)
@@ -1,5 +1,6 @@
 
 from scanner.sitter.xml_examiner import * 
+from rich.console import Console 
 
 def test_json_context_parsing(): 
     p = Path(__file__).parent / 'json-context.xml' 